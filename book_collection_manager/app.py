@@ -1,19 +1,95 @@
 import os
+import threading
+
+import click
 from dotenv import load_dotenv
-from flask import Flask, jsonify, make_response, Response
+from flask import Flask, current_app, jsonify, make_response, Response
 from models.book_model import db
-from auth_routes import auth_bp
-from book_routes import books_bp
+from auth_routes import auth_bp, authenticate_request
+from book_routes import GOOGLE_BOOKS_API_URL, books_bp
+from enrichment import create_enrichment_workers
+from metrics_routes import install_metrics, metrics_bp
+from utils.compression import install_compression
+from utils.json_provider import create_json_provider
 from utils.logger import configure_logger
+from utils.query_capture import SlowQueryLog
 from models import db
+from models.engine import configure_engines, engine_options, replica_binds
+from models.migrations import upgrade
 
 # Load environment variables from .env file
 load_dotenv()
 
 
+def prepare_database(app: Flask) -> list:
+    """
+    Bring the schema up to date; a no-op beyond one version check when current.
+
+    Returns:
+        The migration versions that were applied.
+    """
+    with app.app_context():
+        applied = upgrade(db.engine)
+    if applied:
+        app.logger.info("Applied schema migrations: %s", applied)
+    return applied
+
+
+def _prepare_on_first_request(app: Flask) -> None:
+    """
+    Defer the schema check and the background threads to the first request.
+
+    Importing the app or calling create_app then does no database or network
+    I/O, and a process that never serves a request (a CLI command, a test
+    collecting the app) never pays for them.
+    """
+    lock = threading.Lock()
+    prepared = False
+
+    def prepare():
+        nonlocal prepared
+        if prepared:
+            return
+        with lock:
+            if prepared:
+                return
+            prepare_database(app)
+            # Fill in covers and summaries of new books in the background
+            if app.config['ENRICHMENT_WORKERS'] > 0:
+                app.extensions['enrichment'].start()
+            prepared = True
+
+    app.before_request(prepare)
+
+
+def _register_commands(app: Flask) -> None:
+    """
+    Register the app's flask CLI commands.
+    """
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Apply pending schema migrations."""
+        applied = prepare_database(current_app)
+        if applied:
+            click.echo(f"Applied migrations: {', '.join(map(str, applied))}")
+        else:
+            click.echo("Schema is up to date.")
+
+    @app.cli.command('startup-profile', context_settings={'ignore_unknown_options': True})
+    @click.argument('args', nargs=-1, type=click.UNPROCESSED)
+    def startup_profile_command(args):
+        """Report per-module import times and the time to the first request."""
+        from benchmarks.startup import main
+
+        raise SystemExit(main(list(args)))
+
+
 def create_app() -> Flask:
     """
     Create and configure the Flask application.
+
+    Nothing here touches the database or the network: the schema check and
+    the background threads run on the first request (see prepare_database).
     """
     app = Flask(__name__)
 
@@ -21,18 +97,128 @@ def create_app() -> Flask:
 
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI', 'sqlite:///books.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'default-secure-key')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_BINDS'] = replica_binds()
+    # The .env template ships an empty FLASK_SECRET_KEY, so treat empty as unset
+    app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY') or 'default-secure-key'
+    if app.config['SECRET_KEY'] == 'default-secure-key':
+        app.logger.warning("FLASK_SECRET_KEY is not set; access tokens are signed with the insecure default key.")
+
+    # Access tokens: previous keys stay valid for verification while rotating
+    app.config['SECRET_KEY_FALLBACKS'] = [key for key in os.getenv('FLASK_SECRET_KEY_FALLBACKS', '').split(',') if key]
+    app.config['TOKEN_MAX_AGE'] = int(os.getenv('TOKEN_MAX_AGE', '3600'))
+    app.config['TOKEN_REVOCATION_REFRESH'] = float(os.getenv('TOKEN_REVOCATION_REFRESH', '30'))
+    app.config['AUTH_REQUIRED'] = os.getenv('AUTH_REQUIRED', 'false').lower() == 'true'
+
+    # Password hashing runs on a bounded pool; overflow is answered with a 503
+    app.config['HASH_WORKERS'] = int(os.getenv('HASH_WORKERS', str(os.cpu_count() or 1)))
+    app.config['HASH_QUEUE_SIZE'] = int(os.getenv('HASH_QUEUE_SIZE', '32'))
+    app.config['HASH_TIMEOUT'] = float(os.getenv('HASH_TIMEOUT', '10'))
+    app.config['HASH_RETRY_AFTER'] = int(os.getenv('HASH_RETRY_AFTER', '1'))
+
+    # Outbound HTTP and Google Books lookups
+    app.config['HTTP_POOL_SIZE'] = int(os.getenv('HTTP_POOL_SIZE', '20'))
+    app.config['HTTP_CONNECT_TIMEOUT'] = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+    app.config['HTTP_READ_TIMEOUT'] = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+    app.config['HTTP_RETRIES'] = int(os.getenv('HTTP_RETRIES', '2'))
+    app.config['HTTP_BACKOFF_FACTOR'] = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.3'))
+    app.config['GOOGLE_BOOKS_API_URL'] = os.getenv('GOOGLE_BOOKS_API_URL', GOOGLE_BOOKS_API_URL)
+    app.config['DETAILS_BATCH_WORKERS'] = int(os.getenv('DETAILS_BATCH_WORKERS', '16'))
+    app.config['DETAILS_BATCH_MAX_TITLES'] = int(os.getenv('DETAILS_BATCH_MAX_TITLES', '50'))
+    app.config['DETAILS_CACHE_MAX_SIZE'] = int(os.getenv('DETAILS_CACHE_MAX_SIZE', '1024'))
+    app.config['DETAILS_CACHE_TTL'] = float(os.getenv('DETAILS_CACHE_TTL', '3600'))
+    app.config['DETAILS_CACHE_NEGATIVE_TTL'] = float(os.getenv('DETAILS_CACHE_NEGATIVE_TTL', '300'))
+
+    # Batch book reads and status updates
+    app.config['BOOKS_BATCH_MAX_IDS'] = int(os.getenv('BOOKS_BATCH_MAX_IDS', '100'))
+
+    # Collection reads
+    app.config['COLLECTION_MAX_LIMIT'] = int(os.getenv('COLLECTION_MAX_LIMIT', '1000'))
+    app.config['COLLECTION_STREAM_BATCH_SIZE'] = int(os.getenv('COLLECTION_STREAM_BATCH_SIZE', '500'))
+
+    # Collection response cache: memory, memcached or none
+    app.config['RESPONSE_CACHE_BACKEND'] = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+    app.config['RESPONSE_CACHE_URL'] = os.getenv('RESPONSE_CACHE_URL', '127.0.0.1:11211')
+    app.config['RESPONSE_CACHE_TTL'] = float(os.getenv('RESPONSE_CACHE_TTL', '300'))
+    app.config['RESPONSE_CACHE_MAX_SIZE'] = int(os.getenv('RESPONSE_CACHE_MAX_SIZE', '1024'))
+    app.config['RESPONSE_CACHE_MAX_ITEM_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_ITEM_BYTES', str(1024 * 1024)))
+    app.config['RESPONSE_CACHE_TIMEOUT'] = float(os.getenv('RESPONSE_CACHE_TIMEOUT', '0.25'))
+    app.config['RESPONSE_CACHE_PREFIX'] = os.getenv('RESPONSE_CACHE_PREFIX', 'books')
+
+    # Idempotency-Key replays for account creation and book adds
+    app.config['IDEMPOTENCY_KEY_TTL'] = float(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+    app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = float(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '60'))
+
+    # Bulk import
+    app.config['IMPORT_BATCH_SIZE'] = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+    app.config['IMPORT_MAX_BATCH_SIZE'] = int(os.getenv('IMPORT_MAX_BATCH_SIZE', '5000'))
+    app.config['IMPORT_MAX_ERRORS'] = int(os.getenv('IMPORT_MAX_ERRORS', '1000'))
+
+    # Background enrichment of new books with Google Books covers and summaries
+    app.config['ENRICHMENT_WORKERS'] = int(os.getenv('ENRICHMENT_WORKERS', '2'))
+    app.config['ENRICHMENT_BATCH_SIZE'] = int(os.getenv('ENRICHMENT_BATCH_SIZE', '20'))
+    app.config['ENRICHMENT_RATE_LIMIT'] = float(os.getenv('ENRICHMENT_RATE_LIMIT', '5'))
+    app.config['ENRICHMENT_BURST'] = int(os.getenv('ENRICHMENT_BURST', '5'))
+    app.config['ENRICHMENT_MAX_ATTEMPTS'] = int(os.getenv('ENRICHMENT_MAX_ATTEMPTS', '5'))
+    app.config['ENRICHMENT_BACKOFF'] = float(os.getenv('ENRICHMENT_BACKOFF', '30'))
+    app.config['ENRICHMENT_MAX_BACKOFF'] = float(os.getenv('ENRICHMENT_MAX_BACKOFF', '3600'))
+    app.config['ENRICHMENT_LEASE'] = float(os.getenv('ENRICHMENT_LEASE', '300'))
+    app.config['ENRICHMENT_POLL_INTERVAL'] = float(os.getenv('ENRICHMENT_POLL_INTERVAL', '1'))
+
+    # Cover image cache; COVER_CACHE_DIR defaults to the instance folder
+    app.config['COVER_CACHE_DIR'] = os.getenv('COVER_CACHE_DIR', '')
+    app.config['COVER_CACHE_MAX_BYTES'] = int(os.getenv('COVER_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+    app.config['COVER_MAX_DOWNLOAD_BYTES'] = int(os.getenv('COVER_MAX_DOWNLOAD_BYTES', str(5 * 1024 * 1024)))
+    app.config['COVER_CACHE_MAX_AGE'] = int(os.getenv('COVER_CACHE_MAX_AGE', '604800'))
+
+    # Collection export
+    app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+    app.config['EXPORT_GZIP_LEVEL'] = int(os.getenv('EXPORT_GZIP_LEVEL', '6'))
+
+    # Collection search
+    app.config['SEARCH_MAX_LIMIT'] = int(os.getenv('SEARCH_MAX_LIMIT', '100'))
+    app.config['SEARCH_SNIPPET_TOKENS'] = int(os.getenv('SEARCH_SNIPPET_TOKENS', '16'))
+
+    # JSON serialization (auto uses orjson when installed) and response compression
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'auto')
+    app.config['COMPRESSION_ENCODINGS'] = os.getenv('COMPRESSION_ENCODINGS', 'br,gzip')
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+
+    # Slow-query log; a threshold of 0 turns it off
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '250'))
+    app.config['SLOW_QUERY_EXPLAIN'] = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
 
     # Initialize the database
     db.init_app(app)
+    configure_engines(app)
+    install_metrics(app)
+    if app.config['SLOW_QUERY_THRESHOLD_MS'] > 0:
+        slow_queries = SlowQueryLog(app.logger, app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000,
+                                    explain=app.config['SLOW_QUERY_EXPLAIN'])
+        with app.app_context():
+            for engine in db.engines.values():
+                slow_queries.instrument(engine)
+
+    # Serialize with orjson when installed, and compress large responses
+    app.json = create_json_provider(app, app.config['JSON_PROVIDER'])
+    install_compression(app)
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(books_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
 
-    # Create tables
-    with app.app_context():
-        db.create_all()
+    # Resolve the caller of every book route from their access token
+    app.before_request_funcs.setdefault(books_bp.name, []).append(authenticate_request)
+
+    # Covers and summaries of new books are filled in by background threads,
+    # started with the first request
+    app.extensions['enrichment'] = create_enrichment_workers(app)
+    _prepare_on_first_request(app)
+
+    _register_commands(app)
 
     return app
 
@@ -72,10 +258,11 @@ def db_check() -> Response:
         _ = User.query.first()
         return make_response(jsonify({'database_status': 'healthy'}), 200)
     except Exception as e:
-        app.logger.error(f"Database check failed: {e}")
+        app.logger.error("Database check failed: %s", e)
         return make_response(jsonify({'error': str(e)}), 500)
 
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Flask's development server; production traffic is served by gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.getenv('FLASK_DEBUG', 'false').lower() == 'true', host='0.0.0.0', port=5000)
@@ -1,6 +1,16 @@
-from flask import Blueprint, request, jsonify, current_app
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import time
+
+from flask import Blueprint, g, request, jsonify, current_app
+from sqlalchemy.exc import IntegrityError
+from idempotency import idempotent
+from models.token_model import RevokedToken
 from models.user_model import User, db
-from utils.hash_utils import generate_salt, hash_password, verify_password
+from utils.executor import BoundedExecutor, ExecutorBusyError
+from utils.hash_utils import generate_salt, hash_password, needs_rehash, verify_password
+from utils.tokens import RevocationList, TokenError, TokenManager
 import logging
 
 # Initialize logger
@@ -8,6 +18,119 @@ logger = logging.getLogger('auth_routes')
 
 auth_bp = Blueprint('auth', __name__)
 
+# Endpoints that authenticate_request never requires a token for
+AUTH_EXEMPT_ENDPOINTS = {'books.health'}
+
+
+def _get_hash_executor():
+    """Returns the bounded pool that password hashing runs on, creating it on first use.
+
+    The KDFs release the GIL while they work, so a thread pool sized to the
+    CPU count keeps hashing off the request threads without a process pool.
+    """
+    executor = current_app.extensions.get('hash_executor')
+    if executor is None:
+        executor = current_app.extensions.setdefault('hash_executor', BoundedExecutor(
+            max_workers=current_app.config.get('HASH_WORKERS', os.cpu_count() or 1),
+            max_queue=current_app.config.get('HASH_QUEUE_SIZE', 32),
+            thread_name_prefix='password-hash'
+        ))
+    return executor
+
+
+def _run_hashing(fn, *args):
+    """Runs a password hashing function on the hashing pool and returns its result.
+
+    Raises:
+        ExecutorBusyError: If the pool's queue is full.
+        concurrent.futures.TimeoutError: If hashing takes longer than HASH_TIMEOUT seconds.
+    """
+    return _get_hash_executor().run(fn, *args, timeout=current_app.config.get('HASH_TIMEOUT', 10))
+
+
+def _busy_response():
+    """Builds the 503 returned when password hashing is saturated."""
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(current_app.config.get('HASH_RETRY_AFTER', 1))
+    return response
+
+
+def _load_revoked_tokens():
+    """Returns the (token ID, expiry) pairs of revoked tokens that have not expired yet."""
+    return db.session.execute(
+        db.select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > time.time())
+    ).all()
+
+
+def get_token_manager():
+    """Returns the access token manager for the current app, creating it on first use.
+
+    Tokens are signed with SECRET_KEY. Keys listed in SECRET_KEY_FALLBACKS are
+    still accepted when verifying, which allows rotating the key.
+    """
+    manager = current_app.extensions.get('token_manager')
+    if manager is None:
+        keys = [*current_app.config.get('SECRET_KEY_FALLBACKS', []), current_app.config.get('SECRET_KEY')]
+        app = current_app._get_current_object()
+
+        def load_revoked_tokens():
+            # Reloads run on a background thread, outside any request
+            with app.app_context():
+                return _load_revoked_tokens()
+
+        manager = current_app.extensions.setdefault('token_manager', TokenManager(
+            keys,
+            max_age=current_app.config.get('TOKEN_MAX_AGE', 3600),
+            revocations=RevocationList(
+                loader=load_revoked_tokens,
+                refresh_interval=current_app.config.get('TOKEN_REVOCATION_REFRESH', 30)
+            )
+        ))
+    return manager
+
+
+def _bearer_token():
+    """Returns the bearer token from the Authorization header, '' if malformed, or None if absent."""
+    header = request.headers.get('Authorization')
+    if header is None:
+        return None
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else ''
+
+
+def authenticate_request():
+    """Resolves the user making the request from their access token.
+
+    Installed as a before-request hook by create_app. On success the user's
+    ID is stored in ``g.user_id`` and the token's claims in ``g.token``; this
+    never touches the database. Requests without a token are let through with
+    ``g.user_id`` unset unless AUTH_REQUIRED is enabled.
+
+    Returns:
+        A 401 response if the token is missing and required, or invalid;
+        otherwise None so the request proceeds.
+    """
+    g.user_id = None
+    if request.endpoint in AUTH_EXEMPT_ENDPOINTS:
+        return None
+
+    token = _bearer_token()
+    if token is None:
+        if current_app.config.get('AUTH_REQUIRED', False):
+            current_app.logger.warning("Unauthenticated request to %s rejected.", request.endpoint)
+            return jsonify({'error': 'Authentication required'}), 401
+        return None
+
+    try:
+        g.token = get_token_manager().verify(token)
+    except TokenError as e:
+        current_app.logger.warning("Request to %s rejected: %s.", request.endpoint, e)
+        return jsonify({'error': str(e)}), 401
+    g.user_id = g.token['sub']
+    return None
+
+
 @auth_bp.route('/health', methods=['GET'])
 def health():
     """Health check route to confirm the app is running."""
@@ -15,9 +138,10 @@ def health():
     return jsonify({"status": "healthy"}), 200
 
 @auth_bp.route('/create-account', methods=['POST'])
+@idempotent
 def create_account():
     """Create a new user account."""
-    current_app.logger.info("Attempting to create a new account.")
+    current_app.logger.debug("Attempting to create a new account.")
     data = request.json
     username = data.get('username')
     password = data.get('password')
@@ -26,30 +150,36 @@ def create_account():
         current_app.logger.warning("Account creation failed: Missing username or password.")
         return jsonify({'error': 'Username and password are required'}), 400
 
-    # Check if username already exists
-    if User.query.filter_by(username=username).first():
-        current_app.logger.warning(f"Account creation failed: Username '{username}' already exists.")
-        return jsonify({'error': 'Username already exists'}), 400
-
     # Create user
     try:
         salt = generate_salt()
-        hashed_password = hash_password(password, salt)
-        user = User(username=username, salt=salt, hashed_password=hashed_password)
-        db.session.add(user)
+        hashed_password = _run_hashing(hash_password, password, salt)
+    except (ExecutorBusyError, FutureTimeoutError):
+        current_app.logger.warning("Account creation rejected: password hashing is saturated.")
+        return _busy_response()
+
+    # A single insert: the unique index on username settles concurrent sign-ups
+    try:
+        user_id = db.session.execute(
+            db.insert(User).values(username=username, salt=salt, hashed_password=hashed_password).returning(User.id)
+        ).scalar()
         db.session.commit()
 
-        current_app.logger.info(f"Account created successfully for username: {username}.")
-        return jsonify({'message': 'Account created successfully', 'user_id': user.id}), 201
-    
+        current_app.logger.info("Account created successfully for username: %s.", username)
+        return jsonify({'message': 'Account created successfully', 'user_id': user_id}), 201
+
+    except IntegrityError:
+        db.session.rollback()
+        current_app.logger.warning("Account creation failed: Username '%s' already exists.", username)
+        return jsonify({'error': 'Username already exists'}), 400
     except Exception as e:
-        current_app.logger.error(f"Error creating account: {e}")
+        current_app.logger.error("Error creating account: %s", e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Login a user."""
-    current_app.logger.info("Login attempt started.")
+    current_app.logger.debug("Login attempt started.")
     data = request.json
     username = data.get('username')
     password = data.get('password')
@@ -61,21 +191,76 @@ def login():
     # Find user
     user = User.query.filter_by(username=username).first()
     if not user:
-        current_app.logger.warning(f"Login failed: Username '{username}' not found.")
+        current_app.logger.warning("Login failed: Username '%s' not found.", username)
         return jsonify({'error': 'Invalid username or password'}), 401
 
     # Verify password
-    if not verify_password(password, user.salt, user.hashed_password):
-        current_app.logger.warning(f"Login failed: Invalid password for username '{username}'.")
+    try:
+        valid = _run_hashing(verify_password, password, user.salt, user.hashed_password)
+    except (ExecutorBusyError, FutureTimeoutError):
+        current_app.logger.warning("Login rejected: password hashing is saturated.")
+        return _busy_response()
+    if not valid:
+        current_app.logger.warning("Login failed: Invalid password for username '%s'.", username)
         return jsonify({'error': 'Invalid username or password'}), 401
-    
-    current_app.logger.info(f"User '{username}' logged in successfully.")
-    return jsonify({'message': 'Login successful'}), 200
+
+    # Upgrade hashes made with outdated KDF settings while we have the password
+    if needs_rehash(user.hashed_password):
+        try:
+            salt = generate_salt()
+            user.hashed_password = _run_hashing(hash_password, password, salt)
+            user.salt = salt
+            db.session.commit()
+            current_app.logger.info("Password hash upgraded for username: %s.", username)
+        except (ExecutorBusyError, FutureTimeoutError):
+            current_app.logger.info("Skipped password hash upgrade for '%s': hashing is saturated.", username)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error("Error upgrading password hash for user '%s': %s", username, e)
+
+    manager = get_token_manager()
+    current_app.logger.info("User '%s' logged in successfully.", username)
+    return jsonify({
+        'message': 'Login successful',
+        'user_id': user.id,
+        'access_token': manager.issue(user.id),
+        'token_type': 'Bearer',
+        'expires_in': manager.max_age
+    }), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the access token presented with the request."""
+    current_app.logger.debug("Logout attempt started.")
+    token = _bearer_token()
+    if not token:
+        current_app.logger.warning("Logout failed: No bearer token provided.")
+        return jsonify({'error': 'Authentication required'}), 401
+
+    manager = get_token_manager()
+    try:
+        claims = manager.verify(token)
+    except TokenError as e:
+        current_app.logger.warning("Logout failed: %s.", e)
+        return jsonify({'error': str(e)}), 401
+
+    try:
+        db.session.execute(db.delete(RevokedToken).where(RevokedToken.expires_at <= time.time()))
+        db.session.add(RevokedToken(jti=claims['jti'], expires_at=claims['exp']))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Error revoking token for user ID %s: %s", claims['sub'], e)
+        return jsonify({'error': 'Internal server error'}), 500
+
+    manager.revoke(claims)
+    current_app.logger.info("User ID %s logged out.", claims['sub'])
+    return jsonify({'message': 'Logout successful'}), 200
 
 @auth_bp.route('/update-password', methods=['PUT'])
 def update_password():
     """Update the password for an existing user."""
-    current_app.logger.info("Password update attempt started.")
+    current_app.logger.debug("Password update attempt started.")
     data = request.json
     username = data.get('username')
     new_password = data.get('new_password')
@@ -87,16 +272,23 @@ def update_password():
     # Find user
     user = User.query.filter_by(username=username).first()
     if not user:
-        current_app.logger.warning(f"Password update failed: User '{username}' not found.")
+        current_app.logger.warning("Password update failed: User '%s' not found.", username)
         return jsonify({'error': 'User not found'}), 404
 
     try:
-        user.salt = generate_salt()
-        user.hashed_password = hash_password(new_password, user.salt)
+        salt = generate_salt()
+        hashed_password = _run_hashing(hash_password, new_password, salt)
+    except (ExecutorBusyError, FutureTimeoutError):
+        current_app.logger.warning("Password update rejected: password hashing is saturated.")
+        return _busy_response()
+
+    try:
+        user.salt = salt
+        user.hashed_password = hashed_password
         db.session.commit()
-        current_app.logger.info(f"Password updated successfully for username: {username}.")
+        current_app.logger.info("Password updated successfully for username: %s.", username)
         return jsonify({'message': 'Password updated successfully'}), 200
     
     except Exception as e:
-        current_app.logger.error(f"Error updating password for user '{username}': {e}")
+        current_app.logger.error("Error updating password for user '%s': %s", username, e)
         return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
@@ -0,0 +1,8 @@
+"""Load tests and micro-benchmarks for the book collection API.
+
+Run from the book_collection_manager directory:
+
+    python -m benchmarks.load --output results.json
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.compare baseline.json results.json
+"""
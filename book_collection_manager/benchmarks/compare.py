@@ -0,0 +1,82 @@
+"""Flags regressions between two benchmark result files.
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+
+Exits with status 1 if any benchmark got slower, lost throughput or started
+failing beyond the threshold.
+"""
+import argparse
+import sys
+
+from benchmarks.stats import load_results
+
+# Latencies where higher is worse; throughput is checked separately
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def compare(baseline, current, threshold=0.1, metrics=('p50_ms', 'p95_ms')):
+    """Compares two sets of results.
+
+    Args:
+        baseline (dict): The ``results`` of the reference run.
+        current (dict): The ``results`` of the run being checked.
+        threshold (float): The relative change tolerated, e.g. 0.1 for 10%.
+        metrics (tuple): The latency percentiles to check.
+
+    Returns:
+        list: One dict per regression with the benchmark ``name``, the
+            ``metric``, its ``baseline`` and ``current`` values and the
+            relative ``change``.
+    """
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        checks = [(metric, after[metric] - before[metric]) for metric in metrics]
+        checks.append(('throughput', before['throughput'] - after['throughput']))
+        for metric, worse_by in checks:
+            if before[metric] and worse_by / before[metric] > threshold:
+                regressions.append({
+                    'name': name,
+                    'metric': metric,
+                    'baseline': before[metric],
+                    'current': after[metric],
+                    'change': round((after[metric] - before[metric]) / before[metric], 4),
+                })
+        if after['errors'] > before['errors']:
+            regressions.append({'name': name, 'metric': 'errors', 'baseline': before['errors'],
+                                'current': after['errors'], 'change': None})
+    return regressions
+
+
+def report(baseline, current, threshold=0.1, metrics=('p50_ms', 'p95_ms')):
+    """Prints the regressions of ``current`` against ``baseline``.
+
+    Returns:
+        int: The exit status, 1 if there are regressions and 0 otherwise.
+    """
+    for name in sorted(current.keys() - baseline.keys()):
+        print(f'{name}: new benchmark, no baseline')
+    regressions = compare(baseline, current, threshold, metrics)
+    for r in regressions:
+        change = '' if r['change'] is None else f" ({r['change']:+.1%})"
+        print(f"REGRESSION {r['name']} {r['metric']}: {r['baseline']} -> {r['current']}{change}")
+    if not regressions:
+        print(f'No regressions beyond {threshold:.0%}.')
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flag benchmark regressions against a baseline.')
+    parser.add_argument('baseline', help='The reference result file')
+    parser.add_argument('current', help='The result file to check')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change tolerated (default 0.1)')
+    parser.add_argument('--metrics', default='p50_ms,p95_ms',
+                        help=f"Latency metrics to check, from {','.join(LATENCY_METRICS)} (default p50_ms,p95_ms)")
+    args = parser.parse_args(argv)
+
+    return report(load_results(args.baseline)['results'], load_results(args.current)['results'],
+                  args.threshold, tuple(args.metrics.split(',')))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""A local stand-in for the Google Books volumes API.
+
+Answers ``GET /books/v1/volumes?q=<title>`` with one canned volume, after an
+optional simulated latency, so benchmarks measure the app instead of the
+network. Titles starting with ``missing`` get an empty result. Queries of the
+form ``intitle:<title> inauthor:<author>`` are answered for ``<title>``.
+
+Each volume's thumbnail points back at the stub, which serves a generated
+PNG cover from ``/covers/<title>.png``.
+"""
+import json
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+VOLUMES_PATH = '/books/v1/volumes'
+COVERS_PATH = '/covers/'
+
+# Dimensions of the generated covers, in pixels
+COVER_WIDTH = 400
+COVER_HEIGHT = 600
+
+
+def cover_png(width=COVER_WIDTH, height=COVER_HEIGHT, color=(40, 90, 160)):
+    """Returns a solid-colour RGB PNG image."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    row = b'\x00' + bytes(color) * width  # Filter type 0, then the pixels
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height))
+            + chunk(b'IEND', b''))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith(COVERS_PATH):
+            self.server.cover_requests += 1
+            self._send_bytes(200, 'image/png', self.server.cover)
+            return
+        if url.path != VOLUMES_PATH:
+            self._send(404, {'error': 'Not found'})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.requests += 1
+        title = parse_qs(url.query).get('q', [''])[0]
+        if title.startswith('intitle:'):
+            title = title[len('intitle:'):].split(' inauthor:')[0]
+        if title.startswith('missing'):
+            self._send(200, {'totalItems': 0})
+            return
+        self._send(200, {'totalItems': 1, 'items': [{'volumeInfo': {
+            'title': title,
+            'authors': ['Stub Author'],
+            'publishedDate': '2024-01-01',
+            'description': f'A stub description of {title}.',
+            'imageLinks': {'thumbnail': f'{self.server.base_url}{COVERS_PATH}{quote(title)}.png'},
+        }}]})
+
+    def _send(self, status, body):
+        self._send_bytes(status, 'application/json', json.dumps(body).encode())
+
+    def _send_bytes(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GoogleBooksStub:
+    """Runs the stub server on a background thread.
+
+    Args:
+        latency (float): Seconds to wait before answering each request.
+        host (str): The interface to listen on.
+        port (int): The port to listen on; 0 picks a free one.
+    """
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.latency = latency
+        self._server.requests = 0
+        self._server.cover_requests = 0
+        self._server.cover = cover_png()
+        host, port = self._server.server_address[:2]
+        self._server.base_url = f'http://{host}:{port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, name='google-books-stub', daemon=True)
+
+    @property
+    def url(self):
+        """The URL to use as GOOGLE_BOOKS_API_URL."""
+        return f'{self._server.base_url}{VOLUMES_PATH}'
+
+    @property
+    def requests(self):
+        """The number of volume lookups served so far."""
+        return self._server.requests
+
+    @property
+    def cover_requests(self):
+        """The number of cover images served so far."""
+        return self._server.cover_requests
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each answer')
+    args = parser.parse_args()
+    stub = GoogleBooksStub(latency=args.latency, port=args.port)
+    print(f'Serving a Google Books stub at {stub.url}; press Ctrl+C to stop.')
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub._server.server_close()
@@ -0,0 +1,282 @@
+"""Mixed-workload load test for the book collection API.
+
+Seeds a fresh database with users and books, then runs a weighted mix of
+requests (add, get, status update, collection, details, login) from
+several threads and reports throughput and p50/p95/p99 latency per route.
+Detail lookups go to a local Google Books stub, never to the real API.
+
+By default the app runs in-process on a temporary SQLite database:
+
+    python -m benchmarks.load --users 10 --books 500 --requests 5000 --output results.json
+
+Against a running server (start it with GOOGLE_BOOKS_API_URL pointing at
+``python -m benchmarks.google_books_stub``):
+
+    python -m benchmarks.load --url http://127.0.0.1:5000 --output results.json
+
+Pass ``--baseline`` to flag regressions against an earlier result file.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.compare import report
+from benchmarks.google_books_stub import GoogleBooksStub
+from benchmarks.stats import environment, load_results, print_table, save_results, summarize
+
+DEFAULT_MIX = 'add=10,get=25,status=10,collection=25,details=20,login=10'
+PASSWORD = 'benchmark-password'
+
+
+class User:
+    """A seeded account and the IDs of its books."""
+
+    def __init__(self, username, user_id, token, book_ids):
+        self.username = username
+        self.user_id = user_id
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.book_ids = book_ids
+
+
+class InProcessClient:
+    """Sends requests to the app through Flask's test client."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, json=None, data=None, headers=None):
+        response = self._client.open(path, method=method, json=json, data=data, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class RemoteClient:
+    """Sends requests to a running server over a keep-alive session."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self._base_url = base_url.rstrip('/')
+        self._session = requests.Session()
+
+    def request(self, method, path, json=None, data=None, headers=None):
+        response = self._session.request(method, self._base_url + path, json=json, data=data, headers=headers)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+
+def _random_book(rng):
+    n = rng.randrange(10 ** 9)
+    return {'title': f'Benchmark Book {n}', 'author': f'Author {n % 997}', 'year': str(1950 + n % 75),
+            'status': rng.choice(['read', 'unread']), 'summary': f'Summary of book {n}.'}
+
+
+def _check(status, body, expected, action):
+    if status != expected:
+        raise RuntimeError(f'{action} failed with {status}: {body}')
+    return body
+
+
+def seed(client, users, books_per_user, rng):
+    """Creates accounts and imports their books through the API.
+
+    Returns:
+        list: The seeded Users.
+    """
+    seeded = []
+    for i in range(users):
+        username = f'bench-user-{i}'
+        _check(*client.request('POST', '/api/create-account', json={'username': username, 'password': PASSWORD}),
+               201, 'Account creation')
+        body = _check(*client.request('POST', '/api/login', json={'username': username, 'password': PASSWORD}),
+                      200, 'Login')
+        user = User(username, body['user_id'], body['access_token'], [])
+
+        upload = '\n'.join(json.dumps(_random_book(rng)) for _ in range(books_per_user))
+        _check(*client.request('POST', '/api/books/import?format=ndjson', data=upload, headers=user.headers),
+               200, 'Import')
+        body = _check(*client.request('GET', f'/api/books/collection?user_id={user.user_id}&fields=id',
+                                      headers=user.headers), 200, 'Collection')
+        user.book_ids.extend(book['id'] for book in body['collection'])
+        seeded.append(user)
+    return seeded
+
+
+def _add(client, user, rng, titles):
+    status, body = client.request('POST', '/api/books', json=_random_book(rng), headers=user.headers)
+    if status == 201:
+        user.book_ids.append(body['book_id'])
+    # 200 means the user already had the book
+    return status in (200, 201)
+
+
+def _get(client, user, rng, titles):
+    status, _ = client.request('GET', f'/api/books/{rng.choice(user.book_ids)}', headers=user.headers)
+    return status == 200
+
+
+def _status(client, user, rng, titles):
+    status, _ = client.request('PUT', f'/api/books/{rng.choice(user.book_ids)}',
+                               json={'status': rng.choice(['read', 'unread'])}, headers=user.headers)
+    return status == 200
+
+
+def _collection(client, user, rng, titles):
+    status, _ = client.request('GET', f'/api/books/collection?user_id={user.user_id}', headers=user.headers)
+    return status == 200
+
+
+def _details(client, user, rng, titles):
+    status, _ = client.request('GET', f'/api/books/details?title={rng.choice(titles)}', headers=user.headers)
+    return status == 200
+
+
+def _login(client, user, rng, titles):
+    status, _ = client.request('POST', '/api/login', json={'username': user.username, 'password': PASSWORD})
+    return status == 200
+
+
+OPERATIONS = {
+    'add': _add,
+    'get': _get,
+    'status': _status,
+    'collection': _collection,
+    'details': _details,
+    'login': _login,
+}
+
+
+def parse_mix(value):
+    """Parses ``name=weight,...`` into a dict of operation weights."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name.strip()}', expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def run_workload(make_client, users, mix, requests, concurrency, seed_value, titles):
+    """Runs the weighted mix of operations from ``concurrency`` threads.
+
+    Args:
+        make_client (callable): Returns a new client for one thread.
+        users (list): The seeded Users to act as.
+        mix (dict): Operation names mapped to relative weights.
+        requests (int): The total number of operations to run.
+        concurrency (int): The number of threads.
+        seed_value (int): Seeds each thread's random choices.
+        titles (list): The titles detail lookups pick from.
+
+    Returns:
+        dict: Per-operation summaries plus an ``all`` entry.
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    tickets = itertools.count()
+    durations = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed_value + index)
+        client = make_client()
+        local_durations = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while next(tickets) < requests:
+            name = rng.choices(names, weights)[0]
+            user = rng.choice(users)
+            started_at = time.perf_counter()
+            try:
+                ok = OPERATIONS[name](client, user, rng, titles)
+            except Exception:
+                ok = False
+            local_durations[name].append(time.perf_counter() - started_at)
+            local_errors[name] += not ok
+        with lock:
+            for name in names:
+                durations[name].extend(local_durations[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    results = {name: summarize(durations[name], errors[name], elapsed) for name in names if durations[name]}
+    results['all'] = summarize([d for name in names for d in durations[name]], sum(errors.values()), elapsed)
+    return results
+
+
+def _create_in_process_app(workdir, stub_url, log_level):
+    os.environ.update({
+        'DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        'GOOGLE_BOOKS_API_URL': stub_url,
+        'FLASK_SECRET_KEY': 'benchmark-secret-key',
+        'LOG_LEVEL': log_level,
+    })
+    import app  # Builds the app from the environment on import
+
+    return app.app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a mixed-workload load test against the API.')
+    parser.add_argument('--url', help='Base URL of a running server (default: run the app in-process)')
+    parser.add_argument('--users', type=int, default=10, help='Users to seed (default 10)')
+    parser.add_argument('--books', type=int, default=200, help='Books to seed per user (default 200)')
+    parser.add_argument('--requests', type=int, default=2000, help='Operations to run (default 2000)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads (default 8)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights (default {DEFAULT_MIX})')
+    parser.add_argument('--titles', type=int, default=200, help='Distinct titles for detail lookups (default 200)')
+    parser.add_argument('--stub-latency', type=float, default=0.0,
+                        help='Seconds the Google Books stub waits per lookup (default 0)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default 42)')
+    parser.add_argument('--log-level', default='WARNING', help='App log level in-process (default WARNING)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against this result file and exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change tolerated (default 0.1)')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    titles = [f'Title {i}' for i in range(args.titles)]
+
+    with GoogleBooksStub(latency=args.stub_latency) as stub, tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            make_client = lambda: RemoteClient(args.url)  # noqa: E731
+        else:
+            app = _create_in_process_app(workdir, stub.url, args.log_level)
+            make_client = lambda: InProcessClient(app)  # noqa: E731
+
+        print(f'Seeding {args.users} users with {args.books} books each...', file=sys.stderr)
+        users = seed(make_client(), args.users, args.books, rng)
+        print(f'Running {args.requests} operations on {args.concurrency} threads...', file=sys.stderr)
+        results = run_workload(make_client, users, mix, args.requests, args.concurrency, args.seed, titles)
+
+    print_table(results)
+    meta = {**environment(), 'target': args.url or 'in-process', 'users': args.users, 'books': args.books,
+            'requests': args.requests, 'concurrency': args.concurrency, 'mix': mix, 'seed': args.seed,
+            'stub_latency': args.stub_latency}
+    if args.output:
+        save_results(args.output, meta, results)
+
+    if args.baseline:
+        return report(load_results(args.baseline)['results'], results, args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Micro-benchmarks of the app's hot paths.
+
+Each benchmark times single calls of one function, in-process and without
+network I/O, so results are stable enough to compare between commits:
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.micro --only token_verify,collection_page --number 5000
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from flask import Flask
+
+from benchmarks.compare import report
+from benchmarks.stats import environment, load_results, print_table, save_results, summarize
+
+
+def _token_verify():
+    from utils.tokens import TokenManager
+
+    manager = TokenManager(['benchmark-secret-key'])
+    token = manager.issue(1)
+    return lambda: manager.verify(token)
+
+
+def _cache_hit():
+    from utils.cache import TTLCache
+
+    cache = TTLCache(max_size=1024, ttl=3600)
+    cache.set('title', {'title': 'Title'})
+    return lambda: cache.get('title')
+
+
+def _metrics_observe():
+    from utils.metrics import MetricsRegistry
+
+    histogram = MetricsRegistry().histogram('latency_seconds', 'Latency.', ('endpoint',))
+    return lambda: histogram.observe(0.004, 'books.get_book')
+
+
+def _log_format():
+    from utils.logger import JsonFormatter
+
+    formatter = JsonFormatter()
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, 'Book retrieved: %s by %s, ID: %s',
+                               ('Title', 'Author', 1), None)
+    return lambda: formatter.format(record)
+
+
+def _route_app(books):
+    """Builds an app with the book routes and ``books`` books for user 1."""
+    from book_routes import books_bp
+    from models.book_model import Book, db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.register_blueprint(books_bp, url_prefix='/api')
+    with app.app_context():
+        db.create_all()
+        if books:
+            db.session.execute(db.insert(Book), [
+                {'title': f'Book {i}', 'author': f'Author {i % 50}', 'year': '2024', 'status': 'unread', 'user_id': 1}
+                for i in range(books)
+            ])
+            db.session.commit()
+    return app
+
+
+def _get_book():
+    client = _route_app(1000).test_client()
+    return lambda: client.get('/api/books/500')
+
+
+def _collection_page():
+    client = _route_app(1000).test_client()
+    return lambda: client.get('/api/books/collection?user_id=1&limit=50')
+
+
+def _collection_full():
+    client = _route_app(1000).test_client()
+    return lambda: client.get('/api/books/collection?user_id=1')
+
+
+def _add_book():
+    client = _route_app(0).test_client()
+    payload = json.dumps({'title': 'Title', 'author': 'Author', 'year': '2024', 'status': 'unread', 'user_id': 1})
+    return lambda: client.post('/api/books', data=payload, content_type='application/json')
+
+
+# Benchmark names mapped to setup functions returning the callable to time
+BENCHMARKS = {
+    'token_verify': _token_verify,
+    'cache_hit': _cache_hit,
+    'metrics_observe': _metrics_observe,
+    'log_format': _log_format,
+    'get_book': _get_book,
+    'collection_page': _collection_page,
+    'collection_full': _collection_full,
+    'add_book': _add_book,
+}
+
+
+def run_benchmark(fn, number, warmup):
+    """Times ``number`` calls of ``fn`` after ``warmup`` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    perf_counter = time.perf_counter
+    started_at = perf_counter()
+    for _ in range(number):
+        call_started_at = perf_counter()
+        fn()
+        durations.append(perf_counter() - call_started_at)
+    return summarize(durations, elapsed=perf_counter() - started_at)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's hot paths.")
+    parser.add_argument('--only', help=f"Comma-separated benchmarks to run, from {','.join(BENCHMARKS)}")
+    parser.add_argument('--number', type=int, default=2000, help='Timed calls per benchmark (default 2000)')
+    parser.add_argument('--warmup', type=int, default=100, help='Untimed calls first (default 100)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against this result file and exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change tolerated (default 0.1)')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = set(names) - BENCHMARKS.keys()
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(BENCHMARKS[name](), args.number, args.warmup)
+
+    print_table(results)
+    if args.output:
+        save_results(args.output, {**environment(), 'number': args.number, 'warmup': args.warmup}, results)
+
+    if args.baseline:
+        return report(load_results(args.baseline)['results'], results, args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Cold-start profile of the app.
+
+Starts a fresh interpreter with ``-X importtime``, imports the app the way
+gunicorn does, and sends it one request. Reports the modules that took
+longest to import and how long the process took to build the app and answer
+its first request, which includes the schema check:
+
+    python -m benchmarks.startup --top 20
+    flask --app app startup-profile --top 20 --output startup.json
+
+The app reads its settings from the environment as usual; pass
+--database-uri to profile against a scratch database instead.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+from benchmarks.stats import environment, save_results
+
+# Runs in the profiled interpreter and prints its timings as JSON on stdout
+_PROBE = '''
+import json, time
+started_at = time.perf_counter()
+import app
+imported_at = time.perf_counter()
+response = app.app.test_client().get({path!r})
+answered_at = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported_at - started_at) * 1000,
+    'first_request_ms': (answered_at - imported_at) * 1000,
+    'status': response.status_code,
+}}))
+'''
+
+ModuleTime = namedtuple('ModuleTime', 'name self_ms cumulative_ms')
+
+
+def parse_importtime(output):
+    """Parses the report ``python -X importtime`` writes to stderr.
+
+    Args:
+        output (str): The interpreter's stderr.
+
+    Returns:
+        list: A ModuleTime per imported module, in import order.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append(ModuleTime(name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def top_level_packages(modules):
+    """Sums the import time of each top-level package, e.g. every ``sqlalchemy.*`` module.
+
+    Returns:
+        dict: Milliseconds spent importing each package's own modules.
+    """
+    totals = {}
+    for module in modules:
+        package = module.name.split('.', 1)[0]
+        totals[package] = totals.get(package, 0.0) + module.self_ms
+    return totals
+
+
+def profile_startup(path='/api/health', env=None):
+    """Imports the app in a new interpreter and sends it one request.
+
+    Args:
+        path (str): The route to request first.
+        env (dict): Environment overrides for the profiled process.
+
+    Returns:
+        tuple: The probe's timings and the parsed ModuleTimes.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(path=path)],
+        capture_output=True, text=True, env={**os.environ, **(env or {})},
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"The profiled app failed to start:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the app's cold start.")
+    parser.add_argument('--path', default='/api/health', help='Route to request first (default /api/health)')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules and packages to list (default 15)')
+    parser.add_argument('--database-uri', help='Database to start against (default: DATABASE_URI)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    env = {'DATABASE_URI': args.database_uri} if args.database_uri else {}
+    timings, modules = profile_startup(args.path, env)
+    packages = top_level_packages(modules)
+
+    print(f"{'module':<48}{'self ms':>10}{'cumulative ms':>15}")
+    for module in sorted(modules, key=lambda m: m.cumulative_ms, reverse=True)[:args.top]:
+        print(f"{module.name:<48}{module.self_ms:>10.1f}{module.cumulative_ms:>15.1f}")
+    print()
+    print(f"{'package':<48}{'ms':>10}")
+    for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<48}{ms:>10.1f}")
+    print()
+    print(f"Import of app:              {timings['import_ms']:>8.1f} ms")
+    print(f"First request ({args.path}): {timings['first_request_ms']:>8.1f} ms (status {timings['status']})")
+    print(f"Time to first request:      {timings['import_ms'] + timings['first_request_ms']:>8.1f} ms")
+
+    if args.output:
+        results = {
+            **timings,
+            'modules': {module.name: module._asdict() for module in modules},
+            'packages': packages,
+        }
+        save_results(args.output, {**environment(), 'path': args.path}, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
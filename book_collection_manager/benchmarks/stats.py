@@ -0,0 +1,85 @@
+"""Summaries of benchmark timings and the result file format.
+
+A result file is JSON of the form::
+
+    {"meta": {...}, "results": {"<name>": {"count": 1000, "errors": 0,
+        "throughput": 812.5, "mean_ms": 1.2, "p50_ms": 1.1, "p95_ms": 2.3, "p99_ms": 4.0}}}
+"""
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(durations, errors=0, elapsed=None):
+    """Summarizes the durations (in seconds) of one benchmarked operation.
+
+    Args:
+        durations (list): How long each operation took.
+        errors (int): How many of the operations failed.
+        elapsed (float): The wall-clock seconds of the whole run, used for
+            throughput. Defaults to the sum of the durations.
+
+    Returns:
+        dict: The count, errors, throughput (operations per second) and the
+            mean and p50/p95/p99 latency in milliseconds.
+    """
+    ordered = sorted(durations)
+    total = sum(ordered)
+    elapsed = total if elapsed is None else elapsed
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'throughput': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(total / len(ordered) * 1000, 6) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 6),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 6),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 6),
+    }
+
+
+def environment():
+    """Describes where the benchmark ran, so results are compared like with like."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+    }
+
+
+def save_results(path, meta, results):
+    """Writes a result file."""
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path):
+    """Reads a result file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_table(results, out=sys.stdout):
+    """Prints results as an aligned table."""
+    header = f"{'name':<28}{'count':>8}{'errors':>8}{'ops/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header, file=out)
+    for name, row in sorted(results.items()):
+        print(f"{name:<28}{row['count']:>8}{row['errors']:>8}{row['throughput']:>11.1f}"
+              f"{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['p99_ms']:>10.3f}", file=out)
@@ -1,11 +1,62 @@
-from flask import Blueprint, request, jsonify, current_app
-import requests
-from models.book_model import Book, db
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Response, g, request, jsonify, current_app, send_file, stream_with_context
+from markupsafe import escape
+from idempotency import idempotent
+from metrics_routes import get_metrics
+from models.book_model import BOOK_STATUSES, Book, book_dedup_key, db
+from models.collection_model import CollectionVersion, bump_collection_versions
+from models.enrichment_model import enqueue_enrichment
+from models.engine import read_bind_arguments, upsert_insert
+from models.stats_model import CollectionStat, apply_stats_changes, book_stat_keys
+from models.search_index import fts_query, has_search_index, search_terms
+from utils.cache import SingleFlight, TTLCache
+from utils.cover_store import COVER_SIZES, CoverStore
+from utils.http_client import create_http_client
+from utils.response_cache import create_response_cache
+from utils.streaming import gzip_chunks
 
 books_bp = Blueprint('books', __name__)
 
 GOOGLE_BOOKS_API_URL = "https://www.googleapis.com/books/v1/volumes"
 
+# Columns that may be requested from the collection route, and the ones returned by default
+COLLECTION_FIELDS = ('id', 'title', 'author', 'year', 'status', 'cover_image', 'summary')
+DEFAULT_COLLECTION_FIELDS = ('id', 'title', 'author', 'year', 'status')
+
+# Columns the collection route can sort by; a leading '-' sorts in descending order
+COLLECTION_SORTS = ('id', 'title', 'author', 'year')
+
+# Upload formats accepted by the bulk import route
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+# Export formats with their content types, and the columns every export contains
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_FIELDS = COLLECTION_FIELDS
+
+# Markers placed around matched words in search highlights and snippets
+SEARCH_HIGHLIGHT = ('<mark>', '</mark>')
+
+# Control characters FTS5 puts around matches instead, so the book's own text
+# can be HTML-escaped before they are replaced with SEARCH_HIGHLIGHT
+_HIGHLIGHT_SENTINELS = ('\x02', '\x03')
+
+# Result fields that hold HTML
+SEARCH_HTML_FIELDS = ('title_highlight', 'author_highlight', 'snippet')
+
+# The most authors the stats route ranks
+STATS_MAX_TOP_AUTHORS = 100
+
+# Cover sizes accepted by the cover route
+COVER_SIZE_NAMES = ('original', *COVER_SIZES)
+
 
 @books_bp.route('/health', methods=['GET'])
 def health():
@@ -14,136 +65,1281 @@ def health():
     return jsonify({"status": "healthy"}), 200
 
 
-@books_bp.route('/books', methods=['POST'])
-def add_book():
-    """Add a new book to the database."""
-    current_app.logger.info("Attempting to add a new book.")
-    data = request.json
+def _caller_user_id(supplied):
+    """Works out which user a request acts for.
+
+    When the request carries an access token (see auth_routes.authenticate_request)
+    the token's user is authoritative and a different ``supplied`` ID is refused.
+    Without a token, ``supplied`` is used as is.
+
+    Args:
+        supplied: The user ID sent by the client, or None.
+
+    Returns:
+        tuple: The user ID and None, or None and an error message.
+    """
+    token_user_id = g.get('user_id')
+    if token_user_id is None:
+        return supplied, None
+    if supplied not in (None, '') and str(supplied) != str(token_user_id):
+        return None, 'user_id does not match the authenticated user'
+    return token_user_id, None
+
+
+def _get_owned_book(book_id, read_only=False):
+    """Loads a book, hiding books that belong to someone other than the authenticated user.
+
+    Read-only callers may be served from a read replica.
+    """
+    book = db.session.get(Book, book_id, bind_arguments=read_bind_arguments() if read_only else None)
+    token_user_id = g.get('user_id')
+    if book is not None and token_user_id is not None and book.user_id != token_user_id:
+        return None
+    return book
+
+
+def _book_to_dict(book):
+    """Returns the fields of a book that the book routes send to clients."""
+    return {
+        'id': book.id,
+        'title': book.title,
+        'author': book.author,
+        'year': book.year,
+        'status': book.status,
+        'cover_image': book.cover_image,
+        'summary': book.summary
+    }
+
+
+def _parse_book_ids(values):
+    """Validates the book IDs of a batch request.
+
+    Args:
+        values (list): The IDs supplied by the client, as integers or strings of digits.
+
+    Returns:
+        list: One positive int per value, or None where the value is not a valid ID.
+    """
+    ids = []
+    for value in values:
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        ids.append(value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else None)
+    return ids
+
+
+def _check_batch_size(ids):
+    """Returns an error message if a batch is empty or larger than BOOKS_BATCH_MAX_IDS, else None."""
+    max_ids = current_app.config.get('BOOKS_BATCH_MAX_IDS', 100)
+    if not ids:
+        return 'ids must be a non-empty list'
+    if len(ids) > max_ids:
+        return f'At most {max_ids} books may be requested at once'
+    return None
+
+
+def _owned_books_query(columns, ids):
+    """Selects ``columns`` of the requested books, leaving out other users' books when a token is present."""
+    stmt = db.select(*columns).where(Book.id.in_(set(ids)))
+    token_user_id = g.get('user_id')
+    if token_user_id is not None:
+        stmt = stmt.where(Book.user_id == token_user_id)
+    return stmt
+
+
+def _set_validators(response, etag, last_modified):
+    """Adds the ETag and Last-Modified headers, and asks clients to revalidate before reusing the body."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified(etag, last_modified):
+    """Answers a conditional GET whose cached copy is still current.
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+
+    Args:
+        etag (str): The current entity tag, unquoted.
+        last_modified (float): Epoch seconds of the last change, or None.
+
+    Returns:
+        Response: A 304 response, or None if the full response must be sent.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        # HTTP dates have one-second resolution
+        fresh = request.if_modified_since.timestamp() >= int(last_modified)
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return _set_validators(Response(status=304), etag, last_modified)
+
+
+def _validate_book(data, default_user_id=1):
+    """Validates a new book record.
+
+    Args:
+        data (dict): The book fields supplied by the client.
+        default_user_id (int): The owner to use when the record names none.
+
+    Returns:
+        tuple: The column values to insert and None, or None and an error message.
+    """
+    if not isinstance(data, dict):
+        return None, 'Each book must be a JSON object'
+
     title = data.get('title')
     author = data.get('author')
-    year = data.get('year', '')
-    user_id = data.get('user_id', 1)
-
     if not title or not author:
-        current_app.logger.warning("Failed to add book: Missing title or author.")
-        return jsonify({'error': 'Title and Author are required'}), 400
+        return None, 'Title and Author are required'
+
+    user_id = data.get('user_id')
+    if user_id is None or user_id == '':
+        user_id = default_user_id
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None, 'user_id must be an integer'
+
+    year = data.get('year')
+    year = '' if year is None else str(year).strip()
+    if year and not (year.isascii() and year.isdigit() and len(year) <= 4):
+        return None, 'year must be a number of up to 4 digits'
+
+    # Always present, so every row of a batch insert has the same columns
+    status = data.get('status') or 'unread'
+    if status not in BOOK_STATUSES:
+        return None, f"status must be one of: {', '.join(BOOK_STATUSES)}"
+
+    return {'title': title, 'author': author, 'year': year, 'status': status, 'user_id': user_id}, None
+
+
+def _insert_new_books(rows):
+    """Inserts books in one statement, skipping any their owner already has.
+
+    A book is already there when its owner has one with the same
+    book_dedup_key. On SQLite and PostgreSQL the unique index on the key
+    resolves this inside the INSERT; other databases look the keys up first.
+
+    Args:
+        rows (list): Column values from _validate_book.
+
+    Returns:
+        list: The id, user_id, title, author, status and year of each inserted book.
+    """
+    insert = upsert_insert(db.session.get_bind(Book))
+    if insert is not None:
+        stmt = insert(Book).on_conflict_do_nothing(index_elements=[Book.user_id, Book.dedup_key])
+    else:
+        stmt = db.insert(Book)
+        keys = {}
+        for row in rows:
+            keys.setdefault((row['user_id'], book_dedup_key(row['title'], row['author'])), row)
+        existing = set(db.session.execute(
+            db.select(Book.user_id, Book.dedup_key)
+            .where(Book.dedup_key.in_([dedup_key for _, dedup_key in keys]))
+        ).all())
+        rows = [row for key, row in keys.items() if key not in existing]
+        if not rows:
+            return []
+    return db.session.execute(
+        stmt.returning(Book.id, Book.user_id, Book.title, Book.author, Book.status, Book.year), rows
+    ).all()
+
+
+@books_bp.route('/books', methods=['POST'])
+@idempotent
+def add_book():
+    """Add a new book to the database, or find the user's copy if they already have it."""
+    current_app.logger.debug("Attempting to add a new book.")
+    values, error = _validate_book(request.json, g.get('user_id') or 1)
+    if error:
+        current_app.logger.warning("Failed to add book: %s", error)
+        return jsonify({'error': error}), 400
+    _, error = _caller_user_id(values['user_id'])
+    if error:
+        current_app.logger.warning("Failed to add book: %s", error)
+        return jsonify({'error': error}), 403
 
     try:
-        book = Book(title=title, author=author, year=year, user_id=user_id)
-        db.session.add(book)
+        inserted = _insert_new_books([values])
+        if not inserted:
+            book_id = db.session.execute(db.select(Book.id).where(
+                Book.user_id == values['user_id'],
+                Book.dedup_key == book_dedup_key(values['title'], values['author'])
+            )).scalar()
+            db.session.rollback()
+            current_app.logger.info("Book already in collection: %s by %s, ID: %s",
+                                    values['title'], values['author'], book_id)
+            return jsonify({'message': 'Book already in collection', 'book_id': book_id}), 200
+        book = inserted[0]
+        enqueue_enrichment([(book.id, book.user_id, book.title, book.author)])
+        apply_stats_changes(added=book_stat_keys(book))
+        bump_collection_versions([book.user_id])
         db.session.commit()
-        current_app.logger.info(f"Book added successfully: {title} by {author}, ID: {book.id}")
+        current_app.logger.info("Book added successfully: %s by %s, ID: %s", book.title, book.author, book.id)
         return jsonify({'message': 'Book added successfully', 'book_id': book.id}), 201
     except Exception as e:
-        current_app.logger.error(f"Error adding book: {e}")
+        current_app.logger.error("Error adding book: %s", e)
         return jsonify({'error': 'Internal server error'}), 500
 
 
+def _import_format():
+    """Works out whether an import upload is NDJSON or CSV."""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt.lower()
+    mimetype = request.mimetype
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json'):
+        return 'ndjson'
+    if mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    return None
+
+
+def _read_import_records(fmt):
+    """Yields (row number, record) pairs from the request body without buffering it.
+
+    Records that cannot be parsed are yielded as (row number, None).
+    """
+    if fmt == 'ndjson':
+        loads = current_app.json.loads
+        row = 0
+        for line in request.stream:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                yield row, loads(line)
+            except ValueError:
+                yield row, None
+    else:
+        text = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        for row, record in enumerate(csv.DictReader(text), start=1):
+            yield row, record
+
+
+def _insert_batch(rows):
+    """Inserts a batch of validated rows in one transaction and queues their enrichment.
+
+    Returns:
+        int: The number of books inserted; the rest were already in their owners' collections.
+    """
+    inserted = _insert_new_books(rows)
+    enqueue_enrichment((book.id, book.user_id, book.title, book.author) for book in inserted)
+    apply_stats_changes(added=[key for book in inserted for key in book_stat_keys(book)])
+    bump_collection_versions(book.user_id for book in inserted)
+    db.session.commit()
+    return len(inserted)
+
+
+@books_bp.route('/books/import', methods=['POST'])
+def import_books():
+    """Bulk import books from an NDJSON or CSV upload."""
+    fmt = _import_format()
+    if fmt not in IMPORT_FORMATS:
+        current_app.logger.warning("Book import rejected: unsupported format '%s'.", fmt)
+        return jsonify({'error': 'Unsupported import format. Use ndjson or csv.'}), 400
+
+    default_user_id, error = _caller_user_id(request.args.get('user_id'))
+    if error:
+        current_app.logger.warning("Book import rejected: %s", error)
+        return jsonify({'error': error}), 403
+
+    try:
+        default_user_id = int(default_user_id or 1)
+        max_batch_size = current_app.config.get('IMPORT_MAX_BATCH_SIZE', 5000)
+        batch_size = int(request.args.get('batch_size', current_app.config.get('IMPORT_BATCH_SIZE', 500)))
+    except ValueError:
+        current_app.logger.warning("Book import rejected: user_id and batch_size must be integers.")
+        return jsonify({'error': 'user_id and batch_size must be integers'}), 400
+    if not 1 <= batch_size <= max_batch_size:
+        current_app.logger.warning("Book import rejected: invalid batch_size %s.", batch_size)
+        return jsonify({'error': f'batch_size must be between 1 and {max_batch_size}'}), 400
+
+    current_app.logger.info("Importing books from %s in batches of %s.", fmt, batch_size)
+    max_errors = current_app.config.get('IMPORT_MAX_ERRORS', 1000)
+    imported = 0
+    duplicates = 0
+    failed = 0
+    errors = []
+
+    def record_error(row, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < max_errors:
+            errors.append({'row': row, 'error': message})
+
+    def flush(batch):
+        nonlocal imported, duplicates
+        try:
+            inserted = _insert_batch([values for _, values in batch])
+            imported += inserted
+            duplicates += len(batch) - inserted
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error("Error importing batch of %s books: %s", len(batch), e)
+            for row, _ in batch:
+                record_error(row, 'Database error')
+
+    batch = []
+    try:
+        for row, record in _read_import_records(fmt):
+            if record is None:
+                record_error(row, 'Invalid JSON')
+                continue
+            values, error = _validate_book(record, default_user_id)
+            if not error:
+                _, error = _caller_user_id(values['user_id'])
+            if error:
+                record_error(row, error)
+                continue
+            batch.append((row, values))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        current_app.logger.warning("Book import stopped: malformed upload: %s", e)
+        if batch:
+            flush(batch)
+        return jsonify({
+            'error': 'Malformed upload',
+            'imported': imported,
+            'duplicates': duplicates,
+            'failed': failed,
+            'errors': errors,
+        }), 400
+    if batch:
+        flush(batch)
+
+    current_app.logger.info("Book import finished: %s imported, %s duplicates, %s failed.",
+                            imported, duplicates, failed)
+    return jsonify({
+        'message': 'Import completed',
+        'imported': imported,
+        'duplicates': duplicates,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors),
+    }), 200
+
+
 @books_bp.route('/books/<int:book_id>', methods=['GET'])
 def get_book(book_id):
     """Retrieve a book by its ID."""
-    current_app.logger.info(f"Attempting to retrieve book with ID: {book_id}")
-    book = db.session.get(Book, book_id)
+    current_app.logger.debug("Attempting to retrieve book with ID: %s", book_id)
+    book = _get_owned_book(book_id, read_only=True)
     if not book:
-        current_app.logger.warning(f"Book with ID {book_id} not found.")
+        current_app.logger.warning("Book with ID %s not found.", book_id)
         return jsonify({'error': 'Book not found'}), 404
 
-    current_app.logger.info(f"Book retrieved: {book.title} by {book.author}, ID: {book.id}")
-    return jsonify({
-        'id': book.id,
-        'title': book.title,
-        'author': book.author,
-        'year': book.year,
-        'status': book.status,
-        'cover_image': book.cover_image,
-        'summary': book.summary
-    })
+    etag = f'book-{book.id}-v{book.version}'
+    not_modified = _not_modified(etag, book.updated_at)
+    if not_modified:
+        current_app.logger.info("Book ID %s not modified.", book.id)
+        return not_modified
+
+    current_app.logger.info("Book retrieved: %s by %s, ID: %s", book.title, book.author, book.id)
+    return _set_validators(jsonify(_book_to_dict(book)), etag, book.updated_at)
 
 
 @books_bp.route('/books/<int:book_id>', methods=['PUT'])
 def update_reading_status(book_id):
     """Update the reading status of a book."""
-    current_app.logger.info(f"Attempting to update reading status for book ID: {book_id}")
-    book = db.session.get(Book, book_id)
+    current_app.logger.debug("Attempting to update reading status for book ID: %s", book_id)
+    book = _get_owned_book(book_id)
     if not book:
-        current_app.logger.warning(f"Book with ID {book_id} not found.")
+        current_app.logger.warning("Book with ID %s not found.", book_id)
         return jsonify({'error': 'Book not found'}), 404
 
     data = request.json
     status = data.get('status')
-    if status not in ['read', 'unread']:
-        current_app.logger.warning(f"Invalid status '{status}' provided for book ID: {book_id}")
+    if status not in BOOK_STATUSES:
+        current_app.logger.warning("Invalid status '%s' provided for book ID: %s", status, book_id)
         return jsonify({'error': 'Invalid status. Use "read" or "unread".'}), 400
 
-    book.status = status
-    db.session.commit()
-    current_app.logger.info(f"Reading status updated to '{status}' for book ID: {book_id}")
+    if book.status != status:
+        apply_stats_changes(added=[(book.user_id, 'status', status)], removed=[(book.user_id, 'status', book.status)])
+        book.status = status
+        bump_collection_versions([book.user_id])
+        db.session.commit()
+    current_app.logger.info("Reading status updated to '%s' for book ID: %s", status, book_id)
     return jsonify({'message': 'Reading status updated'})
 
 
 @books_bp.route('/books/<int:book_id>', methods=['DELETE'])
 def delete_book(book_id):
     """Delete a book from the database."""
-    current_app.logger.info(f"Attempting to delete book with ID: {book_id}")
-    book = db.session.get(Book, book_id)
+    current_app.logger.debug("Attempting to delete book with ID: %s", book_id)
+    book = _get_owned_book(book_id)
     if not book:
-        current_app.logger.warning(f"Book with ID {book_id} not found for deletion.")
+        current_app.logger.warning("Book with ID %s not found for deletion.", book_id)
         return jsonify({'error': 'Book not found'}), 404
 
     db.session.delete(book)
+    apply_stats_changes(removed=book_stat_keys(book))
+    bump_collection_versions([book.user_id])
     db.session.commit()
-    current_app.logger.info(f"Book with ID {book_id} deleted successfully.")
+    current_app.logger.info("Book with ID %s deleted successfully.", book_id)
     return jsonify({'message': 'Book deleted successfully'})
 
 
-@books_bp.route('/books/details', methods=['GET'])
-def get_book_details():
-    """Fetch book details from the Google Books API."""
-    title = request.args.get('title')
-    if not title:
-        current_app.logger.warning("Book details fetch failed: No title provided.")
-        return jsonify({'error': 'Title is required'}), 400
+@books_bp.route('/books', methods=['GET'])
+def get_books():
+    """Retrieve several books by ID with a single query."""
+    raw = request.args.get('ids', '')
+    ids = _parse_book_ids(raw.split(',')) if raw else []
+    error = _check_batch_size(ids)
+    if error:
+        current_app.logger.warning("Batch book fetch failed: %s", error)
+        return jsonify({'error': error}), 400
+
+    current_app.logger.debug("Retrieving a batch of %s books.", len(ids))
+    valid_ids = [book_id for book_id in ids if book_id is not None]
+    books = {}
+    if valid_ids:
+        stmt = _owned_books_query([Book], valid_ids)
+        books = {book.id: book for book in db.session.scalars(stmt, bind_arguments=read_bind_arguments())}
+
+    results = []
+    for value, book_id in zip(raw.split(','), ids):
+        if book_id is None:
+            results.append({'id': value, 'status': 400, 'error': 'Invalid book ID'})
+        elif book_id not in books:
+            results.append({'id': book_id, 'status': 404, 'error': 'Book not found'})
+        else:
+            results.append({'id': book_id, 'status': 200, 'book': _book_to_dict(books[book_id])})
+
+    current_app.logger.info("Batch book fetch: %s requested, %s found.", len(ids), len(books))
+    return jsonify({'results': results}), 200
+
+
+@books_bp.route('/books/status', methods=['PATCH'])
+def update_reading_statuses():
+    """Update the reading status of several books in one transaction."""
+    data = request.json
+    values = data.get('ids') if isinstance(data, dict) else None
+    status = data.get('status') if isinstance(data, dict) else None
+    if not isinstance(values, list):
+        current_app.logger.warning("Batch status update failed: No ids provided.")
+        return jsonify({'error': 'ids must be a non-empty list'}), 400
+    error = _check_batch_size(values)
+    if error:
+        current_app.logger.warning("Batch status update failed: %s", error)
+        return jsonify({'error': error}), 400
+    if status not in BOOK_STATUSES:
+        current_app.logger.warning("Invalid status '%s' provided for batch status update.", status)
+        return jsonify({'error': 'Invalid status. Use "read" or "unread".'}), 400
+
+    ids = _parse_book_ids(values)
+    valid_ids = [book_id for book_id in ids if book_id is not None]
+    current_app.logger.debug("Updating reading status to '%s' for %s books.", status, len(valid_ids))
+    found = {}
+    if valid_ids:
+        stmt = _owned_books_query([Book.id, Book.user_id, Book.status], valid_ids)
+        found = {row.id: row for row in db.session.execute(stmt)}
+
+    # Books that already have the status are left alone, as in the single-book route
+    changed = [row for row in found.values() if row.status != status]
+    if changed:
+        db.session.execute(
+            db.update(Book).where(Book.id.in_([row.id for row in changed])).values(status=status),
+            execution_options={'synchronize_session': False},
+        )
+        apply_stats_changes(added=[(row.user_id, 'status', status) for row in changed],
+                            removed=[(row.user_id, 'status', row.status) for row in changed])
+        bump_collection_versions({row.user_id for row in changed})
+    db.session.commit()
+
+    results = []
+    for value, book_id in zip(values, ids):
+        if book_id is None:
+            results.append({'id': value, 'status': 400, 'error': 'Invalid book ID'})
+        elif book_id not in found:
+            results.append({'id': book_id, 'status': 404, 'error': 'Book not found'})
+        else:
+            results.append({'id': book_id, 'status': 200, 'message': 'Reading status updated'})
+
+    current_app.logger.info("Batch status update to '%s': %s found, %s changed.", status, len(found), len(changed))
+    return jsonify({'results': results}), 200
+
+
+def _details_cache_key(title):
+    """Normalizes a title so that trivially different queries share a cache entry."""
+    return ' '.join(title.split()).casefold()
+
+
+def _get_details_cache():
+    """Returns the Google Books details cache for the current app, creating it on first use."""
+    cache = current_app.extensions.get('details_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('details_cache', TTLCache(
+            max_size=current_app.config.get('DETAILS_CACHE_MAX_SIZE', 1024),
+            ttl=current_app.config.get('DETAILS_CACHE_TTL', 3600),
+            negative_ttl=current_app.config.get('DETAILS_CACHE_NEGATIVE_TTL', 300),
+        ))
+    return cache
+
+
+def _get_http_client():
+    """Returns the shared outbound HTTP client for the current app, creating it on first use."""
+    client = current_app.extensions.get('http_client')
+    if client is None:
+        client = current_app.extensions.setdefault('http_client', create_http_client(current_app.config))
+    return client
+
+
+def _get_details_executor():
+    """Returns the bounded thread pool used for concurrent detail lookups."""
+    executor = current_app.extensions.get('details_executor')
+    if executor is None:
+        executor = current_app.extensions.setdefault('details_executor', ThreadPoolExecutor(
+            max_workers=current_app.config.get('DETAILS_BATCH_WORKERS', 16),
+            thread_name_prefix='details-batch'
+        ))
+    return executor
+
+
+def _fetch_book_details(query):
+    """Queries the Google Books API for a title.
+
+    Args:
+        query (str): The normalized title to search for.
+
+    Returns:
+        tuple: The response body and HTTP status code to send to the client.
+    """
+    import requests
+
+    current_app.logger.debug("Fetching details from Google Books API for title: %s", query)
+    upstream_latency = get_metrics().upstream_latency
+    started_at = time.perf_counter()
+    try:
+        response = _get_http_client().get(current_app.config.get('GOOGLE_BOOKS_API_URL', GOOGLE_BOOKS_API_URL),
+                                          params={'q': query})
+    except requests.RequestException as e:
+        upstream_latency.observe(time.perf_counter() - started_at, 'google_books', 'error')
+        current_app.logger.error("Failed to fetch book details: %s", e)
+        return {'error': 'Failed to fetch book details'}, 500
+    upstream_latency.observe(time.perf_counter() - started_at, 'google_books', str(response.status_code))
 
-    current_app.logger.info(f"Fetching details from Google Books API for title: {title}")
-    response = requests.get(GOOGLE_BOOKS_API_URL, params={'q': title})
     if response.status_code != 200:
-        current_app.logger.error(f"Failed to fetch book details: API returned {response.status_code}")
-        return jsonify({'error': 'Failed to fetch book details'}), 500
+        current_app.logger.error("Failed to fetch book details: API returned %s", response.status_code)
+        return {'error': 'Failed to fetch book details'}, 500
 
     data = response.json()
     if 'items' not in data or not data['items']:
-        current_app.logger.warning(f"No details found for title: {title}")
-        return jsonify({'error': 'No book details found'}), 404
+        current_app.logger.warning("No details found for title: %s", query)
+        return {'error': 'No book details found'}, 404
 
     book_data = data['items'][0]['volumeInfo']
-    current_app.logger.info(f"Details fetched for title: {title}")
-    return jsonify({
+    current_app.logger.info("Details fetched for title: %s", query)
+    return {
         'title': book_data.get('title'),
         'author': ', '.join(book_data.get('authors', [])),
         'published_date': book_data.get('publishedDate'),
         'summary': book_data.get('description'),
         'cover_image': book_data.get('imageLinks', {}).get('thumbnail')
-    })
+    }, 200
+
+
+def _lookup_book_details(title, rate_limiter=None):
+    """Returns book details for a title, going through the details cache.
+
+    Successful lookups are cached for the cache TTL and "not found" results for
+    the shorter negative TTL. Upstream failures are never cached.
+
+    Args:
+        title (str): The title as supplied by the client, or a Google Books query.
+        rate_limiter (RateLimiter): Taken from before each upstream call, if given.
+
+    Returns:
+        tuple: The response body and HTTP status code to send to the client.
+    """
+    cache = _get_details_cache()
+    key = _details_cache_key(title)
+
+    def load():
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        body, status = _fetch_book_details(key)
+        if status == 200:
+            return (body, status), cache.ttl
+        if status == 404:
+            return (body, status), cache.negative_ttl
+        return (body, status), None
+
+    return cache.get_or_load(key, load)
+
+
+@books_bp.route('/books/details', methods=['GET'])
+def get_book_details():
+    """Fetch book details from the Google Books API."""
+    title = request.args.get('title')
+    if not title or not title.strip():
+        current_app.logger.warning("Book details fetch failed: No title provided.")
+        return jsonify({'error': 'Title is required'}), 400
+
+    body, status = _lookup_book_details(title)
+    return jsonify(body), status
+
+
+@books_bp.route('/books/details/batch', methods=['POST'])
+def get_book_details_batch():
+    """Fetch details for several titles from the Google Books API concurrently."""
+    data = request.json
+    titles = data.get('titles') if isinstance(data, dict) else None
+    if not isinstance(titles, list) or not titles:
+        current_app.logger.warning("Batch details fetch failed: No titles provided.")
+        return jsonify({'error': 'titles must be a non-empty list'}), 400
+
+    max_titles = current_app.config.get('DETAILS_BATCH_MAX_TITLES', 50)
+    if len(titles) > max_titles:
+        current_app.logger.warning("Batch details fetch failed: %s titles exceeds the limit of %s.", len(titles), max_titles)
+        return jsonify({'error': f'At most {max_titles} titles may be requested at once'}), 400
+
+    if not all(isinstance(title, str) and title.strip() for title in titles):
+        current_app.logger.warning("Batch details fetch failed: Invalid title in batch.")
+        return jsonify({'error': 'Every title must be a non-empty string'}), 400
+
+    current_app.logger.info("Fetching details for a batch of %s titles.", len(titles))
+    app = current_app._get_current_object()
+
+    def lookup(title):
+        with app.app_context():
+            return _lookup_book_details(title)
+
+    results = []
+    for title, (body, status) in zip(titles, _get_details_executor().map(lookup, titles)):
+        results.append({'title': title, 'status': status, **({'details': body} if status == 200 else body)})
+
+    return jsonify({'results': results}), 200
+
+
+def _get_cover_store():
+    """Returns the on-disk cover image store for the current app, creating it on first use."""
+    store = current_app.extensions.get('cover_store')
+    if store is None:
+        root = current_app.config.get('COVER_CACHE_DIR') or os.path.join(current_app.instance_path, 'covers')
+        store = current_app.extensions.setdefault('cover_store', CoverStore(
+            root, max_bytes=current_app.config.get('COVER_CACHE_MAX_BYTES', 256 * 1024 * 1024)))
+    return store
+
+
+def _get_cover_downloads():
+    """Returns the table that collapses concurrent downloads of the same cover into one."""
+    downloads = current_app.extensions.get('cover_downloads')
+    if downloads is None:
+        downloads = current_app.extensions.setdefault('cover_downloads', SingleFlight())
+    return downloads
+
+
+def _download_cover(url):
+    """Downloads a cover image into the cover store.
+
+    Args:
+        url (str): The image's source URL.
+
+    Returns:
+        str: An error message, or None once the image is stored.
+    """
+    import requests
+
+    max_bytes = current_app.config.get('COVER_MAX_DOWNLOAD_BYTES', 5 * 1024 * 1024)
+    upstream_latency = get_metrics().upstream_latency
+    started_at = time.perf_counter()
+    try:
+        with _get_http_client().get(url, stream=True) as response:
+            upstream_latency.observe(time.perf_counter() - started_at, 'covers', str(response.status_code))
+            content_type = response.headers.get('Content-Type', '')
+            if response.status_code != 200 or not content_type.startswith('image/'):
+                current_app.logger.error("Failed to fetch cover %s: got %s %s", url, response.status_code, content_type)
+                return 'Failed to fetch cover image'
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > max_bytes:
+                    current_app.logger.warning("Cover %s is larger than %s bytes.", url, max_bytes)
+                    return 'Cover image is too large'
+    except requests.RequestException as e:
+        upstream_latency.observe(time.perf_counter() - started_at, 'covers', 'error')
+        current_app.logger.error("Failed to fetch cover %s: %s", url, e)
+        return 'Failed to fetch cover image'
+
+    _get_cover_store().store(url, bytes(data), content_type)
+    current_app.logger.info("Cover %s cached (%s bytes).", url, len(data))
+    return None
+
+
+@books_bp.route('/books/<int:book_id>/cover', methods=['GET'])
+def get_book_cover(book_id):
+    """Serve a book's cover image from the local cover cache."""
+    size = request.args.get('size', 'original')
+    if size not in COVER_SIZE_NAMES:
+        current_app.logger.warning("Cover request for book ID %s rejected: invalid size '%s'.", book_id, size)
+        return jsonify({'error': f'Invalid size. Use one of: {", ".join(COVER_SIZE_NAMES)}.'}), 400
+
+    book = _get_owned_book(book_id, read_only=True)
+    if not book:
+        current_app.logger.warning("Book with ID %s not found.", book_id)
+        return jsonify({'error': 'Book not found'}), 404
+    if not book.cover_image:
+        current_app.logger.info("Book ID %s has no cover image.", book_id)
+        return jsonify({'error': 'Book has no cover image'}), 404
+
+    store = _get_cover_store()
+    url = book.cover_image
+    path = store.lookup(url, size)
+    get_metrics().response_cache_lookups.inc('cover', 'miss' if path is None else 'hit')
+    if path is None:
+        current_app.logger.debug("Cover for book ID %s is not cached; downloading it.", book_id)
+        error = _get_cover_downloads().do(url, lambda: _download_cover(url))
+        if error:
+            return jsonify({'error': error}), 502
+        path = store.lookup(url, size)
+        if path is None:
+            current_app.logger.warning("Cover for book ID %s was evicted before it could be served.", book_id)
+            return jsonify({'error': 'Cover image is being refreshed, try again'}), 503
+
+    try:
+        # The file name is the image's digest and size, so it doubles as a strong ETag
+        response = send_file(path, max_age=current_app.config.get('COVER_CACHE_MAX_AGE', 604800),
+                             etag=os.path.basename(path).split('.')[0], last_modified=book.updated_at)
+    except FileNotFoundError:
+        current_app.logger.warning("Cover for book ID %s was evicted before it could be served.", book_id)
+        return jsonify({'error': 'Cover image is being refreshed, try again'}), 503
+    current_app.logger.info("Cover of book ID %s served at size %s.", book_id, size)
+    return response
+
+
+def _parse_collection_fields(raw):
+    """Parses the ``fields`` query parameter of the collection route.
+
+    Args:
+        raw (str): A comma-separated list of field names, or None.
+
+    Returns:
+        list: The requested field names in order, or None if any is unknown.
+    """
+    if not raw:
+        return list(DEFAULT_COLLECTION_FIELDS)
+    fields = []
+    for name in raw.split(','):
+        name = name.strip()
+        if name not in COLLECTION_FIELDS:
+            return None
+        if name not in fields:
+            fields.append(name)
+    return fields or None
+
+
+def _parse_collection_sort(raw):
+    """Parses the ``sort`` query parameter of the collection route.
+
+    Args:
+        raw (str): A name from COLLECTION_SORTS, optionally prefixed with '-', or None.
+
+    Returns:
+        tuple: The column name and whether it sorts descending, or None if the name is unknown.
+    """
+    raw = raw or 'id'
+    descending = raw.startswith('-')
+    name = raw[1:] if descending else raw
+    return (name, descending) if name in COLLECTION_SORTS else None
+
+
+def _encode_cursor(sort, row):
+    """Returns the ``next_after`` cursor that continues a collection after ``row``.
+
+    Pages sorted by ID continue from the plain book ID. Other sorts need the
+    sort value as well, and get an opaque token holding both.
+    """
+    name, _ = sort
+    if name == 'id':
+        return row.id
+    data = json.dumps([row._mapping[name], row.id]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _decode_cursor(sort, raw):
+    """Parses the ``after`` query parameter made by _encode_cursor.
+
+    Returns:
+        tuple: The sort value and book ID to continue after, or None if ``raw`` is not a cursor for ``sort``.
+    """
+    name, _ = sort
+    if name == 'id':
+        return (None, int(raw)) if raw.isascii() and raw.isdigit() else None
+    try:
+        value, book_id = json.loads(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(value, str) or not isinstance(book_id, int):
+        return None
+    if name == 'year' and value and not (value.isascii() and value.isdigit()):
+        return None
+    return value, book_id
+
+
+def _collection_filters(args):
+    """Parses the filter query parameters of the collection route.
+
+    ``status`` and ``author`` match exactly, and ``year_from`` and ``year_to``
+    bound the publication year inclusively. Each is served by an index that
+    starts with ``user_id``, so a filtered read never scans other rows.
+
+    Returns:
+        tuple: A list of SQL conditions and None, or None and an error message.
+    """
+    conditions = []
+    status = args.get('status')
+    if status is not None:
+        if status not in BOOK_STATUSES:
+            return None, f"status must be one of: {', '.join(BOOK_STATUSES)}"
+        conditions.append(Book.status == status)
+    author = args.get('author')
+    if author is not None:
+        conditions.append(Book.author == author)
+    for name in ('year_from', 'year_to'):
+        value = args.get(name)
+        if value is None:
+            continue
+        if not (value.isascii() and value.isdigit()):
+            return None, f'{name} must be a non-negative integer'
+        conditions.append(Book.year >= int(value) if name == 'year_from' else Book.year <= int(value))
+    return conditions, None
+
+
+def _collection_query(user_id, fields, after=None, limit=None, conditions=(), sort=('id', False)):
+    """Builds a column-only, keyset-ordered select over a user's books.
+
+    The book ID is always selected as the first column, whether or not it was
+    requested, because it is the pagination cursor, together with the sort
+    column. Books tied on the sort column are ordered by ID, and books without
+    a year sort before every known year.
+
+    Args:
+        user_id (int): The owner of the books.
+        fields (list): The columns to return.
+        after (tuple): A cursor from _decode_cursor to continue after, or None.
+        limit (int): The page size, or None for every book.
+        conditions (list): Filters from _collection_filters.
+        sort (tuple): The sort column name and whether it sorts descending.
+    """
+    name, descending = sort
+    columns = [Book.id] + [getattr(Book, field) for field in dict.fromkeys([*fields, name]) if field != 'id']
+    stmt = db.select(*columns).where(Book.user_id == user_id, *conditions)
+
+    column = getattr(Book, name)
+    if name == 'id':
+        stmt = stmt.order_by(Book.id.desc() if descending else Book.id)
+    elif name == 'year':
+        stmt = stmt.order_by(column.desc().nulls_last() if descending else column.nulls_first(),
+                             Book.id.desc() if descending else Book.id)
+    else:
+        stmt = stmt.order_by(column.desc() if descending else column, Book.id.desc() if descending else Book.id)
+
+    if after is not None:
+        value, book_id = after
+        id_after = Book.id < book_id if descending else Book.id > book_id
+        if name == 'id':
+            stmt = stmt.where(id_after)
+        elif value in (None, ''):
+            # Only years are ever unknown, and unknown years come first
+            stmt = stmt.where(db.and_(column.is_(None), id_after) if descending
+                              else db.or_(column.is_not(None), id_after))
+        else:
+            # A row-value comparison, so the index range starts at the cursor
+            position, cursor = db.tuple_(column, Book.id), db.tuple_(db.literal(value, column.type), book_id)
+            beyond = position < cursor if descending else position > cursor
+            stmt = stmt.where(db.or_(beyond, column.is_(None)) if descending and name == 'year' else beyond)
+    if limit is not None:
+        # Fetch one extra row to find out whether there is another page.
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def _stream_collection(stmt, fields, limit, bind_arguments, sort=('id', False)):
+    """Yields the collection response as JSON text, one partition of rows at a time."""
+    dumps = current_app.json.dumps
+    batch_size = current_app.config.get('COLLECTION_STREAM_BATCH_SIZE', 500)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size), bind_arguments=bind_arguments)
+
+    yield '{"collection":['
+    count = 0
+    last_row = None
+    has_more = False
+    for rows in result.partitions():
+        chunk = []
+        for row in rows:
+            if limit is not None and count == limit:
+                has_more = True
+                break
+            item = dict(zip(fields, (row._mapping[name] for name in fields)))
+            chunk.append(dumps(item))
+            last_row = row
+            count += 1
+        if chunk:
+            yield (',' if count > len(chunk) else '') + ','.join(chunk)
+        if has_more:
+            break
+    result.close()
+
+    if limit is None:
+        yield ']}'
+    else:
+        yield '],"next_after":' + dumps(_encode_cursor(sort, last_row) if has_more else None) + '}'
+
+
+def _collection_validators(user_id, bind_arguments, kind='collection'):
+    """Works out the ETag and Last-Modified of a collection response from the collection version alone.
+
+    The ETag also covers the query parameters, since they shape the body, and
+    ``kind``, which tells apart the different routes reading a collection.
+
+    Returns:
+        tuple: The ETag and the epoch seconds of the last change, or None
+            if the collection has never been written to.
+    """
+    row = db.session.execute(
+        db.select(CollectionVersion.version, CollectionVersion.updated_at)
+        .where(CollectionVersion.user_id == user_id),
+        bind_arguments=bind_arguments
+    ).first()
+    version, last_modified = (row.version, row.updated_at) if row else (0, None)
+    variant = hashlib.blake2b(str(sorted(request.args.items(multi=True))).encode(), digest_size=6).hexdigest()
+    return f'{kind}-{user_id}-v{version}-{variant}', last_modified
+
+
+def _get_response_cache():
+    """Returns the collection response cache for the current app, or None if it is disabled.
+
+    The cache is created on first use and reports its hit ratio in the app's metrics.
+    """
+    extensions = current_app.extensions
+    if 'response_cache' not in extensions:
+        cache = create_response_cache(current_app.config)
+        if cache is not None:
+            get_metrics().registry.gauge(
+                'response_cache_hit_ratio', 'Fraction of collection response cache lookups that were hits.',
+                cache.hit_ratio)
+        extensions.setdefault('response_cache', cache)
+    return extensions['response_cache']
 
 
 @books_bp.route('/books/collection', methods=['GET'])
 def get_collection():
-    """Retrieve the user's book collection."""
-    user_id = request.args.get('user_id')
+    """Retrieve the user's book collection, optionally filtered, sorted, paginated, projected or streamed."""
+    user_id, error = _caller_user_id(request.args.get('user_id'))
+    if error:
+        current_app.logger.warning("Collection request rejected: %s", error)
+        return jsonify({'error': error}), 403
     if not user_id:
         current_app.logger.warning("Attempted to retrieve collection without user_id.")
         return jsonify({'error': 'user_id is required'}), 400
 
-    current_app.logger.info(f"Retrieving book collection for user_id: {user_id}")
-    user_books = Book.query.filter_by(user_id=user_id).all()
+    try:
+        user_id = int(user_id)
+        limit = None if request.args.get('limit') is None else int(request.args['limit'])
+    except ValueError:
+        current_app.logger.warning("Collection request rejected: user_id and limit must be integers.")
+        return jsonify({'error': 'user_id and limit must be integers'}), 400
+
+    max_limit = current_app.config.get('COLLECTION_MAX_LIMIT', 1000)
+    if limit is not None and not 1 <= limit <= max_limit:
+        current_app.logger.warning("Collection request rejected: invalid limit %s.", limit)
+        return jsonify({'error': f'limit must be between 1 and {max_limit}'}), 400
+
+    fields = _parse_collection_fields(request.args.get('fields'))
+    if fields is None:
+        current_app.logger.warning("Collection request rejected: invalid fields '%s'.", request.args.get('fields'))
+        return jsonify({'error': f"fields must be a comma-separated subset of: {', '.join(COLLECTION_FIELDS)}"}), 400
+
+    sort = _parse_collection_sort(request.args.get('sort'))
+    if sort is None:
+        current_app.logger.warning("Collection request rejected: invalid sort '%s'.", request.args.get('sort'))
+        return jsonify({'error': f"sort must be one of {', '.join(COLLECTION_SORTS)}, optionally prefixed with '-'"}), 400
+
+    after = request.args.get('after')
+    if after is not None:
+        after = _decode_cursor(sort, after)
+        if after is None:
+            current_app.logger.warning("Collection request rejected: invalid cursor '%s'.", request.args.get('after'))
+            return jsonify({'error': 'after must be the next_after value of the previous page'}), 400
+
+    conditions, error = _collection_filters(request.args)
+    if error:
+        current_app.logger.warning("Collection request rejected: %s", error)
+        return jsonify({'error': error}), 400
+
+    # Read the version and the rows from the same database, so the ETag describes the body
+    bind_arguments = read_bind_arguments()
+    etag, last_modified = _collection_validators(user_id, bind_arguments)
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        current_app.logger.info("Collection of user_id %s not modified.", user_id)
+        return not_modified
+
+    stmt = _collection_query(user_id, fields, after, limit, conditions, sort)
+
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        current_app.logger.info("Streaming book collection for user_id: %s", user_id)
+        response = Response(stream_with_context(_stream_collection(stmt, fields, limit, bind_arguments, sort)),
+                            mimetype='application/json')
+        return _set_validators(response, etag, last_modified)
+
+    # The ETag names this exact body: a write bumps the version and moves on to a new key
+    cache = _get_response_cache()
+    if cache is not None:
+        cached = cache.get(etag)
+        get_metrics().response_cache_lookups.inc('collection', 'miss' if cached is None else 'hit')
+        if cached is not None:
+            current_app.logger.info("Collection of user_id %s served from cache.", user_id)
+            return _set_validators(Response(cached, mimetype='application/json'), etag, last_modified), 200
+
+    current_app.logger.debug("Retrieving book collection for user_id: %s", user_id)
+    rows = db.session.execute(stmt, bind_arguments=bind_arguments).all()
+
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+    book_list = [{name: row._mapping[name] for name in fields} for row in rows]
+
+    current_app.logger.info("Collection retrieved for user_id: %s, total books: %s", user_id, len(book_list))
+    if limit is None:
+        response = jsonify({'collection': book_list})
+    else:
+        response = jsonify({'collection': book_list, 'next_after': _encode_cursor(sort, rows[-1]) if has_more else None})
+    if cache is not None:
+        cache.set(etag, response.get_data())
+    return _set_validators(response, etag, last_modified), 200
+
+
+@books_bp.route('/books/stats', methods=['GET'])
+def get_collection_stats():
+    """Retrieve counts of the user's books by status, author and year."""
+    user_id, error = _caller_user_id(request.args.get('user_id'))
+    if error:
+        current_app.logger.warning("Stats request rejected: %s", error)
+        return jsonify({'error': error}), 403
+    if not user_id:
+        current_app.logger.warning("Attempted to retrieve stats without user_id.")
+        return jsonify({'error': 'user_id is required'}), 400
+
+    try:
+        user_id = int(user_id)
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        current_app.logger.warning("Stats request rejected: user_id and top must be integers.")
+        return jsonify({'error': 'user_id and top must be integers'}), 400
+    if not 1 <= top <= STATS_MAX_TOP_AUTHORS:
+        current_app.logger.warning("Stats request rejected: invalid top %s.", top)
+        return jsonify({'error': f'top must be between 1 and {STATS_MAX_TOP_AUTHORS}'}), 400
+
+    bind_arguments = read_bind_arguments()
+    etag, last_modified = _collection_validators(user_id, bind_arguments, kind='stats')
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        current_app.logger.info("Stats of user_id %s not modified.", user_id)
+        return not_modified
+
+    current_app.logger.debug("Retrieving collection stats for user_id: %s", user_id)
+    counted = db.select(CollectionStat.dimension, CollectionStat.value, CollectionStat.book_count).where(
+        CollectionStat.user_id == user_id, CollectionStat.book_count > 0)
+    rows = db.session.execute(
+        counted.where(CollectionStat.dimension.in_(('status', 'year'))), bind_arguments=bind_arguments).all()
+    authors = db.session.execute(
+        counted.where(CollectionStat.dimension == 'author')
+        .order_by(CollectionStat.book_count.desc(), CollectionStat.value).limit(top),
+        bind_arguments=bind_arguments
+    ).all()
+
+    by_status = {row.value: row.book_count for row in rows if row.dimension == 'status'}
+    by_year = {row.value: row.book_count for row in sorted(rows, key=lambda row: row.value) if row.dimension == 'year'}
+    current_app.logger.info("Stats retrieved for user_id: %s", user_id)
+    return _set_validators(jsonify({
+        'user_id': user_id,
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'by_year': by_year,
+        'top_authors': [{'author': row.value, 'count': row.book_count} for row in authors],
+    }), etag, last_modified), 200
+
+
+def _export_chunks(user_id, fmt):
+    """Yields a user's books as encoded NDJSON or CSV, one cursor partition at a time.
+
+    Rows come straight from a column-only select with ``yield_per``, so no ORM
+    objects are built and only one partition is held in memory.
+    """
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    stmt = _collection_query(user_id, EXPORT_FIELDS).execution_options(yield_per=batch_size)
+    result = db.session.execute(stmt, bind_arguments=read_bind_arguments())
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for rows in result.partitions():
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    else:
+        dumps = current_app.json.dumps
+        for rows in result.partitions():
+            yield ''.join(dumps(row._asdict()) + '\n' for row in rows).encode('utf-8')
+    result.close()
+
+
+@books_bp.route('/books/export', methods=['GET'])
+def export_collection():
+    """Stream the user's whole collection as NDJSON or CSV."""
+    user_id, error = _caller_user_id(request.args.get('user_id'))
+    if error:
+        current_app.logger.warning("Collection export rejected: %s", error)
+        return jsonify({'error': error}), 403
+    if not user_id:
+        current_app.logger.warning("Attempted to export collection without user_id.")
+        return jsonify({'error': 'user_id is required'}), 400
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        current_app.logger.warning("Collection export rejected: invalid user_id '%s'.", user_id)
+        return jsonify({'error': 'user_id must be an integer'}), 400
+
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        current_app.logger.warning("Collection export rejected: unsupported format '%s'.", fmt)
+        return jsonify({'error': 'Unsupported export format. Use ndjson or csv.'}), 400
+
+    current_app.logger.info("Exporting book collection for user_id: %s as %s", user_id, fmt)
+    chunks = _export_chunks(user_id, fmt)
+    headers = {'Content-Disposition': f'attachment; filename=books-{user_id}.{fmt}'}
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        chunks = gzip_chunks(chunks, current_app.config.get('EXPORT_GZIP_LEVEL', 6))
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+
+def _search_index_available():
+    """Returns True if the full-text index exists, checking the database once per app."""
+    available = current_app.extensions.get('search_index')
+    if available is None:
+        available = current_app.extensions.setdefault('search_index', has_search_index(db.session.connection()))
+    return available
+
+
+def _highlight_html(text):
+    """Escapes a highlight or snippet for HTML and marks its matches with SEARCH_HIGHLIGHT."""
+    if text is None:
+        return None
+    html = str(escape(text))
+    return html.replace(_HIGHLIGHT_SENTINELS[0], SEARCH_HIGHLIGHT[0]).replace(_HIGHLIGHT_SENTINELS[1], SEARCH_HIGHLIGHT[1])
+
+
+def _search_fts(user_id, text, limit, offset):
+    """Runs a ranked full-text search; returns up to ``limit + 1`` result rows."""
+    match = fts_query(text)
+    if not match:
+        return []
+    return db.session.execute(db.text(
+        """
+        SELECT b.id, b.title, b.author, b.year, b.status,
+               highlight(books_fts, 0, :open, :close) AS title_highlight,
+               highlight(books_fts, 1, :open, :close) AS author_highlight,
+               snippet(books_fts, 2, :open, :close, '…', :snippet_tokens) AS snippet
+        FROM books_fts
+        JOIN books AS b ON b.id = books_fts.rowid
+        WHERE books_fts MATCH :match AND b.user_id = :user_id
+        ORDER BY bm25(books_fts, 10.0, 5.0, 1.0)
+        LIMIT :limit OFFSET :offset
+        """
+    # Typed, so years and statuses are read back as the API sends them
+    ).columns(year=Book.year.type, status=Book.status.type), {
+        'open': _HIGHLIGHT_SENTINELS[0],
+        'close': _HIGHLIGHT_SENTINELS[1],
+        'snippet_tokens': current_app.config.get('SEARCH_SNIPPET_TOKENS', 16),
+        'match': match,
+        'user_id': user_id,
+        'limit': limit + 1,
+        'offset': offset,
+    }, bind_arguments=read_bind_arguments()).mappings().all()
+
+
+def _search_like(user_id, text, limit, offset):
+    """Matches every search word against title, author or summary with LIKE.
+
+    This is the fallback for databases without FTS5. Results are unranked and
+    come back in insertion order, without highlighting.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    stmt = db.select(Book.id, Book.title, Book.author, Book.year, Book.status, Book.summary).where(Book.user_id == user_id)
+    for term in terms:
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        stmt = stmt.where(db.or_(
+            Book.title.ilike(pattern, escape='\\'),
+            Book.author.ilike(pattern, escape='\\'),
+            Book.summary.ilike(pattern, escape='\\'),
+        ))
+    rows = db.session.execute(stmt.order_by(Book.id).limit(limit + 1).offset(offset), bind_arguments=read_bind_arguments()).all()
+    return [{
+        'id': row.id,
+        'title': row.title,
+        'author': row.author,
+        'year': row.year,
+        'status': row.status,
+        'title_highlight': row.title,
+        'author_highlight': row.author,
+        'snippet': row.summary,
+    } for row in rows]
+
+
+@books_bp.route('/books/search', methods=['GET'])
+def search_books():
+    """Search a user's collection by title, author and summary."""
+    text = request.args.get('q', '').strip()
+    user_id, error = _caller_user_id(request.args.get('user_id'))
+    if error:
+        current_app.logger.warning("Book search rejected: %s", error)
+        return jsonify({'error': error}), 403
+    if not text or not user_id:
+        current_app.logger.warning("Book search rejected: q and user_id are required.")
+        return jsonify({'error': 'q and user_id are required'}), 400
+
+    try:
+        user_id = int(user_id)
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        current_app.logger.warning("Book search rejected: user_id, limit and offset must be integers.")
+        return jsonify({'error': 'user_id, limit and offset must be integers'}), 400
+
+    max_limit = current_app.config.get('SEARCH_MAX_LIMIT', 100)
+    if not 1 <= limit <= max_limit or offset < 0:
+        current_app.logger.warning("Book search rejected: invalid limit %s or offset %s.", limit, offset)
+        return jsonify({'error': f'limit must be between 1 and {max_limit} and offset must not be negative'}), 400
 
-    book_list = [{
-        'id': b.id,
-        'title': b.title,
-        'author': b.author,
-        'year': b.year,
-        'status': b.status
-    } for b in user_books]
+    current_app.logger.debug("Searching collection of user_id: %s for '%s'", user_id, text)
+    if _search_index_available():
+        rows = _search_fts(user_id, text, limit, offset)
+    else:
+        rows = _search_like(user_id, text, limit, offset)
 
-    current_app.logger.info(f"Collection retrieved for user_id: {user_id}, total books: {len(book_list)}")
-    return jsonify({'collection': book_list}), 200
+    has_more = len(rows) > limit
+    results = [dict(row) for row in rows[:limit]]
+    for result in results:
+        for field in SEARCH_HTML_FIELDS:
+            result[field] = _highlight_html(result[field])
+    current_app.logger.info("Search for '%s' returned %s results for user_id: %s", text, len(results), user_id)
+    return jsonify({'results': results, 'next_offset': offset + limit if has_more else None}), 200
@@ -0,0 +1,230 @@
+"""Background enrichment of new books with Google Books metadata.
+
+Adding or importing a book queues an EnrichmentJob in the same transaction.
+Worker threads claim pending jobs in batches, look each distinct title and
+author up once, and write the covers and summaries back in one transaction
+per batch, so adding a book never waits on the upstream API.
+
+Jobs live in the database: a restart loses nothing, and a job whose worker
+died is reclaimed once its lease expires. Finished jobs are deleted with the
+batch's write-back, so claiming never wades through old work. Lookups are rate limited per
+process, and failed lookups are retried with exponential backoff.
+"""
+import random
+import threading
+import time
+import uuid
+
+import sqlalchemy as sa
+from flask import current_app
+
+from book_routes import _lookup_book_details
+from metrics_routes import get_metrics
+from models import db
+from models.book_model import Book
+from models.collection_model import bump_collection_versions
+from models.enrichment_model import FAILED, PENDING, RUNNING, EnrichmentJob
+from utils.rate_limiter import RateLimiter
+
+
+class EnrichmentWorkers:
+    """Runs enrichment jobs on a pool of background threads.
+
+    Args:
+        app (Flask): The app whose database and configuration the workers use.
+        workers (int): The number of worker threads.
+        batch_size (int): The most distinct lookups claimed at once.
+        rate (float): Upstream lookups per second, shared by the threads.
+        burst (int): Lookups allowed back to back after an idle period.
+        max_attempts (int): Lookups tried before a job is marked failed.
+        backoff (float): Seconds before the first retry; doubled per attempt.
+        max_backoff (float): The longest wait between retries, in seconds.
+        lease (float): Seconds after which a running job is handed to another worker.
+        poll_interval (float): Seconds an idle worker waits before looking for jobs.
+    """
+
+    def __init__(self, app, workers=2, batch_size=20, rate=5.0, burst=5, max_attempts=5,
+                 backoff=30.0, max_backoff=3600.0, lease=300.0, poll_interval=1.0):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.rate_limiter = RateLimiter(rate, burst)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Starts the worker threads, unless they are already running."""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'enrichment-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stops the worker threads once they finish their current batch."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            handled = 0
+            with self.app.app_context():
+                try:
+                    handled = self.run_once()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error("Enrichment batch failed: %s", e)
+            if not handled:
+                self._stop.wait(self.poll_interval)
+
+    def run_once(self):
+        """Claims and runs one batch of jobs. Must be called in an app context.
+
+        Returns:
+            int: The number of jobs handled, 0 if none were due.
+        """
+        jobs = self._claim(time.time())
+        if not jobs:
+            return 0
+
+        by_query = {}
+        for job in jobs:
+            by_query.setdefault(job.query, []).append(job)
+        current_app.logger.debug("Enriching %s books with %s lookups.", len(jobs), len(by_query))
+
+        results = {}
+        for query in by_query:
+            try:
+                results[query] = _lookup_book_details(query, rate_limiter=self.rate_limiter)
+            except Exception as e:
+                current_app.logger.error("Enrichment lookup failed for %s: %s", query, e)
+                results[query] = ({'error': 'Failed to fetch book details'}, 500)
+
+        self._save(by_query, results, time.time())
+        current_app.logger.info("Enrichment batch finished: %s books, %s lookups.", len(jobs), len(by_query))
+        return len(jobs)
+
+    def _claim(self, now):
+        """Marks due jobs as running under a fresh token and returns them.
+
+        Every due job sharing a query with the first ``batch_size`` queries is
+        claimed too, so one lookup serves all of them. The claiming UPDATE
+        re-checks that each job is still due, so two workers never claim the
+        same job.
+        """
+        table = EnrichmentJob.__table__
+        due = sa.or_(
+            sa.and_(table.c.status == PENDING, table.c.run_at <= now),
+            sa.and_(table.c.status == RUNNING, table.c.locked_until < now),
+        )
+        queries = set(db.session.scalars(
+            sa.select(table.c.query).where(due).order_by(table.c.run_at).limit(self.batch_size)
+        ))
+        if not queries:
+            db.session.rollback()
+            return []
+
+        token = uuid.uuid4().hex
+        db.session.execute(
+            table.update().where(due, table.c.query.in_(queries))
+            .values(status=RUNNING, claimed_by=token, locked_until=now + self.lease)
+        )
+        db.session.commit()
+        return db.session.execute(sa.select(table).where(table.c.claimed_by == token)).all()
+
+    def _retry_delay(self, attempts):
+        """Exponential backoff with jitter, capped at ``max_backoff``."""
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def _save(self, by_query, results, now):
+        """Writes a batch's covers, summaries and job states in one transaction, deleting finished jobs."""
+        books = Book.__table__
+        jobs = EnrichmentJob.__table__
+        outcomes = get_metrics().enrichment_jobs
+        book_rows = []
+        job_rows = []
+        finished_rows = []
+        enriched_users = set()
+
+        for query, claimed in by_query.items():
+            body, status = results[query]
+            for job in claimed:
+                if status in (200, 404):
+                    finished_rows.append({'b_id': job.id, 'b_token': job.claimed_by})
+                    if status == 200:
+                        book_rows.append({'b_id': job.book_id, 'b_cover_image': body.get('cover_image'),
+                                          'b_summary': body.get('summary')})
+                        enriched_users.add(job.user_id)
+                    outcomes.inc('enriched' if status == 200 else 'not_found')
+                    continue
+                row = {'b_id': job.id, 'b_token': job.claimed_by, 'b_attempts': job.attempts + 1,
+                       'b_run_at': job.run_at, 'b_error': None}
+                if row['b_attempts'] >= self.max_attempts:
+                    row.update(b_status=FAILED, b_error=body.get('error'))
+                    outcomes.inc('failed')
+                else:
+                    row.update(b_status=PENDING, b_error=body.get('error'),
+                               b_run_at=now + self._retry_delay(row['b_attempts']))
+                    outcomes.inc('retried')
+                job_rows.append(row)
+
+        if book_rows:
+            # Only empty fields are filled, so details set by the user are never overwritten
+            db.session.execute(
+                books.update()
+                .where(books.c.id == sa.bindparam('b_id'),
+                       sa.or_(books.c.cover_image.is_(None), books.c.summary.is_(None)))
+                .values(cover_image=sa.func.coalesce(books.c.cover_image, sa.bindparam('b_cover_image')),
+                        summary=sa.func.coalesce(books.c.summary, sa.bindparam('b_summary'))),
+                book_rows,
+            )
+            bump_collection_versions(enriched_users)
+        # A job whose lease expired may have been reclaimed; only its new owner updates it
+        if finished_rows:
+            db.session.execute(
+                jobs.delete().where(jobs.c.id == sa.bindparam('b_id'), jobs.c.claimed_by == sa.bindparam('b_token')),
+                finished_rows,
+            )
+        if job_rows:
+            db.session.execute(
+                jobs.update()
+                .where(jobs.c.id == sa.bindparam('b_id'), jobs.c.claimed_by == sa.bindparam('b_token'))
+                .values(status=sa.bindparam('b_status'), attempts=sa.bindparam('b_attempts'),
+                        run_at=sa.bindparam('b_run_at'), last_error=sa.bindparam('b_error'),
+                        claimed_by=None, locked_until=None),
+                job_rows,
+            )
+        db.session.commit()
+
+
+def create_enrichment_workers(app):
+    """Creates EnrichmentWorkers from the app's configuration.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        EnrichmentWorkers: New, not yet started workers.
+    """
+    config = app.config
+    return EnrichmentWorkers(
+        app,
+        workers=config.get('ENRICHMENT_WORKERS', 2),
+        batch_size=config.get('ENRICHMENT_BATCH_SIZE', 20),
+        rate=config.get('ENRICHMENT_RATE_LIMIT', 5.0),
+        burst=config.get('ENRICHMENT_BURST', 5),
+        max_attempts=config.get('ENRICHMENT_MAX_ATTEMPTS', 5),
+        backoff=config.get('ENRICHMENT_BACKOFF', 30.0),
+        max_backoff=config.get('ENRICHMENT_MAX_BACKOFF', 3600.0),
+        lease=config.get('ENRICHMENT_LEASE', 300.0),
+        poll_interval=config.get('ENRICHMENT_POLL_INTERVAL', 1.0),
+    )
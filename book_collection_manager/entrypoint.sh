@@ -13,5 +13,11 @@ else
     echo "Skipping database creation."
 fi
 
-# Start the Python application
-exec python app.py
+# Start the Python application: the Flask development server when debugging,
+# otherwise the pre-forking gunicorn server configured in gunicorn.conf.py
+if [ "$FLASK_DEBUG" = "true" ]; then
+    echo "Starting the development server in debug mode."
+    exec python app.py
+else
+    exec gunicorn -c gunicorn.conf.py app:app
+fi
@@ -0,0 +1,69 @@
+"""Gunicorn settings for serving the app in production.
+
+Every setting can be overridden from the environment. Start the server with::
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is built once in the master process (preload_app) and shared with
+the forked workers copy-on-write. Database connections must not cross a
+fork, so each worker discards the connection pool it inherited and opens
+its own connections on demand.
+
+Send SIGHUP to the master for a graceful reload: new workers are started
+and the old ones finish their in-flight requests before exiting. Because the
+app is preloaded, a reload picks up configuration changes but not code
+changes; restart the container to deploy new code.
+
+Building the app does no I/O. The master brings the schema up to date once
+it is ready, before any worker is forked, and every worker starts its own
+background enrichment threads, since threads do not survive a fork.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# One worker process per core, each serving several requests on threads
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+# Build the app once before forking
+preload_app = True
+
+# Recycle each worker after this many requests (plus jitter, so they don't all restart at once)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Applies pending migrations in the master, then closes the connections it opened."""
+    from app import prepare_database
+    from models import db
+
+    flask_app = server.app.wsgi()
+    prepare_database(flask_app)
+    with flask_app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def post_fork(server, worker):
+    """Drops the database connections a worker inherited from the master and starts its enrichment threads."""
+    from models import db
+
+    flask_app = worker.app.wsgi()
+    with flask_app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    server.log.info(f"Worker {worker.pid} reset its database connection pool.")
+    if flask_app.config['ENRICHMENT_WORKERS'] > 0:
+        flask_app.extensions['enrichment'].start()
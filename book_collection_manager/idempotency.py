@@ -0,0 +1,136 @@
+"""Idempotency-Key support for routes that create things.
+
+A client that retries a request after a timeout sends the same
+``Idempotency-Key`` header with it. The first request with a key claims it in
+the database before running; once it finishes, its response is stored under
+the key and every retry gets that response replayed instead of creating a
+second copy. Keys live in the database, so retries landing on another worker
+process are recognised too, and are dropped IDEMPOTENCY_KEY_TTL seconds after
+first use.
+
+A key can only be reused with the same request body. Responses with a 5xx
+status are not stored, so a retry after a server error runs again.
+"""
+import functools
+import hashlib
+import time
+
+from flask import Response, current_app, g, jsonify, request
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from models.engine import upsert_insert
+from models.idempotency_model import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Set on responses replayed from a stored key
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def _claim(scope, key, fingerprint):
+    """Claims a key for the current request, in its own transaction.
+
+    Expired keys are deleted first. A key left running past its lock by a
+    request that never finished is taken over.
+
+    Returns:
+        IdempotencyKey row: None if the key was claimed, else the stored row.
+    """
+    table = IdempotencyKey.__table__
+    insert = upsert_insert(db.session.get_bind(IdempotencyKey))
+    while True:
+        now = time.time()
+        values = {
+            'scope': scope, 'key': key, 'fingerprint': fingerprint,
+            'locked_until': now + current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60),
+            'expires_at': now + current_app.config.get('IDEMPOTENCY_KEY_TTL', 86400),
+        }
+        db.session.execute(table.delete().where(table.c.expires_at <= now))
+        if insert is not None:
+            claimed = db.session.execute(insert(table).values(values).on_conflict_do_nothing()).rowcount == 1
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert().values(values))
+                claimed = True
+            except IntegrityError:
+                claimed = False
+        if not claimed:
+            claimed = db.session.execute(
+                table.update()
+                .where(table.c.scope == scope, table.c.key == key, table.c.fingerprint == fingerprint,
+                       table.c.status_code.is_(None), table.c.locked_until < now)
+                .values(locked_until=values['locked_until'])
+            ).rowcount == 1
+        stored = None if claimed else db.session.execute(
+            db.select(table).where(table.c.scope == scope, table.c.key == key)).first()
+        db.session.commit()
+        # Unless the other request released the key in the meantime; then try again
+        if claimed or stored is not None:
+            return stored
+
+
+def _release(scope, key):
+    """Deletes a claimed key so that a retry runs the request again."""
+    db.session.rollback()
+    table = IdempotencyKey.__table__
+    db.session.execute(table.delete().where(table.c.scope == scope, table.c.key == key))
+    db.session.commit()
+
+
+def _record(scope, key, response):
+    """Stores the response to replay for a claimed key."""
+    table = IdempotencyKey.__table__
+    db.session.execute(
+        table.update().where(table.c.scope == scope, table.c.key == key)
+        .values(status_code=response.status_code, body=response.get_data(as_text=True), locked_until=None)
+    )
+    db.session.commit()
+
+
+def idempotent(view):
+    """Makes a JSON route replay its first response to requests repeating an Idempotency-Key.
+
+    Requests without the header run as usual.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not 1 <= len(key) <= MAX_KEY_LENGTH:
+            current_app.logger.warning("Request rejected: invalid %s header.", IDEMPOTENCY_HEADER)
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+
+        scope = f"{request.endpoint}:{g.get('user_id') or ''}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        stored = _claim(scope, key, fingerprint)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                current_app.logger.warning("Request rejected: %s %s reused with a different body.",
+                                           IDEMPOTENCY_HEADER, key)
+                return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+            if stored.status_code is None:
+                current_app.logger.warning("Request rejected: %s %s is still in progress.", IDEMPOTENCY_HEADER, key)
+                response = jsonify({'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'})
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+            current_app.logger.info("Replaying the response stored for %s %s.", IDEMPOTENCY_HEADER, key)
+            response = Response(stored.body, status=stored.status_code, mimetype='application/json')
+            response.headers[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            _release(scope, key)
+            raise
+        if response.status_code >= 500:
+            _release(scope, key)
+        else:
+            _record(scope, key, response)
+        return response
+    return wrapper
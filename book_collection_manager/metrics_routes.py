@@ -0,0 +1,111 @@
+import time
+
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+from utils.metrics import MetricsRegistry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Buckets for the number of SQL queries one request runs
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class AppMetrics:
+    """The metrics the app records, backed by one registry per app."""
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            'http_requests_total', 'Requests handled, by endpoint and status code.',
+            ('blueprint', 'endpoint', 'method', 'status'))
+        self.request_latency = self.registry.histogram(
+            'http_request_duration_seconds', 'Time spent handling a request, in seconds.',
+            ('blueprint', 'endpoint'))
+        self.db_query_latency = self.registry.histogram(
+            'db_query_duration_seconds', 'Time spent executing a SQL statement, in seconds.',
+            ('endpoint',))
+        self.db_queries_per_request = self.registry.histogram(
+            'db_queries_per_request', 'SQL statements executed while handling a request.',
+            ('endpoint',), buckets=QUERY_COUNT_BUCKETS)
+        self.upstream_latency = self.registry.histogram(
+            'upstream_request_duration_seconds', 'Time spent waiting on an external API, in seconds.',
+            ('service', 'outcome'))
+        self.response_cache_lookups = self.registry.counter(
+            'response_cache_lookups_total', 'Response cache lookups, by cache and result (hit or miss).',
+            ('cache', 'result'))
+        self.enrichment_jobs = self.registry.counter(
+            'enrichment_jobs_total', 'Enrichment jobs run, by outcome (enriched, not_found, retried, failed).',
+            ('outcome',))
+
+
+def get_metrics():
+    """Returns the current app's metrics, creating them on first use."""
+    metrics = current_app.extensions.get('metrics')
+    if metrics is None:
+        metrics = current_app.extensions.setdefault('metrics', AppMetrics())
+    return metrics
+
+
+def _endpoint_label():
+    return (request.endpoint or 'none') if has_request_context() else 'none'
+
+
+def _instrument_engine(engine, metrics):
+    """Times every statement an engine executes and counts it against the current request."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+        metrics.db_query_latency.observe(elapsed, _endpoint_label())
+        if has_request_context():
+            g.metrics_query_count = g.get('metrics_query_count', 0) + 1
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        started_at = context.connection.info.get('query_started_at') if context.connection else None
+        if started_at and context.statement is not None:
+            started_at.pop()
+
+
+def _start_request_timer():
+    g.metrics_started_at = time.perf_counter()
+
+
+def _record_request(response):
+    started_at = g.pop('metrics_started_at', None)
+    if started_at is None:
+        return response
+    metrics = get_metrics()
+    endpoint = request.endpoint or 'none'
+    blueprint = request.blueprint or ''
+    metrics.requests.inc(blueprint, endpoint, request.method, str(response.status_code))
+    metrics.request_latency.observe(time.perf_counter() - started_at, blueprint, endpoint)
+    metrics.db_queries_per_request.observe(g.pop('metrics_query_count', 0), endpoint)
+    return response
+
+
+def install_metrics(app):
+    """Records request, database and upstream metrics for an app.
+
+    Must be called after ``db.init_app(app)``. The metrics are served by
+    ``metrics_bp``.
+    """
+    metrics = app.extensions.setdefault('metrics', AppMetrics())
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine, metrics)
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Serves the app's metrics in the Prometheus text format."""
+    return Response(get_metrics().registry.render(), mimetype='text/plain; version=0.0.4')
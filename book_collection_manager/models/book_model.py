@@ -1,17 +1,91 @@
+import hashlib
+import time
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.types import TypeDecorator
 from models import db
+from models.search_index import create_search_index
+
+# Reading statuses, stored as their index in this tuple
+BOOK_STATUSES = ('unread', 'read')
+
+
+class StatusType(TypeDecorator):
+    """A reading status, stored as a small integer and handled as its name."""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else BOOK_STATUSES.index(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else BOOK_STATUSES[value]
+
+
+class YearType(TypeDecorator):
+    """A publication year, stored as an integer and handled as a string.
+
+    Unknown years are stored as NULL and read back as an empty string, so
+    they compare, sort and range-filter as numbers in SQL while clients
+    keep seeing the same values as before.
+    """
+    impl = db.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value in (None, '') else int(value)
+
+    def process_result_value(self, value, dialect):
+        return '' if value is None else str(value)
+
+
+def book_dedup_key(title, author):
+    """Returns the key that tells apart a user's books, ignoring case and extra whitespace.
+
+    A user cannot have two books with the same key, so adding a book again
+    finds the existing one instead of inserting a duplicate.
+    """
+    normalized = '\x1f'.join(' '.join(value.split()).casefold() for value in (title, author))
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def _default_dedup_key(context):
+    parameters = context.get_current_parameters()
+    return book_dedup_key(parameters['title'], parameters['author'])
+
 
 class Book(db.Model):
     __tablename__ = 'books'
+    __table_args__ = (
+        db.Index('ix_books_user_id', 'user_id'),
+        db.Index('ix_books_user_id_status', 'user_id', 'status'),
+        db.Index('ix_books_user_id_author', 'user_id', 'author'),
+        db.Index('ix_books_user_id_title', 'user_id', 'title'),
+        db.Index('ix_books_user_id_year', 'user_id', 'year'),
+        db.Index('ix_books_user_id_status_year', 'user_id', 'status', 'year'),
+        db.Index('ix_books_user_id_dedup_key', 'user_id', 'dedup_key', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     title = db.Column(db.String(255), nullable=False)
     author = db.Column(db.String(255), nullable=False)
-    year = db.Column(db.String(4), nullable=True)  # Year is a string
-    status = db.Column(db.String(10), nullable=False, default='unread')  # "read" or "unread"
+    year = db.Column(YearType, nullable=True)
+    status = db.Column(StatusType, nullable=False, default='unread')  # One of BOOK_STATUSES
     cover_image = db.Column(db.String(2083), nullable=True)  # URL for the book cover
     summary = db.Column(db.Text, nullable=True)  # Summary of the book
     user_id = db.Column(db.Integer, nullable=False, default=1)
+    # book_dedup_key of the title and author, filled in by every insert
+    dedup_key = db.Column(db.String(32), nullable=True, default=_default_dedup_key)
+    # Bumped by every UPDATE, including Core ones, for ETags and Last-Modified
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.text('version + 1'))
+    updated_at = db.Column(db.Float, nullable=False, default=time.time, onupdate=time.time)  # Epoch seconds
 
     def __repr__(self):
-        return f"<Book {self.id}: {self.title} by {self.author}>"
\ No newline at end of file
+        return f"<Book {self.id}: {self.title} by {self.author}>"
+
+
+@event.listens_for(Book.__table__, 'after_create')
+def _create_book_search_index(target, connection, **kw):
+    """Creates the full-text index alongside the books table on SQLite."""
+    create_search_index(connection)
@@ -0,0 +1,49 @@
+import time
+
+from models import db
+from models.engine import upsert_insert
+
+
+class CollectionVersion(db.Model):
+    """Counts the changes made to each user's collection.
+
+    The version is bumped in the same transaction as every write to the
+    user's books, so a reader can tell whether a collection changed by
+    reading this one row instead of the books themselves.
+    """
+    __tablename__ = 'collection_versions'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.Float, nullable=False)  # Epoch seconds of the last change
+
+    def __repr__(self):
+        return f"<CollectionVersion {self.user_id}: v{self.version}>"
+
+
+def bump_collection_versions(user_ids):
+    """Increments the collection version of each user in the current transaction.
+
+    Args:
+        user_ids (iterable): The owners of the books that were written.
+    """
+    rows = [{'user_id': user_id, 'version': 1, 'updated_at': time.time()} for user_id in sorted(set(user_ids))]
+    if not rows:
+        return
+    table = CollectionVersion.__table__
+    insert = upsert_insert(db.session.get_bind(CollectionVersion))
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.user_id], set_={
+            'version': table.c.version + 1,
+            'updated_at': stmt.excluded.updated_at,
+        })
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = db.session.execute(
+            table.update().where(table.c.user_id == row['user_id'])
+            .values(version=table.c.version + 1, updated_at=row['updated_at'])
+        )
+        if updated.rowcount == 0:
+            db.session.execute(table.insert(), row)
@@ -0,0 +1,131 @@
+"""Database engine profiles and read-replica routing.
+
+``engine_options`` picks connection settings for the configured backend:
+SQLite gets pragmas that let readers and a writer work concurrently, server
+databases get connection pool sizing. ``replica_binds`` declares optional
+read replicas, and read-only routes pass ``read_bind_arguments()`` to the
+session so their queries run on a replica instead of the primary.
+"""
+import importlib
+import itertools
+import os
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db
+
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Dialects with INSERT ... ON CONFLICT
+UPSERT_DIALECTS = ('sqlite', 'postgresql')
+
+
+def _env_flag(env, name, default):
+    return env.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def sqlite_pragmas(env=os.environ):
+    """Returns the pragmas applied to every new SQLite connection.
+
+    WAL lets readers proceed while a write is in progress, and NORMAL
+    synchronous mode is durable across application crashes in WAL mode while
+    skipping an fsync per commit.
+    """
+    return {
+        'journal_mode': env.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': env.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(env.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        'mmap_size': int(env.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'cache_size': int(env.get('SQLITE_CACHE_SIZE', '-64000')),  # Negative values are KiB
+    }
+
+
+def engine_options(uri, env=os.environ):
+    """Returns SQLAlchemy engine options suited to a database URI.
+
+    Args:
+        uri (str): The database URI.
+        env (Mapping): Where to read overrides from.
+
+    Returns:
+        dict: Keyword arguments for ``create_engine``.
+    """
+    if make_url(uri).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': int(env.get('DB_POOL_SIZE', '10')),
+        'max_overflow': int(env.get('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': float(env.get('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _env_flag(env, 'DB_POOL_PRE_PING', 'true'),
+    }
+
+
+def replica_binds(env=os.environ):
+    """Returns Flask-SQLAlchemy binds for the read replicas listed in DATABASE_REPLICA_URIS.
+
+    Args:
+        env (Mapping): Where to read DATABASE_REPLICA_URIS (comma-separated) from.
+
+    Returns:
+        dict: Bind keys mapped to engine settings.
+    """
+    uris = [uri.strip() for uri in env.get('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+    return {f'{REPLICA_BIND_PREFIX}{i}': {'url': uri, **engine_options(uri, env)} for i, uri in enumerate(uris)}
+
+
+def _set_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return on_connect
+
+
+def configure_engines(app, env=os.environ):
+    """Applies SQLite pragmas and sets up replica routing for an app's engines.
+
+    Must be called after ``db.init_app(app)`` and before the first connection.
+    """
+    with app.app_context():
+        engines = db.engines
+        for engine in engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _set_sqlite_pragmas(sqlite_pragmas(env)))
+        replicas = [engine for key, engine in engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+    app.extensions['read_replicas'] = itertools.cycle(replicas) if replicas else None
+
+
+def read_bind_arguments():
+    """Returns session ``bind_arguments`` that send a read-only query to a replica.
+
+    Replicas are used round-robin. Without replicas this returns an empty
+    dict, so queries go to the primary as usual.
+    """
+    replicas = current_app.extensions.get('read_replicas')
+    if replicas is None:
+        return {}
+    return {'bind': next(replicas)}
+
+
+def upsert_insert(bind):
+    """Returns the insert() construct with ON CONFLICT support for a bind's dialect.
+
+    The dialect's module is imported on first use, so a SQLite deployment
+    never loads the PostgreSQL dialect and vice versa.
+
+    Args:
+        bind (sqlalchemy.engine.Engine or Connection): Where the statement will run.
+
+    Returns:
+        function: ``sqlalchemy.dialects.<name>.insert``, or None if the dialect
+            has no ON CONFLICT clause.
+    """
+    name = bind.dialect.name
+    if name not in UPSERT_DIALECTS:
+        return None
+    return importlib.import_module(f'sqlalchemy.dialects.{name}').insert
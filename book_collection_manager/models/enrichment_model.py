@@ -0,0 +1,64 @@
+import time
+
+from models import db
+
+# Job states. Jobs that finish are deleted, so the table only holds work still
+# to do; failed jobs ran out of attempts and are kept for inspection.
+PENDING = 'pending'
+RUNNING = 'running'
+FAILED = 'failed'
+
+
+class EnrichmentJob(db.Model):
+    """A queued Google Books lookup that fills in a book's cover and summary.
+
+    Jobs for books with the same title and author share a ``query``, so a
+    worker looks the pair up once and writes the result to every book.
+    """
+    __tablename__ = 'enrichment_jobs'
+    __table_args__ = (
+        db.Index('ix_enrichment_jobs_status_run_at', 'status', 'run_at'),
+        db.Index('ix_enrichment_jobs_query', 'query'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    book_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    query = db.Column(db.String(600), nullable=False)  # Normalized Google Books query
+    status = db.Column(db.String(10), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.Float, nullable=False)  # Epoch seconds; not retried before this
+    claimed_by = db.Column(db.String(32), nullable=True)  # Token of the worker running the job
+    locked_until = db.Column(db.Float, nullable=True)  # A running job is reclaimed after this
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<EnrichmentJob {self.id}: book {self.book_id} {self.status}>"
+
+
+def enrichment_query(title, author):
+    """Returns the normalized Google Books query for a title and author.
+
+    The query is normalized like the details cache key, so identical pairs
+    share one query and one cache entry.
+    """
+    title = ' '.join(title.split())
+    author = ' '.join(author.split())
+    return f'intitle:{title} inauthor:{author}'.casefold()
+
+
+def enqueue_enrichment(books):
+    """Queues an enrichment job per book in the current transaction.
+
+    Args:
+        books (iterable): ``(book_id, user_id, title, author)`` tuples.
+    """
+    now = time.time()
+    rows = [
+        {'book_id': book_id, 'user_id': user_id, 'query': enrichment_query(title, author),
+         'status': PENDING, 'attempts': 0, 'run_at': now, 'created_at': now}
+        for book_id, user_id, title, author in books
+    ]
+    if rows:
+        db.session.execute(EnrichmentJob.__table__.insert(), rows)
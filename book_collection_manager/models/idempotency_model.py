@@ -0,0 +1,23 @@
+from models import db
+
+
+class IdempotencyKey(db.Model):
+    """A client-supplied Idempotency-Key and the response its first request got.
+
+    Keys are scoped to the route and the authenticated user. While the first
+    request runs, ``status_code`` is NULL and the row is locked until
+    ``locked_until``; a request that dies without finishing is taken over by
+    a retry after that.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    scope = db.Column(db.String(100), primary_key=True)  # Endpoint and user, e.g. "books.add_book:7"
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of the request body
+    status_code = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.Text, nullable=True)  # The JSON response to replay
+    locked_until = db.Column(db.Float, nullable=True)  # Epoch seconds
+    expires_at = db.Column(db.Float, nullable=False, index=True)  # Epoch seconds; the row can be dropped after this
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.scope} {self.key}: {self.status_code}>"
@@ -0,0 +1,354 @@
+"""Versioned schema migrations.
+
+Each migration is applied at most once, in order, and the versions that have
+been applied are recorded in the ``schema_version`` table. When the database
+is already at the latest version, ``upgrade`` does a single version check and
+returns without touching the schema.
+
+Migrations describe the schema as it was when they were written, so they must
+never import the ORM models; the models are allowed to change after a migration
+has shipped. Run pending migrations from the command line with::
+
+    python -m models.migrations sqlite:///books.db
+"""
+import hashlib
+import logging
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from models.search_index import create_search_index
+
+
+Migration = namedtuple('Migration', ['version', 'description', 'upgrade'])
+
+logger = logging.getLogger(__name__)
+
+# Book IDs listed in a migration's log message before it refers to the table instead
+MAX_LOGGED_BOOK_IDS = 100
+
+_metadata = sa.MetaData()
+schema_version = sa.Table(
+    'schema_version', _metadata,
+    sa.Column('version', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('description', sa.String(255), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+
+def _create_base_tables(conn):
+    metadata = sa.MetaData()
+    sa.Table(
+        'users', metadata,
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('username', sa.String(80), unique=True, nullable=False),
+        sa.Column('salt', sa.String(32), nullable=False),
+        sa.Column('hashed_password', sa.String(128), nullable=False),
+    )
+    sa.Table(
+        'books', metadata,
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('title', sa.String(255), nullable=False),
+        sa.Column('author', sa.String(255), nullable=False),
+        sa.Column('year', sa.String(4), nullable=True),
+        sa.Column('status', sa.String(10), nullable=False, server_default='unread'),
+        sa.Column('cover_image', sa.String(2083), nullable=True),
+        sa.Column('summary', sa.Text, nullable=True),
+        sa.Column('user_id', sa.Integer, nullable=False, server_default='1'),
+    )
+    # Databases created by the old create_all() call already have these tables.
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _create_indexes(conn, table_name, indexes):
+    table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+    for name, columns in indexes:
+        sa.Index(name, *(table.c[column] for column in columns)).create(conn, checkfirst=True)
+
+
+def _add_book_user_indexes(conn):
+    _create_indexes(conn, 'books', [
+        ('ix_books_user_id', ['user_id']),
+        ('ix_books_user_id_status', ['user_id', 'status']),
+        ('ix_books_user_id_author', ['user_id', 'author']),
+    ])
+
+
+def _add_search_index(conn):
+    # A no-op on backends without FTS5; search falls back to LIKE there.
+    create_search_index(conn, rebuild=True)
+
+
+def _create_revoked_tokens(conn):
+    metadata = sa.MetaData()
+    sa.Table(
+        'revoked_tokens', metadata,
+        sa.Column('jti', sa.String(32), primary_key=True),
+        sa.Column('expires_at', sa.Float, nullable=False, index=True),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _add_versions(conn):
+    now = time.time()
+    conn.execute(sa.text("ALTER TABLE books ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    conn.execute(sa.text("ALTER TABLE books ADD COLUMN updated_at FLOAT NOT NULL DEFAULT 0"))
+    conn.execute(sa.text("UPDATE books SET updated_at = :now"), {'now': now})
+
+    metadata = sa.MetaData()
+    sa.Table(
+        'collection_versions', metadata,
+        sa.Column('user_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('version', sa.Integer, nullable=False),
+        sa.Column('updated_at', sa.Float, nullable=False),
+    )
+    metadata.create_all(conn, checkfirst=True)
+    conn.execute(sa.text(
+        "INSERT INTO collection_versions (user_id, version, updated_at) SELECT DISTINCT user_id, 1, :now FROM books"
+    ), {'now': now})
+
+
+def _create_enrichment_jobs(conn):
+    metadata = sa.MetaData()
+    sa.Table(
+        'enrichment_jobs', metadata,
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('book_id', sa.Integer, nullable=False),
+        sa.Column('user_id', sa.Integer, nullable=False),
+        sa.Column('query', sa.String(600), nullable=False),
+        sa.Column('status', sa.String(10), nullable=False),
+        sa.Column('attempts', sa.Integer, nullable=False),
+        sa.Column('run_at', sa.Float, nullable=False),
+        sa.Column('claimed_by', sa.String(32), nullable=True),
+        sa.Column('locked_until', sa.Float, nullable=True),
+        sa.Column('last_error', sa.String(255), nullable=True),
+        sa.Column('created_at', sa.Float, nullable=False),
+        sa.Index('ix_enrichment_jobs_status_run_at', 'status', 'run_at'),
+        sa.Index('ix_enrichment_jobs_query', 'query'),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _create_collection_stats(conn):
+    metadata = sa.MetaData()
+    stats = sa.Table(
+        'collection_stats', metadata,
+        sa.Column('user_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('dimension', sa.String(10), primary_key=True),
+        sa.Column('value', sa.String(255), primary_key=True),
+        sa.Column('book_count', sa.Integer, nullable=False),
+        sa.Index('ix_collection_stats_user_id_dimension_book_count', 'user_id', 'dimension', 'book_count'),
+    )
+    metadata.create_all(conn, checkfirst=True)
+    conn.execute(stats.delete())
+    for dimension in ('status', 'author', 'year'):
+        conn.execute(sa.text(
+            f"INSERT INTO collection_stats (user_id, dimension, value, book_count) "
+            f"SELECT user_id, '{dimension}', {dimension}, COUNT(*) FROM books "
+            f"WHERE {dimension} IS NOT NULL AND {dimension} != '' GROUP BY user_id, {dimension}"
+        ))
+
+
+# Indexes on books after migration 8, one per filter and sort of the collection route
+_BOOK_INDEXES_V8 = [
+    ('ix_books_user_id', ['user_id']),
+    ('ix_books_user_id_status', ['user_id', 'status']),
+    ('ix_books_user_id_author', ['user_id', 'author']),
+    ('ix_books_user_id_title', ['user_id', 'title']),
+    ('ix_books_user_id_year', ['user_id', 'year']),
+    ('ix_books_user_id_status_year', ['user_id', 'status', 'year']),
+]
+
+
+def _compact_book_columns(conn):
+    # Statuses become their index in ('unread', 'read'), and years integers.
+    # Years that are not numbers, like 'c. 1850', become unknown; their text
+    # is kept in unparsed_book_years first, so nothing is lost for good.
+    metadata = sa.MetaData()
+    sa.Table(
+        'unparsed_book_years', metadata,
+        sa.Column('book_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('year', sa.String(255), nullable=False),
+    )
+    metadata.create_all(conn)
+    numeric = "year NOT GLOB '*[^0-9]*'" if conn.dialect.name == 'sqlite' else "year ~ '^[0-9]+$'"
+    conn.execute(sa.text(
+        f"INSERT INTO unparsed_book_years (book_id, year) "
+        f"SELECT id, year FROM books WHERE year IS NOT NULL AND year != '' AND NOT ({numeric})"
+    ))
+    unparsed = conn.execute(sa.text("SELECT book_id FROM unparsed_book_years ORDER BY book_id")).scalars().all()
+    if unparsed:
+        logger.warning(
+            "Migration 8: %s book years are not numbers and are now unknown; their text is kept in "
+            "unparsed_book_years. Book IDs: %s%s", len(unparsed), ', '.join(map(str, unparsed[:MAX_LOGGED_BOOK_IDS])),
+            ' ...' if len(unparsed) > MAX_LOGGED_BOOK_IDS else '',
+        )
+
+    if conn.dialect.name == 'sqlite':
+        # SQLite cannot change a column's type, so the table is rebuilt. Book
+        # IDs are copied, which keeps the full-text index valid; dropping the
+        # old table drops its indexes and sync triggers, recreated below.
+        metadata = sa.MetaData()
+        sa.Table(
+            'books_new', metadata,
+            sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column('title', sa.String(255), nullable=False),
+            sa.Column('author', sa.String(255), nullable=False),
+            sa.Column('year', sa.Integer, nullable=True),
+            sa.Column('status', sa.SmallInteger, nullable=False, server_default='0'),
+            sa.Column('cover_image', sa.String(2083), nullable=True),
+            sa.Column('summary', sa.Text, nullable=True),
+            sa.Column('user_id', sa.Integer, nullable=False, server_default='1'),
+            sa.Column('version', sa.Integer, nullable=False, server_default='1'),
+            sa.Column('updated_at', sa.Float, nullable=False, server_default='0'),
+        )
+        metadata.create_all(conn)
+        conn.execute(sa.text(
+            "INSERT INTO books_new (id, title, author, year, status, cover_image, summary, user_id, version, updated_at) "
+            "SELECT id, title, author, "
+            "CASE WHEN year != '' AND year NOT GLOB '*[^0-9]*' THEN CAST(year AS INTEGER) END, "
+            "CASE status WHEN 'read' THEN 1 ELSE 0 END, "
+            "cover_image, summary, user_id, version, updated_at FROM books"
+        ))
+        conn.execute(sa.text("DROP TABLE books"))
+        conn.execute(sa.text("ALTER TABLE books_new RENAME TO books"))
+        create_search_index(conn)
+    else:
+        conn.execute(sa.text("ALTER TABLE books ALTER COLUMN status DROP DEFAULT"))
+        conn.execute(sa.text(
+            "ALTER TABLE books ALTER COLUMN status TYPE SMALLINT USING CASE status WHEN 'read' THEN 1 ELSE 0 END"
+        ))
+        conn.execute(sa.text("ALTER TABLE books ALTER COLUMN status SET DEFAULT 0"))
+        conn.execute(sa.text(
+            "ALTER TABLE books ALTER COLUMN year TYPE INTEGER USING CASE WHEN year ~ '^[0-9]+$' THEN year::integer END"
+        ))
+    _create_indexes(conn, 'books', _BOOK_INDEXES_V8)
+
+    # Recount years, since years that were not numbers no longer count, and
+    # retire cached collection responses that still show them
+    conn.execute(sa.text("DELETE FROM collection_stats WHERE dimension = 'year'"))
+    conn.execute(sa.text(
+        "INSERT INTO collection_stats (user_id, dimension, value, book_count) "
+        "SELECT user_id, 'year', CAST(year AS VARCHAR(4)), COUNT(*) FROM books "
+        "WHERE year IS NOT NULL GROUP BY user_id, year"
+    ))
+    conn.execute(sa.text("UPDATE collection_versions SET version = version + 1, updated_at = :now"),
+                 {'now': time.time()})
+
+
+def _dedup_key_v9(title, author):
+    # A frozen copy of models.book_model.book_dedup_key
+    normalized = '\x1f'.join(' '.join(value.split()).casefold() for value in (title, author))
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def _add_duplicate_detection(conn):
+    conn.execute(sa.text("ALTER TABLE books ADD COLUMN dedup_key VARCHAR(32)"))
+    # Books that were added more than once keep every copy, but only the
+    # first copy gets a key; NULL keys never conflict with each other.
+    seen = set()
+    keys = []
+    for book_id, user_id, title, author in conn.execute(sa.text(
+            "SELECT id, user_id, title, author FROM books ORDER BY id")):
+        key = (user_id, _dedup_key_v9(title, author))
+        if key not in seen:
+            seen.add(key)
+            keys.append({'id': book_id, 'dedup_key': key[1]})
+    if keys:
+        conn.execute(sa.text("UPDATE books SET dedup_key = :dedup_key WHERE id = :id"), keys)
+    books = sa.Table('books', sa.MetaData(), autoload_with=conn)
+    sa.Index('ix_books_user_id_dedup_key', books.c.user_id, books.c.dedup_key, unique=True).create(conn)
+
+    metadata = sa.MetaData()
+    sa.Table(
+        'idempotency_keys', metadata,
+        sa.Column('scope', sa.String(100), primary_key=True),
+        sa.Column('key', sa.String(255), primary_key=True),
+        sa.Column('fingerprint', sa.String(64), nullable=False),
+        sa.Column('status_code', sa.Integer, nullable=True),
+        sa.Column('body', sa.Text, nullable=True),
+        sa.Column('locked_until', sa.Float, nullable=True),
+        sa.Column('expires_at', sa.Float, nullable=False, index=True),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _widen_hashed_password(conn):
+    # scrypt hashes are 145 characters. SQLite does not enforce VARCHAR
+    # lengths, and cannot change a column's type, so it is left as it is.
+    if conn.dialect.name != 'sqlite':
+        conn.execute(sa.text("ALTER TABLE users ALTER COLUMN hashed_password TYPE VARCHAR(255)"))
+
+
+MIGRATIONS = [
+    Migration(1, 'Create users and books tables', _create_base_tables),
+    Migration(2, 'Index books by user, status and author', _add_book_user_indexes),
+    Migration(3, 'Add full-text search index on books', _add_search_index),
+    Migration(4, 'Create revoked_tokens table', _create_revoked_tokens),
+    Migration(5, 'Add book and collection versions', _add_versions),
+    Migration(6, 'Create enrichment_jobs table', _create_enrichment_jobs),
+    Migration(7, 'Create collection_stats table', _create_collection_stats),
+    Migration(8, 'Store book years and statuses as integers, with filter indexes; '
+                 'keep years that are not numbers in unparsed_book_years', _compact_book_columns),
+    Migration(9, 'Add duplicate detection and idempotency_keys table', _add_duplicate_detection),
+    Migration(10, 'Widen users.hashed_password to 255 characters for scrypt hashes', _widen_hashed_password),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def current_version(conn):
+    """Returns the latest schema version applied to a database.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): An open connection.
+
+    Returns:
+        int: The applied version, or 0 for a database that has never been migrated.
+    """
+    if not sa.inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine, target=HEAD):
+    """Applies every pending migration up to ``target``.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database to migrate.
+        target (int): The version to migrate to. Defaults to the latest.
+
+    Returns:
+        list: The versions that were applied, empty if the schema was current.
+    """
+    with engine.connect() as conn:
+        if current_version(conn) >= target:
+            return []
+
+    applied = []
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        version = current_version(conn)
+        for migration in MIGRATIONS:
+            if version < migration.version <= target:
+                migration.upgrade(conn)
+                conn.execute(schema_version.insert().values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                ))
+                applied.append(migration.version)
+    return applied
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m models.migrations DATABASE_URI")
+    versions = upgrade(sa.create_engine(sys.argv[1]))
+    if versions:
+        print(f"Applied migrations: {', '.join(map(str, versions))}")
+    else:
+        print(f"Schema is up to date at version {HEAD}.")
@@ -0,0 +1,104 @@
+"""SQLite FTS5 full-text index over book titles, authors and summaries.
+
+``books_fts`` is an external-content FTS5 table: it stores only the inverted
+index and reads column values back from ``books`` by rowid. Triggers on
+``books`` keep it in sync with every write path, including bulk inserts that
+bypass the ORM. Other database backends have no index and search falls back
+to LIKE matching.
+"""
+import sqlalchemy as sa
+
+
+FTS_TABLE = 'books_fts'
+
+# Columns of the index, in the order used by highlight(), snippet() and bm25()
+FTS_COLUMNS = ('title', 'author', 'summary')
+
+_CREATE_STATEMENTS = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, summary,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, summary)
+        VALUES (new.id, new.title, new.author, new.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, summary)
+        VALUES ('delete', old.id, old.title, old.author, old.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, summary ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, summary)
+        VALUES ('delete', old.id, old.title, old.author, old.summary);
+        INSERT INTO books_fts(rowid, title, author, summary)
+        VALUES (new.id, new.title, new.author, new.summary);
+    END
+    """,
+)
+
+
+def fts5_available(conn):
+    """Returns True if the connection is to a SQLite build with FTS5 compiled in."""
+    if conn.dialect.name != 'sqlite':
+        return False
+    options = {row[0] for row in conn.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def create_search_index(conn, rebuild=False):
+    """Creates the full-text index and its sync triggers if FTS5 is available.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): An open connection.
+        rebuild (bool): Re-index every existing book, for databases that
+            already hold data.
+
+    Returns:
+        bool: True if the index exists after the call.
+    """
+    if not fts5_available(conn):
+        return False
+    for statement in _CREATE_STATEMENTS:
+        conn.exec_driver_sql(statement)
+    if rebuild:
+        conn.exec_driver_sql("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+    return True
+
+
+def has_search_index(conn):
+    """Returns True if the full-text index table exists in the database."""
+    return conn.dialect.name == 'sqlite' and sa.inspect(conn).has_table(FTS_TABLE)
+
+
+def fts_query(text):
+    """Turns free text into a safe FTS5 MATCH expression.
+
+    Every word must match, and the last one matches as a prefix so that
+    partially typed queries still find results. FTS5 operators and punctuation
+    in the input are ignored.
+
+    Args:
+        text (str): The user's search text.
+
+    Returns:
+        str: The MATCH expression, or an empty string if the text has no words.
+    """
+    words = search_terms(text)
+    if not words:
+        return ''
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_terms(text):
+    """Splits search text into words, dropping punctuation."""
+    return ''.join(c if c.isalnum() else ' ' for c in text).split()
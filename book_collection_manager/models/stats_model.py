@@ -0,0 +1,146 @@
+"""Per-user collection statistics, kept up to date by the write paths.
+
+Each row counts one user's books with one value of one dimension: a status,
+an author or a publication year. Writes to books apply their changes to the
+counts in the same transaction, so reading a user's statistics never scans
+their books. Counts that drop to zero are kept and filtered out when read.
+
+If the counts ever drift, for example after books were edited by hand,
+recompute them from the books table with::
+
+    python -m models.stats_model sqlite:///books.db [USER_ID ...]
+"""
+import sys
+import time
+from collections import Counter
+
+import sqlalchemy as sa
+
+from models import db
+from models.book_model import Book
+from models.collection_model import CollectionVersion
+from models.engine import upsert_insert
+
+# The dimensions books are counted by, with the book column each one reads
+STATS_DIMENSIONS = {'status': 'status', 'author': 'author', 'year': 'year'}
+
+
+class CollectionStat(db.Model):
+    """The number of a user's books with one value of one dimension."""
+    __tablename__ = 'collection_stats'
+    __table_args__ = (
+        db.Index('ix_collection_stats_user_id_dimension_book_count', 'user_id', 'dimension', 'book_count'),
+    )
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    dimension = db.Column(db.String(10), primary_key=True)  # One of STATS_DIMENSIONS
+    value = db.Column(db.String(255), primary_key=True)
+    book_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CollectionStat {self.user_id} {self.dimension}={self.value}: {self.book_count}>"
+
+
+def book_stat_keys(book):
+    """Returns the counts a book contributes to.
+
+    Args:
+        book: A Book, or a row with its user_id and the STATS_DIMENSIONS columns.
+
+    Returns:
+        list: ``(user_id, dimension, value)`` keys. Books without a year are
+            not counted by year.
+    """
+    keys = []
+    for dimension, column in STATS_DIMENSIONS.items():
+        value = getattr(book, column)
+        if value not in (None, ''):
+            keys.append((book.user_id, dimension, str(value)))
+    return keys
+
+
+def apply_stats_changes(added=(), removed=()):
+    """Applies books being added and removed to the counts, in the current transaction.
+
+    A changed book is removed with its old values and added with its new ones.
+
+    Args:
+        added (iterable): Keys from book_stat_keys for books that now count.
+        removed (iterable): Keys from book_stat_keys for books that no longer count.
+    """
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    rows = [
+        {'user_id': user_id, 'dimension': dimension, 'value': value, 'book_count': delta}
+        for (user_id, dimension, value), delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    table = CollectionStat.__table__
+    insert = upsert_insert(db.session.get_bind(CollectionStat))
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.dimension, table.c.value],
+            set_={'book_count': table.c.book_count + stmt.excluded.book_count},
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.user_id == row['user_id'], table.c.dimension == row['dimension'],
+                   table.c.value == row['value'])
+            .values(book_count=table.c.book_count + row['book_count'])
+        )
+        if updated.rowcount == 0:
+            db.session.execute(table.insert(), row)
+
+
+def rebuild_stats(conn, user_ids=None):
+    """Recomputes the counts from the books table with GROUP BY queries.
+
+    The grouped values are read back through the book column types, so they
+    are counted under the same names the write paths use. Also bumps the collection versions of the users rebuilt, so cached
+    statistics responses are not reused.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): A connection in a transaction.
+        user_ids (list): The users to rebuild, or None for everyone.
+
+    Returns:
+        int: The number of count rows written.
+    """
+    stats = CollectionStat.__table__
+    books = Book.__table__
+    versions = CollectionVersion.__table__
+
+    def for_users(stmt, column):
+        return stmt if user_ids is None else stmt.where(column.in_(user_ids))
+
+    conn.execute(for_users(stats.delete(), stats.c.user_id))
+    written = 0
+    for dimension, column in STATS_DIMENSIONS.items():
+        value = books.c[column]
+        query = for_users(
+            sa.select(books.c.user_id, value, sa.func.count()).where(value.is_not(None)).group_by(books.c.user_id, value),
+            books.c.user_id,
+        )
+        rows = [
+            {'user_id': user_id, 'dimension': dimension, 'value': str(key), 'book_count': count}
+            for user_id, key, count in conn.execute(query) if key != ''
+        ]
+        if rows:
+            conn.execute(stats.insert(), rows)
+        written += len(rows)
+    conn.execute(for_users(
+        versions.update().values(version=versions.c.version + 1, updated_at=time.time()), versions.c.user_id))
+    return written
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m models.stats_model DATABASE_URI [USER_ID ...]")
+    with sa.create_engine(sys.argv[1]).begin() as connection:
+        count = rebuild_stats(connection, [int(arg) for arg in sys.argv[2:]] or None)
+    print(f"Rebuilt {count} collection statistics.")
@@ -0,0 +1,12 @@
+from models import db
+
+
+class RevokedToken(db.Model):
+    """Represents an access token revoked before its expiry (e.g. by logging out)."""
+    __tablename__ = 'revoked_tokens'
+
+    jti = db.Column(db.String(32), primary_key=True)  # Token ID from the token's claims
+    expires_at = db.Column(db.Float, nullable=False, index=True)  # Epoch seconds; the row can be dropped after this
+
+    def __repr__(self):
+        return f"<RevokedToken {self.jti}>"
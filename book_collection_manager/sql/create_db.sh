@@ -1,16 +1,8 @@
 #!/bin/bash
 
-# Check if the database file already exists
-if [ -f "$DB_PATH" ]; then
-    echo "Recreating database at $DB_PATH."
-    # Drop and recreate the tables
-    sqlite3 "$DB_PATH" < /app/sql/create_user_table.sql
-    sqlite3 "$DB_PATH" < /app/sql/create_book_table.sql
-    echo "Database recreated successfully."
-else
-    echo "Creating database at $DB_PATH."
-    # Create the database for the first time
-    sqlite3 "$DB_PATH" < /app/sql/create_user_table.sql
-    sqlite3 "$DB_PATH" < /app/sql/create_book_table.sql
-    echo "Database created successfully."
-fi
\ No newline at end of file
+# Create the database if needed and apply any pending schema migrations.
+# The schema itself lives in models/migrations.py; running this against an
+# up-to-date database is a no-op.
+echo "Migrating database at $DB_PATH."
+cd /app && python -m models.migrations "sqlite:///$DB_PATH"
+echo "Database is ready."
@@ -1,8 +0,0 @@
-DROP TABLE IF EXISTS users;
-
-CREATE TABLE users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT NOT NULL UNIQUE,
-    salt TEXT NOT NULL,
-    hashed_password TEXT NOT NULL,
-);
\ No newline at end of file
@@ -0,0 +1,27 @@
+import contextlib
+
+import pytest
+
+from models import db
+from utils.query_capture import QueryCapture
+
+
+@pytest.fixture
+def query_budget(app):
+    """Fixture to hold a block to a budget of SQL statements and database time.
+
+    Uses the ``app`` fixture of the test module. The block fails with
+    QueryBudgetExceeded, listing the statements it ran, when it goes over:
+
+        with query_budget(max_queries=1, max_time=0.1) as capture:
+            response = client.get('/api/books/1')
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    @contextlib.contextmanager
+    def budget(max_queries=None, max_time=None):
+        with QueryCapture(engines) as capture:
+            yield capture
+        capture.check(max_queries, max_time)
+    return budget
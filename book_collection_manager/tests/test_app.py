@@ -0,0 +1,84 @@
+import pytest
+
+import app as app_module
+from benchmarks.startup import parse_importtime, top_level_packages
+from models import db
+from models.migrations import HEAD, current_version
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Fixture to point create_app at a database file that does not exist yet."""
+    path = tmp_path / 'books.db'
+    monkeypatch.setenv('DATABASE_URI', f'sqlite:///{path}')
+    monkeypatch.setenv('ENRICHMENT_WORKERS', '1')
+    return path
+
+
+@pytest.fixture
+def app(database):
+    """Fixture to create the full application."""
+    app = app_module.create_app()
+    yield app
+    app.extensions['enrichment'].stop()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _schema_version(app):
+    with app.app_context(), db.engine.connect() as conn:
+        return current_version(conn)
+
+
+def test_create_app_does_no_io(app, database):
+    """Test that building the app neither opens the database nor starts threads."""
+    assert not database.exists()
+    assert not app.extensions['enrichment']._threads
+    assert 'http_client' not in app.extensions
+
+
+def test_create_app_reads_hashing_settings(database, monkeypatch):
+    """Test that the busy answer's Retry-After delay comes from the environment."""
+    monkeypatch.setenv('HASH_RETRY_AFTER', '7')
+    app = app_module.create_app()
+    assert app.config['HASH_RETRY_AFTER'] == 7
+    app.extensions['enrichment'].stop()
+
+
+def test_first_request_prepares_app(app, database):
+    """Test that the first request brings the schema up to date and starts the enrichment threads."""
+    client = app.test_client()
+    assert client.get('/api/books/collection?user_id=1').status_code == 200
+    assert _schema_version(app) == HEAD
+    assert len(app.extensions['enrichment']._threads) == 1
+
+    assert client.get('/api/books/collection?user_id=1').status_code == 200
+    assert len(app.extensions['enrichment']._threads) == 1
+
+
+def test_upgrade_db_command(app):
+    """Test that the upgrade-db command migrates the database once."""
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['upgrade-db'])
+    assert result.exit_code == 0
+    assert result.output.startswith('Applied migrations: 1, 2')
+    assert _schema_version(app) == HEAD
+
+    assert runner.invoke(args=['upgrade-db']).output == 'Schema is up to date.\n'
+    assert not app.extensions['enrichment']._threads
+
+
+def test_parse_importtime():
+    """Test that -X importtime reports are parsed and summed by package."""
+    report = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   sqlalchemy.util',
+        'import time:      2000 |       2120 | sqlalchemy',
+        'import time:       500 |        500 | flask',
+        'something else on stderr',
+    ])
+    modules = parse_importtime(report)
+    assert [m.name for m in modules] == ['sqlalchemy.util', 'sqlalchemy', 'flask']
+    assert modules[1].self_ms == 2.0
+    assert modules[1].cumulative_ms == 2.12
+    assert top_level_packages(modules) == {'sqlalchemy': 2.12, 'flask': 0.5}
@@ -1,8 +1,12 @@
+import hashlib
+
 import pytest
 from flask import Flask
 from models.user_model import User, db
-from auth_routes import auth_bp
-from utils.hash_utils import hash_password, generate_salt
+from auth_routes import auth_bp, get_token_manager
+from utils.executor import ExecutorBusyError
+from utils.hash_utils import hash_password, generate_salt, needs_rehash
+from utils.tokens import TokenError
 
 
 @pytest.fixture
@@ -12,6 +16,7 @@ def app():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'test-secret-key'
 
     db.init_app(app)
     app.register_blueprint(auth_bp)
@@ -68,6 +73,15 @@ def test_create_account_duplicate_username(client, sample_user):
     assert response.json['error'] == 'Username already exists'
 
 
+def test_create_account_is_one_insert(client, sample_user, query_budget):
+    """Test that a sign-up runs no separate existence check, even for a taken username."""
+    client.post('/create-account', json=sample_user)
+    with query_budget(max_queries=1) as capture:
+        response = client.post('/create-account', json=sample_user)
+    assert response.status_code == 400
+    assert capture.statements[0].startswith('INSERT')
+
+
 def test_create_account_missing_fields(client):
     """Test account creation with missing fields."""
     response = client.post('/create-account', json={"username": "testuser"})
@@ -115,3 +129,132 @@ def test_update_password_missing_fields(client):
     response = client.put('/update-password', json={"username": "testuser"})
     assert response.status_code == 400
     assert response.json['error'] == 'Username and new password are required'
+
+
+##################################################
+# Password Hashing Test Cases
+##################################################
+
+def test_login_rehashes_outdated_hash(client, app, sample_user):
+    """Test that logging in upgrades a legacy SHA-256 hash to the current KDF."""
+    salt = generate_salt()
+    legacy = hashlib.sha256((sample_user['password'] + salt).encode()).hexdigest()
+    with app.app_context():
+        db.session.add(User(username=sample_user['username'], salt=salt, hashed_password=legacy))
+        db.session.commit()
+
+    response = client.post('/login', json=sample_user)
+    assert response.status_code == 200
+
+    with app.app_context():
+        user = User.query.filter_by(username=sample_user['username']).first()
+        assert user.hashed_password != legacy
+        assert not needs_rehash(user.hashed_password)
+
+    assert client.post('/login', json=sample_user).status_code == 200
+
+
+def test_login_busy(client, sample_user, monkeypatch):
+    """Test that a saturated hashing pool fails fast with a 503."""
+    client.post('/create-account', json=sample_user)
+
+    def busy(*args):
+        raise ExecutorBusyError("Executor queue is full")
+
+    monkeypatch.setattr('auth_routes._run_hashing', busy)
+    response = client.post('/login', json=sample_user)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_create_account_busy(client, sample_user, monkeypatch):
+    """Test that account creation fails fast with a 503 when hashing is saturated."""
+    def busy(*args):
+        raise ExecutorBusyError("Executor queue is full")
+
+    monkeypatch.setattr('auth_routes._run_hashing', busy)
+    assert client.post('/create-account', json=sample_user).status_code == 503
+
+
+##################################################
+# Access Token Test Cases
+##################################################
+
+def test_login_issues_token(client, app, sample_user):
+    """Test that a successful login returns a verifiable access token."""
+    user_id = client.post('/create-account', json=sample_user).json['user_id']
+    response = client.post('/login', json=sample_user)
+    assert response.json['token_type'] == 'Bearer'
+    assert response.json['user_id'] == user_id
+    assert response.json['expires_in'] == 3600
+
+    with app.app_context():
+        claims = get_token_manager().verify(response.json['access_token'])
+    assert claims['sub'] == user_id
+
+
+def test_token_key_rotation(app, sample_user):
+    """Test that tokens signed with a retired key still verify after rotation."""
+    with app.app_context():
+        old_token = get_token_manager().issue(1)
+
+    app.config['SECRET_KEY_FALLBACKS'] = [app.config['SECRET_KEY']]
+    app.config['SECRET_KEY'] = 'rotated-secret-key'
+    app.extensions.pop('token_manager')
+    with app.app_context():
+        manager = get_token_manager()
+        assert manager.verify(old_token)['sub'] == 1
+        new_token = manager.issue(1)
+
+    app.config['SECRET_KEY_FALLBACKS'] = []
+    app.extensions.pop('token_manager')
+    with app.app_context():
+        manager = get_token_manager()
+        assert manager.verify(new_token)['sub'] == 1
+        with pytest.raises(TokenError):
+            manager.verify(old_token)
+
+
+def test_logout_revokes_token(client, app, sample_user):
+    """Test that logging out revokes the token, including for other processes."""
+    client.post('/create-account', json=sample_user)
+    token = client.post('/login', json=sample_user).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post('/logout', headers=headers)
+    assert response.status_code == 200
+    assert response.json['message'] == 'Logout successful'
+    assert client.post('/logout', headers=headers).status_code == 401
+
+    # A fresh manager, as in another worker process, loads the revocation from the database.
+    app.extensions.pop('token_manager')
+    with app.app_context():
+        with pytest.raises(TokenError, match='revoked'):
+            get_token_manager().verify(token)
+
+
+def test_logout_without_token(client):
+    """Test logging out without a bearer token."""
+    assert client.post('/logout').status_code == 401
+    assert client.post('/logout', headers={'Authorization': 'Bearer forged'}).status_code == 401
+
+
+##################################################
+# Query Budget Test Cases
+##################################################
+
+# Seconds of database time one request may spend
+QUERY_TIME_BUDGET = 0.1
+
+
+def test_account_routes_query_budget(client, sample_user, query_budget):
+    """Test the statements each account route runs."""
+    with query_budget(max_queries=1, max_time=QUERY_TIME_BUDGET):
+        assert client.post('/create-account', json=sample_user).status_code == 201
+    with query_budget(max_queries=1, max_time=QUERY_TIME_BUDGET):
+        token = client.post('/login', json=sample_user).json['access_token']
+    with query_budget(max_queries=2, max_time=QUERY_TIME_BUDGET):
+        assert client.put('/update-password', json={**sample_user, 'new_password': 'new'}).status_code == 200
+    # Loads the revocation list once, then records the token in it
+    with query_budget(max_queries=4, max_time=QUERY_TIME_BUDGET):
+        assert client.post('/logout', headers={'Authorization': f'Bearer {token}'}).status_code == 200
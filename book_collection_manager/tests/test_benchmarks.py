@@ -0,0 +1,105 @@
+import random
+
+import pytest
+import requests
+from flask import Flask
+
+from auth_routes import auth_bp, authenticate_request
+from benchmarks.compare import compare
+from benchmarks.google_books_stub import GoogleBooksStub
+from benchmarks.load import InProcessClient, parse_mix, run_workload, seed
+from benchmarks.stats import percentile, summarize
+from book_routes import books_bp
+from models.book_model import db
+from utils import hash_utils
+
+
+@pytest.fixture
+def stub():
+    """Fixture to run the Google Books stub."""
+    with GoogleBooksStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def app(stub, monkeypatch, tmp_path):
+    """Fixture to create a Flask app instance that looks up details on the stub."""
+    monkeypatch.setattr(hash_utils, 'PBKDF2_ITERATIONS', 1000)
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    # A file database, since the workload threads each need their own connection
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'benchmark.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'test-secret-key'
+    app.config['GOOGLE_BOOKS_API_URL'] = stub.url
+
+    db.init_app(app)
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(books_bp, url_prefix='/api')
+    app.before_request_funcs.setdefault(books_bp.name, []).append(authenticate_request)
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_percentile_and_summary():
+    """Test nearest-rank percentiles and the summary fields."""
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.99) == 4
+    assert percentile([], 0.5) == 0.0
+
+    summary = summarize([0.001] * 99 + [0.1], errors=2, elapsed=0.5)
+    assert summary['count'] == 100
+    assert summary['errors'] == 2
+    assert summary['throughput'] == 200
+    assert summary['p50_ms'] == 1
+    assert summary['p99_ms'] == 1
+    assert summary['p95_ms'] == 1
+
+
+def test_compare_flags_regressions():
+    """Test that slower latency, lower throughput and new errors are flagged."""
+    base = {'count': 100, 'errors': 0, 'throughput': 100.0, 'p50_ms': 10.0, 'p95_ms': 20.0}
+    baseline = {'get': base, 'collection': base}
+    current = {
+        'get': {**base, 'p50_ms': 10.5, 'p95_ms': 30.0},
+        'collection': {**base, 'throughput': 80.0, 'errors': 1},
+    }
+
+    regressions = {(r['name'], r['metric']) for r in compare(baseline, current, threshold=0.1)}
+    assert regressions == {('get', 'p95_ms'), ('collection', 'throughput'), ('collection', 'errors')}
+
+
+def test_parse_mix_rejects_unknown_operations():
+    """Test that workload mixes only name known operations."""
+    assert parse_mix('get=3,login=1') == {'get': 3.0, 'login': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('explode=1')
+
+
+def test_stub_serves_volumes(stub):
+    """Test the stub's canned answers."""
+    body = requests.get(stub.url, params={'q': 'Dune'}).json()
+    assert body['items'][0]['volumeInfo']['title'] == 'Dune'
+    assert requests.get(stub.url, params={'q': 'missing book'}).json() == {'totalItems': 0}
+    assert stub.requests == 2
+
+
+def test_workload_runs_every_operation(app, stub):
+    """Test seeding and a short mixed run against the in-process app."""
+    users = seed(InProcessClient(app), users=2, books_per_user=20, rng=random.Random(1))
+    assert [len(user.book_ids) for user in users] == [20, 20]
+
+    mix = parse_mix('add=1,get=1,status=1,collection=1,details=1,login=1')
+    results = run_workload(lambda: InProcessClient(app), users, mix, requests=60, concurrency=2,
+                           seed_value=1, titles=['Title 1', 'Title 2'])
+
+    assert results['all']['count'] == 60
+    assert results['all']['errors'] == 0
+    assert set(results) == {*mix, 'all'}
+    assert stub.requests >= 1
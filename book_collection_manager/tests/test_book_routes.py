@@ -1,7 +1,15 @@
+import csv
+import gzip
+import io
+import json
+import time
+
 import pytest
 from flask import Flask
 from models.book_model import Book, db
+from auth_routes import authenticate_request, get_token_manager
 from book_routes import books_bp
+from models.stats_model import CollectionStat, rebuild_stats
 
 
 @pytest.fixture
@@ -11,9 +19,11 @@ def app():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'test-secret-key'
 
     db.init_app(app)
     app.register_blueprint(books_bp, url_prefix='/api')
+    app.before_request_funcs.setdefault(books_bp.name, []).append(authenticate_request)
 
     with app.app_context():
         db.create_all()
@@ -77,6 +87,26 @@ def test_get_book(client, sample_book):
     assert response.json['year'] == sample_book['year']
 
 
+def test_add_book_duplicate(client, app, sample_book):
+    """Test that adding a book the user already has, up to case and spacing, finds the existing one."""
+    book_id = client.post('/api/books', json=sample_book).json['book_id']
+
+    response = client.post('/api/books', json={**sample_book, 'title': '  sample   BOOK '})
+    assert response.status_code == 200
+    assert response.json == {'message': 'Book already in collection', 'book_id': book_id}
+    assert client.post('/api/books', json={**sample_book, 'user_id': 2}).status_code == 201
+    with app.app_context():
+        assert Book.query.count() == 2
+
+
+def test_add_book_invalid_year(client):
+    """Test that years must be numbers."""
+    response = client.post('/api/books', json={'title': 'T', 'author': 'A', 'year': '19th century', 'user_id': 1})
+    assert response.status_code == 400
+    assert response.json['error'] == 'year must be a number of up to 4 digits'
+    assert client.post('/api/books', json={'title': 'T', 'author': 'A', 'year': 1999, 'user_id': 1}).status_code == 201
+
+
 def test_get_nonexistent_book(client):
     """Test retrieving a book that does not exist."""
     response = client.get('/api/books/999') # This is not a real book
@@ -116,6 +146,70 @@ def test_delete_book(client, sample_book):
     assert response.status_code == 404
 
 
+##################################################
+# Batch Read and Status Update Test Cases
+##################################################
+
+def test_get_books_batch(client, query_budget):
+    """Test fetching several books, including missing and invalid IDs, with one query."""
+    ids = _add_books(client, 3)
+
+    with query_budget(max_queries=1):
+        response = client.get(f'/api/books?ids={ids[2]},{ids[0]},999,abc')
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [r['status'] for r in results] == [200, 200, 404, 400]
+    assert results[0]['book']['id'] == ids[2]
+    assert results[1]['book']['title'] == 'Book 0'
+    assert results[2] == {'id': 999, 'status': 404, 'error': 'Book not found'}
+    assert results[3] == {'id': 'abc', 'status': 400, 'error': 'Invalid book ID'}
+
+
+def test_get_books_batch_limits(client, app):
+    """Test that batch reads need IDs and respect BOOKS_BATCH_MAX_IDS."""
+    app.config['BOOKS_BATCH_MAX_IDS'] = 2
+    assert client.get('/api/books').status_code == 400
+    response = client.get('/api/books?ids=1,2,3')
+    assert response.status_code == 400
+    assert response.json['error'] == 'At most 2 books may be requested at once'
+
+
+def test_update_reading_statuses(client, app):
+    """Test marking several books as read in one transaction."""
+    ids = _add_books(client, 3)
+    client.put(f'/api/books/{ids[2]}', json={'status': 'read'})
+    etag = client.get('/api/books/collection?user_id=1').headers['ETag']
+
+    response = client.patch('/api/books/status', json={'ids': ids + [999, 'x'], 'status': 'read'})
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == [200, 200, 200, 404, 400]
+
+    assert all(b['status'] == 'read' for b in client.get('/api/books/collection?user_id=1').json['collection'])
+    with app.app_context():
+        # Only the two books whose status changed were rewritten
+        assert [db.session.get(Book, book_id).version for book_id in ids] == [2, 2, 2]
+    assert client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_update_reading_statuses_unchanged_keeps_version(client):
+    """Test that a batch that changes nothing leaves the collection ETag alone."""
+    ids = _add_books(client, 2)
+    etag = client.get('/api/books/collection?user_id=1').headers['ETag']
+
+    response = client.patch('/api/books/status', json={'ids': ids, 'status': 'unread'})
+    assert response.status_code == 200
+    assert client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_update_reading_statuses_invalid(client, app):
+    """Test rejected batch status updates."""
+    app.config['BOOKS_BATCH_MAX_IDS'] = 2
+    assert client.patch('/api/books/status', json={'ids': [1], 'status': 'done'}).status_code == 400
+    assert client.patch('/api/books/status', json={'ids': [], 'status': 'read'}).status_code == 400
+    assert client.patch('/api/books/status', json={'status': 'read'}).status_code == 400
+    assert client.patch('/api/books/status', json={'ids': [1, 2, 3], 'status': 'read'}).status_code == 400
+
+
 ##################################################
 # Google Books API Integration Test Cases
 ##################################################
@@ -143,7 +237,7 @@ def test_get_book_details(client, monkeypatch):
 
         return MockResponse()
 
-    monkeypatch.setattr('requests.get', mock_get)
+    monkeypatch.setattr('requests.Session.get', mock_get)
 
     response = client.get('/api/books/details?title=Mocked')
     assert response.status_code == 200
@@ -170,8 +264,868 @@ def test_get_book_details_api_failure(client, monkeypatch):
 
         return MockResponse()
 
-    monkeypatch.setattr('requests.get', mock_get)
+    monkeypatch.setattr('requests.Session.get', mock_get)
 
     response = client.get('/api/books/details?title=Mocked')
     assert response.status_code == 500
     assert response.json['error'] == 'Failed to fetch book details'
+
+
+def _mock_details_api(monkeypatch, items, status_code=200):
+    """Patches requests.Session.get with a Google Books stand-in and returns the list of queries made."""
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(kwargs.get('params', {}).get('q'))
+
+        class MockResponse:
+            def __init__(self):
+                self.status_code = status_code
+
+            def json(self):
+                return {'items': items}
+
+        return MockResponse()
+
+    monkeypatch.setattr('requests.Session.get', mock_get)
+    return calls
+
+
+def test_get_book_details_cached(client, app, monkeypatch):
+    """Test that repeated lookups of the same title are served from the cache."""
+    calls = _mock_details_api(monkeypatch, [{'volumeInfo': {'title': 'Mocked Book', 'authors': ['A']}}])
+
+    first = client.get('/api/books/details?title=Mocked Book')
+    second = client.get('/api/books/details?title=  mocked   BOOK ')
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json == first.json
+    assert calls == ['mocked book']
+
+    stats = app.extensions['details_cache'].stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_get_book_details_not_found_cached(client, monkeypatch):
+    """Test that "no details found" results are cached."""
+    calls = _mock_details_api(monkeypatch, [])
+
+    assert client.get('/api/books/details?title=Nothing').status_code == 404
+    assert client.get('/api/books/details?title=Nothing').status_code == 404
+    assert len(calls) == 1
+
+
+def test_get_book_details_not_found_uses_negative_ttl(client, app, monkeypatch):
+    """Test that "no details found" results expire after the negative TTL."""
+    _mock_details_api(monkeypatch, [])
+    client.get('/api/books/details?title=Nothing')
+
+    cache = app.extensions['details_cache']
+    expires_at, _ = cache._entries['nothing']
+    assert expires_at - cache._clock() <= cache.negative_ttl
+
+
+def test_get_book_details_failure_not_cached(client, monkeypatch):
+    """Test that upstream failures are not cached."""
+    calls = _mock_details_api(monkeypatch, [], status_code=500)
+
+    assert client.get('/api/books/details?title=Mocked').status_code == 500
+    assert client.get('/api/books/details?title=Mocked').status_code == 500
+    assert len(calls) == 2
+
+
+def test_get_book_details_batch(client, monkeypatch):
+    """Test fetching details for several titles in one request."""
+    calls = _mock_details_api(monkeypatch, [{'volumeInfo': {'title': 'Mocked Book', 'authors': ['A', 'B']}}])
+
+    response = client.post('/api/books/details/batch', json={'titles': ['One', 'Two', 'one']})
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [r['title'] for r in results] == ['One', 'Two', 'one']
+    assert all(r['status'] == 200 for r in results)
+    assert results[0]['details']['author'] == 'A, B'
+    assert sorted(calls) == ['one', 'two']
+
+
+def test_get_book_details_batch_runs_concurrently(client, monkeypatch):
+    """Test that batch lookups overlap instead of running one after another."""
+    def slow_get(*args, **kwargs):
+        time.sleep(0.2)
+
+        class MockResponse:
+            status_code = 200
+
+            def json(self):
+                return {'items': [{'volumeInfo': {'title': kwargs['params']['q']}}]}
+
+        return MockResponse()
+
+    monkeypatch.setattr('requests.Session.get', slow_get)
+
+    started = time.perf_counter()
+    response = client.post('/api/books/details/batch', json={'titles': [f'Title {i}' for i in range(10)]})
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200
+    assert len(response.json['results']) == 10
+    assert elapsed < 1.0
+
+
+def test_get_book_details_batch_reports_per_title_errors(client, monkeypatch):
+    """Test that titles without details are reported individually."""
+    _mock_details_api(monkeypatch, [])
+
+    response = client.post('/api/books/details/batch', json={'titles': ['Nothing']})
+    assert response.status_code == 200
+    assert response.json['results'] == [{'title': 'Nothing', 'status': 404, 'error': 'No book details found'}]
+
+
+def test_get_book_details_batch_invalid(client, app):
+    """Test batch details validation."""
+    assert client.post('/api/books/details/batch', json={}).status_code == 400
+    assert client.post('/api/books/details/batch', json={'titles': ['ok', '']}).status_code == 400
+
+    app.config['DETAILS_BATCH_MAX_TITLES'] = 2
+    response = client.post('/api/books/details/batch', json={'titles': ['a', 'b', 'c']})
+    assert response.status_code == 400
+    assert response.json['error'] == 'At most 2 titles may be requested at once'
+
+
+##################################################
+# Collection Test Cases
+##################################################
+
+def _add_books(client, count, user_id=1):
+    """Adds ``count`` books for a user and returns their IDs."""
+    return [
+        client.post('/api/books', json={'title': f'Book {i}', 'author': f'Author {i}', 'year': '2020', 'user_id': user_id}).json['book_id']
+        for i in range(count)
+    ]
+
+
+def test_get_collection(client):
+    """Test retrieving a user's full collection."""
+    ids = _add_books(client, 3)
+    _add_books(client, 2, user_id=2)
+
+    response = client.get('/api/books/collection?user_id=1')
+    assert response.status_code == 200
+    assert [b['id'] for b in response.json['collection']] == ids
+    assert set(response.json['collection'][0]) == {'id', 'title', 'author', 'year', 'status'}
+    assert 'next_after' not in response.json
+
+
+def test_get_collection_missing_user_id(client):
+    """Test retrieving a collection without a user_id."""
+    response = client.get('/api/books/collection')
+    assert response.status_code == 400
+    assert response.json['error'] == 'user_id is required'
+
+
+def test_get_collection_paginated(client):
+    """Test keyset pagination over a collection."""
+    ids = _add_books(client, 5)
+
+    first = client.get('/api/books/collection?user_id=1&limit=2').json
+    assert [b['id'] for b in first['collection']] == ids[:2]
+    assert first['next_after'] == ids[1]
+
+    second = client.get(f"/api/books/collection?user_id=1&limit=2&after={first['next_after']}").json
+    assert [b['id'] for b in second['collection']] == ids[2:4]
+
+    last = client.get(f"/api/books/collection?user_id=1&limit=2&after={second['next_after']}").json
+    assert [b['id'] for b in last['collection']] == ids[4:]
+    assert last['next_after'] is None
+
+
+def test_get_collection_fields(client):
+    """Test projecting a subset of columns."""
+    _add_books(client, 2)
+
+    response = client.get('/api/books/collection?user_id=1&fields=title,status')
+    assert response.status_code == 200
+    assert response.json['collection'] == [
+        {'title': 'Book 0', 'status': 'unread'},
+        {'title': 'Book 1', 'status': 'unread'},
+    ]
+
+
+def test_get_collection_invalid_parameters(client):
+    """Test that invalid collection parameters are rejected."""
+    assert client.get('/api/books/collection?user_id=abc').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&limit=0').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&after=x').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&fields=title,password').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&status=lost').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&year_from=1990s').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&sort=pages').status_code == 400
+    assert client.get('/api/books/collection?user_id=1&sort=title&after=1').status_code == 400
+
+
+def test_get_collection_streamed(client, app):
+    """Test that the streamed collection matches the buffered one."""
+    app.config['COLLECTION_STREAM_BATCH_SIZE'] = 2
+    _add_books(client, 5)
+
+    buffered = client.get('/api/books/collection?user_id=1')
+    streamed = client.get('/api/books/collection?user_id=1&stream=true')
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.json == buffered.json
+
+    paged = client.get('/api/books/collection?user_id=1&stream=true&limit=3&fields=id').json
+    assert [b['id'] for b in paged['collection']] == [b['id'] for b in buffered.json['collection'][:3]]
+    assert paged['next_after'] == paged['collection'][-1]['id']
+
+
+def test_get_collection_streamed_empty(client):
+    """Test streaming an empty collection."""
+    response = client.get('/api/books/collection?user_id=1&stream=true')
+    assert response.json == {'collection': []}
+
+
+def _add_shelf(client):
+    shelf = [('Emma', 'Austen', '1815', 'read'), ('Dune', 'Herbert', '1965', 'unread'),
+             ('Persuasion', 'Austen', '1817', 'unread'), ('Beowulf', 'Unknown', '', 'read'),
+             ('Ulysses', 'Joyce', '1922', 'read'), ('Sanditon', 'Austen', '', 'unread')]
+    ids = {}
+    for title, author, year, status in shelf:
+        book_id = client.post('/api/books', json={'title': title, 'author': author, 'year': year, 'user_id': 1}).json['book_id']
+        client.put(f'/api/books/{book_id}', json={'status': status})
+        ids[title] = book_id
+    return ids
+
+
+def _titles(response):
+    return [book['title'] for book in response.json['collection']]
+
+
+def test_get_collection_filtered(client):
+    """Test filtering a collection by status, author and year range."""
+    _add_shelf(client)
+    _add_books(client, 2, user_id=2)
+
+    assert _titles(client.get('/api/books/collection?user_id=1&status=read')) == ['Emma', 'Beowulf', 'Ulysses']
+    assert _titles(client.get('/api/books/collection?user_id=1&author=Austen')) == ['Emma', 'Persuasion', 'Sanditon']
+    assert _titles(client.get('/api/books/collection?user_id=1&year_from=1816&year_to=1965')) == \
+        ['Dune', 'Persuasion', 'Ulysses']
+    response = client.get('/api/books/collection?user_id=1&author=Austen&status=unread&year_to=1900')
+    assert response.json['collection'] == [
+        {'id': response.json['collection'][0]['id'], 'title': 'Persuasion', 'author': 'Austen', 'year': '1817',
+         'status': 'unread'},
+    ]
+
+
+def test_get_collection_sorted_pages(client):
+    """Test that sorted pages join up, with unknown years first in ascending order and last in descending order."""
+    _add_shelf(client)
+
+    for sort, expected in [
+        ('title', ['Beowulf', 'Dune', 'Emma', 'Persuasion', 'Sanditon', 'Ulysses']),
+        ('-author', ['Beowulf', 'Ulysses', 'Dune', 'Sanditon', 'Persuasion', 'Emma']),
+        ('year', ['Beowulf', 'Sanditon', 'Emma', 'Persuasion', 'Ulysses', 'Dune']),
+        ('-year', ['Dune', 'Ulysses', 'Persuasion', 'Emma', 'Sanditon', 'Beowulf']),
+        ('-id', ['Sanditon', 'Ulysses', 'Beowulf', 'Persuasion', 'Dune', 'Emma']),
+    ]:
+        assert _titles(client.get(f'/api/books/collection?user_id=1&sort={sort}')) == expected
+        for stream in ('false', 'true'):
+            params = {'user_id': 1, 'sort': sort, 'limit': 2, 'stream': stream}
+            titles = []
+            while True:
+                page = client.get('/api/books/collection', query_string=params)
+                titles += _titles(page)
+                if page.json['next_after'] is None:
+                    break
+                params['after'] = page.json['next_after']
+            assert titles == expected, (sort, stream)
+
+
+def test_get_collection_filters_use_indexes(app):
+    """Test that every filter and sort reads the user's books through an index."""
+    from book_routes import _collection_filters, _collection_query
+
+    cases = [
+        ({'status': 'read'}, ('id', False), None, 'ix_books_user_id_status'),
+        ({'author': 'Austen'}, ('id', False), None, 'ix_books_user_id_author'),
+        ({'year_from': '1800', 'year_to': '1900'}, ('id', False), None, 'ix_books_user_id_year'),
+        ({}, ('title', False), ('Emma', 3), 'ix_books_user_id_title'),
+        ({}, ('year', True), ('1900', 3), 'ix_books_user_id_year'),
+    ]
+    with app.app_context():
+        for args, sort, after, index in cases:
+            conditions, _ = _collection_filters(args)
+            compiled = _collection_query(1, ['id', 'title'], after, 10, conditions, sort).compile(db.engine)
+            params = compiled.construct_params()
+            plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+                'EXPLAIN QUERY PLAN ' + str(compiled), tuple(params[name] for name in compiled.positiontup)))
+            assert index in plan, (args, sort, plan)
+            assert 'SCAN books' not in plan
+
+
+##################################################
+# Conditional GET Test Cases
+##################################################
+
+def test_get_book_etag(client, sample_book):
+    """Test that a book read is answered with 304 until the book changes."""
+    book_id = client.post('/api/books', json=sample_book).json['book_id']
+
+    response = client.get(f'/api/books/{book_id}')
+    etag = response.headers['ETag']
+    assert etag == f'"book-{book_id}-v1"'
+    assert response.headers['Last-Modified']
+
+    cached = client.get(f'/api/books/{book_id}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+    client.put(f'/api/books/{book_id}', json={'status': 'read'})
+    changed = client.get(f'/api/books/{book_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] == f'"book-{book_id}-v2"'
+    assert changed.json['status'] == 'read'
+
+
+def test_get_book_if_modified_since(client, sample_book):
+    """Test If-Modified-Since on a book read."""
+    book_id = client.post('/api/books', json=sample_book).json['book_id']
+    last_modified = client.get(f'/api/books/{book_id}').headers['Last-Modified']
+
+    response = client.get(f'/api/books/{book_id}', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    response = client.get(f'/api/books/{book_id}', headers={'If-Modified-Since': 'Thu, 01 Jan 2004 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_get_collection_etag_tracks_writes(client):
+    """Test that every kind of write to a collection changes its ETag."""
+    ids = _add_books(client, 2)
+    etags = [client.get('/api/books/collection?user_id=1').headers['ETag']]
+
+    def assert_changed():
+        response = client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etags[-1]})
+        assert response.status_code == 200
+        assert response.headers['ETag'] not in etags
+        etags.append(response.headers['ETag'])
+
+    assert client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etags[-1]}).status_code == 304
+    client.post('/api/books', json={'title': 'New Book', 'author': 'Author', 'user_id': 1})
+    assert_changed()
+    client.put(f'/api/books/{ids[0]}', json={'status': 'read'})
+    assert_changed()
+    client.delete(f'/api/books/{ids[1]}')
+    assert_changed()
+    client.post('/api/books/import?format=ndjson', data=json.dumps({'title': 'T', 'author': 'A', 'user_id': 1}))
+    assert_changed()
+
+    # Another user's writes leave this collection's ETag alone
+    _add_books(client, 1, user_id=2)
+    assert client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etags[-1]}).status_code == 304
+
+
+def test_get_collection_etag_varies_with_parameters(client):
+    """Test that differently shaped collection responses do not share an ETag."""
+    _add_books(client, 3)
+    full = client.get('/api/books/collection?user_id=1').headers['ETag']
+    page = client.get('/api/books/collection?user_id=1&limit=2').headers['ETag']
+    assert full != page
+    assert client.get('/api/books/collection?user_id=1&limit=2', headers={'If-None-Match': full}).status_code == 200
+
+    streamed = client.get('/api/books/collection?user_id=1&stream=true', headers={'If-None-Match': full})
+    assert streamed.status_code == 200
+    streamed_etag = streamed.headers['ETag']
+    assert client.get('/api/books/collection?user_id=1&stream=true',
+                      headers={'If-None-Match': streamed_etag}).status_code == 304
+
+
+def test_get_collection_not_modified_skips_rows(client, query_budget):
+    """Test that a 304 is worked out from the collection version without reading the books."""
+    _add_books(client, 2)
+    etag = client.get('/api/books/collection?user_id=1').headers['ETag']
+
+    with query_budget(max_queries=1) as capture:
+        response = client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert 'collection_versions' in capture.statements[0]
+
+
+def test_get_collection_served_from_response_cache(client, app, query_budget):
+    """Test that a repeated collection read is answered from the cache after the version check."""
+    _add_books(client, 2)
+    first = client.get('/api/books/collection?user_id=1')
+
+    with query_budget(max_queries=1) as capture:
+        second = client.get('/api/books/collection?user_id=1')
+
+    assert second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert 'collection_versions' in capture.statements[0]
+    assert app.extensions['response_cache'].stats()['hits'] == 1
+
+
+def test_get_collection_response_cache_invalidated_by_writes(client, app):
+    """Test that writes move a collection to a new cache key."""
+    book_id = _add_books(client, 1)[0]
+    client.get('/api/books/collection?user_id=1')
+
+    client.put(f'/api/books/{book_id}', json={'status': 'read'})
+    response = client.get('/api/books/collection?user_id=1')
+    assert response.json['collection'][0]['status'] == 'read'
+
+    client.delete(f'/api/books/{book_id}')
+    assert client.get('/api/books/collection?user_id=1').json['collection'] == []
+    assert app.extensions['response_cache'].stats()['hits'] == 0
+
+
+def test_get_collection_response_cache_disabled(client, app):
+    """Test that RESPONSE_CACHE_BACKEND=none serves every read from the database."""
+    app.config['RESPONSE_CACHE_BACKEND'] = 'none'
+    _add_books(client, 1)
+    client.get('/api/books/collection?user_id=1')
+    assert client.get('/api/books/collection?user_id=1').status_code == 200
+    assert app.extensions['response_cache'] is None
+
+
+##################################################
+# Stats Test Cases
+##################################################
+
+def _stats(client, user_id=1, **params):
+    return client.get('/api/books/stats', query_string={'user_id': user_id, **params}).json
+
+
+def test_get_collection_stats(client):
+    """Test counts by status, year and author."""
+    for title, author, year in [('A', 'Austen', '1813'), ('B', 'Austen', '1815'), ('C', 'Bronte', '1847'), ('D', 'Eliot', '')]:
+        client.post('/api/books', json={'title': title, 'author': author, 'year': year, 'user_id': 1})
+    _add_books(client, 2, user_id=2)
+
+    stats = _stats(client)
+    assert stats == {
+        'user_id': 1,
+        'total': 4,
+        'by_status': {'unread': 4},
+        'by_year': {'1813': 1, '1815': 1, '1847': 1},
+        'top_authors': [{'author': 'Austen', 'count': 2}, {'author': 'Bronte', 'count': 1}, {'author': 'Eliot', 'count': 1}],
+    }
+    assert _stats(client, top=1)['top_authors'] == [{'author': 'Austen', 'count': 2}]
+
+
+def test_get_collection_stats_tracks_writes(client, app):
+    """Test that every write path keeps the counts in step with the books."""
+    ids = _add_books(client, 3)
+    client.put(f'/api/books/{ids[0]}', json={'status': 'read'})
+    client.patch('/api/books/status', json={'ids': ids[1:], 'status': 'read'})
+    client.put(f'/api/books/{ids[1]}', json={'status': 'unread'})
+    client.delete(f'/api/books/{ids[2]}')
+    client.post('/api/books/import?format=ndjson', data='{"title": "I", "author": "Author 0", "year": "2021"}')
+
+    stats = _stats(client)
+    assert stats['total'] == 3
+    assert stats['by_status'] == {'read': 1, 'unread': 2}
+    assert stats['by_year'] == {'2020': 2, '2021': 1}
+    assert stats['top_authors'][0] == {'author': 'Author 0', 'count': 2}
+
+    # A rebuild from the books table agrees with the incremental counts
+    with app.app_context():
+        with db.engine.begin() as conn:
+            rebuild_stats(conn)
+    assert _stats(client) == stats
+
+
+def test_rebuild_stats_repairs_drift(client, app):
+    """Test that a rebuild recomputes counts and invalidates cached responses."""
+    _add_books(client, 2)
+    _add_books(client, 1, user_id=2)
+    etag = client.get('/api/books/stats?user_id=1').headers['ETag']
+    with app.app_context():
+        db.session.execute(db.delete(CollectionStat))
+        db.session.commit()
+        with db.engine.begin() as conn:
+            assert rebuild_stats(conn, [1]) == 4
+
+    response = client.get('/api/books/stats?user_id=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['total'] == 2
+    assert _stats(client, user_id=2)['total'] == 0
+
+
+def test_get_collection_stats_not_modified(client):
+    """Test that unchanged stats are answered with a 304."""
+    _add_books(client, 1)
+    etag = client.get('/api/books/stats?user_id=1').headers['ETag']
+    assert etag != client.get('/api/books/collection?user_id=1').headers['ETag']
+    assert client.get('/api/books/stats?user_id=1', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_get_collection_stats_invalid_request(client):
+    """Test that stats requests need a user_id and a valid top."""
+    assert client.get('/api/books/stats').status_code == 400
+    assert client.get('/api/books/stats?user_id=x').status_code == 400
+    assert client.get('/api/books/stats?user_id=1&top=0').status_code == 400
+    assert _stats(client) == {'user_id': 1, 'total': 0, 'by_status': {}, 'by_year': {}, 'top_authors': []}
+
+
+##################################################
+# Bulk Import Test Cases
+##################################################
+
+def test_import_books_ndjson(client, app):
+    """Test importing books from NDJSON in several batches."""
+    lines = [json.dumps({'title': f'Book {i}', 'author': 'Author', 'year': '2001'}) for i in range(5)]
+    response = client.post('/api/books/import?user_id=7&batch_size=2', data='\n'.join(lines) + '\n',
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.json['imported'] == 5
+    assert response.json['failed'] == 0
+
+    with app.app_context():
+        assert Book.query.filter_by(user_id=7).count() == 5
+
+
+def test_import_books_skips_duplicates(client, app):
+    """Test that books already in the collection, or repeated in the upload, are counted as duplicates."""
+    client.post('/api/books', json={'title': 'Dune', 'author': 'Frank Herbert', 'user_id': 1})
+    body = '\n'.join(json.dumps({'title': title, 'author': 'Frank Herbert'}) for title in ['dune', 'Emma', 'EMMA', 'Dune'])
+    response = client.post('/api/books/import?format=ndjson&batch_size=3', data=body)
+    assert (response.json['imported'], response.json['duplicates'], response.json['failed']) == (1, 3, 0)
+    with app.app_context():
+        assert sorted(book.title for book in Book.query) == ['Dune', 'Emma']
+    assert _stats(client)['total'] == 2
+
+
+def test_import_books_csv(client, app):
+    """Test importing books from CSV, with a per-row owner override."""
+    body = 'title,author,year,user_id\nCSV Book,CSV Author,1999,\nOther Book,Other Author,,3\n'
+    response = client.post('/api/books/import', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.json['imported'] == 2
+
+    with app.app_context():
+        books = Book.query.order_by(Book.id).all()
+        assert [(b.title, b.year, b.user_id, b.status) for b in books] == [
+            ('CSV Book', '1999', 1, 'unread'),
+            ('Other Book', '', 3, 'unread'),
+        ]
+
+
+def test_import_books_keeps_exported_status(client, app):
+    """Test that importing an export keeps each book's status, and that unknown statuses are rejected."""
+    ids = _add_books(client, 2)
+    client.put(f'/api/books/{ids[1]}', json={'status': 'read'})
+    export = client.get('/api/books/export?user_id=1&format=csv').get_data(as_text=True)
+
+    response = client.post('/api/books/import?user_id=2', data=export, content_type='text/csv')
+    assert response.json['imported'] == 2
+    with app.app_context():
+        assert [(b.title, b.status) for b in Book.query.filter_by(user_id=2).order_by(Book.id)] == [
+            ('Book 0', 'unread'), ('Book 1', 'read'),
+        ]
+    assert _stats(client, user_id=2)['by_status'] == {'read': 1, 'unread': 1}
+
+    response = client.post('/api/books/import?format=ndjson',
+                           data=json.dumps({'title': 'T', 'author': 'A', 'status': 'reading'}))
+    assert response.json['errors'] == [{'row': 1, 'error': 'status must be one of: unread, read'}]
+
+
+def test_import_books_reports_row_errors(client, app):
+    """Test that invalid rows are reported and valid rows are still imported."""
+    body = '\n'.join([
+        json.dumps({'title': 'Good', 'author': 'Author'}),
+        json.dumps({'title': 'No author'}),
+        '{not json',
+        json.dumps({'title': 'Bad owner', 'author': 'Author', 'user_id': 'abc'}),
+        json.dumps({'title': 'Also good', 'author': 'Author'}),
+    ])
+    response = client.post('/api/books/import?format=ndjson', data=body)
+    assert response.status_code == 200
+    assert response.json['imported'] == 2
+    assert response.json['failed'] == 3
+    assert response.json['errors'] == [
+        {'row': 2, 'error': 'Title and Author are required'},
+        {'row': 3, 'error': 'Invalid JSON'},
+        {'row': 4, 'error': 'user_id must be an integer'},
+    ]
+    assert response.json['errors_truncated'] is False
+
+
+def test_import_books_caps_error_report(client, app):
+    """Test that the error report is bounded."""
+    app.config['IMPORT_MAX_ERRORS'] = 2
+    body = '\n'.join(json.dumps({'title': 'No author'}) for _ in range(5))
+    response = client.post('/api/books/import?format=ndjson', data=body)
+    assert response.json['failed'] == 5
+    assert len(response.json['errors']) == 2
+    assert response.json['errors_truncated'] is True
+
+
+def test_import_books_invalid_request(client):
+    """Test that unsupported formats and batch sizes are rejected."""
+    assert client.post('/api/books/import', data='x', content_type='text/plain').status_code == 400
+    assert client.post('/api/books/import?format=csv&batch_size=0', data='title,author\n').status_code == 400
+
+
+##################################################
+# Export Test Cases
+##################################################
+
+def test_export_ndjson(client, app):
+    """Test exporting a collection as NDJSON across several cursor partitions."""
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    ids = _add_books(client, 5)
+    _add_books(client, 1, user_id=2)
+
+    response = client.get('/api/books/export?user_id=1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == ids
+    assert set(rows[0]) == {'id', 'title', 'author', 'year', 'status', 'cover_image', 'summary'}
+
+
+def test_export_csv(client):
+    """Test exporting a collection as CSV."""
+    _add_books(client, 3)
+
+    response = client.get('/api/books/export?user_id=1&format=csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['title'] for row in rows] == ['Book 0', 'Book 1', 'Book 2']
+
+
+def test_export_gzip(client):
+    """Test exporting a gzip-compressed collection."""
+    _add_books(client, 3)
+
+    response = client.get('/api/books/export?user_id=1&gzip=true')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+    assert len(lines) == 3
+
+
+def test_export_invalid_request(client):
+    """Test that invalid export requests are rejected."""
+    assert client.get('/api/books/export').status_code == 400
+    assert client.get('/api/books/export?user_id=x').status_code == 400
+    assert client.get('/api/books/export?user_id=1&format=xml').status_code == 400
+
+
+##################################################
+# Search Test Cases
+##################################################
+
+@pytest.fixture
+def searchable_books(client, app):
+    """Fixture to add a few books with summaries for user 1 and one for user 2."""
+    books = [
+        ('The Pragmatic Programmer', 'Andrew Hunt', 'Practical advice for software developers.'),
+        ('Python Tricks', 'Dan Bader', 'A buffet of awesome Python features.'),
+        ('Dune', 'Frank Herbert', 'A desert planet and its spice.'),
+    ]
+    ids = []
+    for title, author, summary in books:
+        ids.append(client.post('/api/books', json={'title': title, 'author': author, 'year': '2017'}).json['book_id'])
+    client.post('/api/books', json={'title': 'Python Crash Course', 'author': 'Eric Matthes', 'user_id': 2})
+    with app.app_context():
+        for book_id, (_, _, summary) in zip(ids, books):
+            db.session.get(Book, book_id).summary = summary
+        db.session.commit()
+    return ids
+
+
+def test_search_books(client, searchable_books):
+    """Test ranked full-text search with highlights, restricted to the user's books."""
+    response = client.get('/api/books/search?q=python&user_id=1')
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [r['id'] for r in results] == [searchable_books[1]]
+    assert results[0]['title_highlight'] == '<mark>Python</mark> Tricks'
+    assert '<mark>Python</mark>' in results[0]['snippet']
+    assert results[0]['status'] == 'unread'
+    assert results[0]['year'] == '2017'
+    assert response.json['next_offset'] is None
+
+
+def test_search_books_matches_author_summary_and_prefix(client, searchable_books):
+    """Test matching on author, summary and partially typed words."""
+    assert [r['id'] for r in client.get('/api/books/search?q=herbert&user_id=1').json['results']] == [searchable_books[2]]
+    assert [r['id'] for r in client.get('/api/books/search?q=spice&user_id=1').json['results']] == [searchable_books[2]]
+    assert [r['id'] for r in client.get('/api/books/search?q=pragm&user_id=1').json['results']] == [searchable_books[0]]
+
+
+def test_search_books_ignores_query_syntax(client, searchable_books):
+    """Test that FTS operators in user input are treated as plain words."""
+    response = client.get('/api/books/search?q="dune" OR (NEAR&user_id=1')
+    assert response.status_code == 200
+    assert response.json['results'] == []
+
+
+def test_search_books_paginates(client, searchable_books):
+    """Test paginating search results with limit and offset."""
+    first = client.get('/api/books/search?q=a&user_id=1&limit=1').json
+    assert len(first['results']) == 1
+    assert first['next_offset'] == 1
+
+
+def test_search_books_tracks_writes(client, searchable_books):
+    """Test that the index follows inserts and deletes."""
+    client.delete(f'/api/books/{searchable_books[2]}')
+    assert client.get('/api/books/search?q=dune&user_id=1').json['results'] == []
+
+    client.post('/api/books', json={'title': 'Dune Messiah', 'author': 'Frank Herbert'})
+    assert [r['title'] for r in client.get('/api/books/search?q=dune&user_id=1').json['results']] == ['Dune Messiah']
+
+
+def test_search_books_escapes_html(client, app):
+    """Test that book text is HTML-escaped in highlights and snippets, around the <mark> tags."""
+    book_id = client.post('/api/books', json={'title': '<script>alert(1)</script> Python', 'author': 'A & B'}).json['book_id']
+    with app.app_context():
+        db.session.get(Book, book_id).summary = 'Python <img src=x onerror=alert(1)>'
+        db.session.commit()
+
+    result = client.get('/api/books/search?q=python&user_id=1').json['results'][0]
+    assert result['title'] == '<script>alert(1)</script> Python'
+    assert result['title_highlight'] == '&lt;script&gt;alert(1)&lt;/script&gt; <mark>Python</mark>'
+    assert result['author_highlight'] == 'A &amp; B'
+    assert result['snippet'] == '<mark>Python</mark> &lt;img src=x onerror=alert(1)&gt;'
+
+    app.extensions['search_index'] = False
+    result = client.get('/api/books/search?q=python&user_id=1').json['results'][0]
+    assert result['title_highlight'] == '&lt;script&gt;alert(1)&lt;/script&gt; Python'
+
+
+def test_search_books_like_fallback(client, app, searchable_books):
+    """Test the LIKE-based search used when there is no full-text index."""
+    app.extensions['search_index'] = False
+    response = client.get('/api/books/search?q=spice planet&user_id=1')
+    assert response.status_code == 200
+    assert [r['id'] for r in response.json['results']] == [searchable_books[2]]
+    assert response.json['results'][0]['snippet'] == 'A desert planet and its spice.'
+    assert (response.json['results'][0]['status'], response.json['results'][0]['year']) == ('unread', '2017')
+
+
+def test_search_books_invalid_request(client):
+    """Test that searches without q or user_id are rejected."""
+    assert client.get('/api/books/search?user_id=1').status_code == 400
+    assert client.get('/api/books/search?q=x').status_code == 400
+    assert client.get('/api/books/search?q=x&user_id=1&limit=0').status_code == 400
+
+
+##################################################
+# Access Token Test Cases
+##################################################
+
+@pytest.fixture
+def token_headers(app):
+    """Fixture to provide Authorization headers carrying a token for user 5."""
+    with app.app_context():
+        return {'Authorization': f'Bearer {get_token_manager().issue(5)}'}
+
+
+def test_add_book_with_token_uses_token_user(client, app, sample_book, token_headers):
+    """Test that a book added with a token belongs to the token's user."""
+    response = client.post('/api/books', json=sample_book, headers=token_headers)
+    assert response.status_code == 201
+    with app.app_context():
+        assert db.session.get(Book, response.json['book_id']).user_id == 5
+
+
+def test_add_book_with_token_rejects_other_user(client, sample_book, token_headers):
+    """Test that a token holder cannot add books for someone else."""
+    response = client.post('/api/books', json={**sample_book, 'user_id': 6}, headers=token_headers)
+    assert response.status_code == 403
+    assert response.json['error'] == 'user_id does not match the authenticated user'
+
+
+def test_collection_with_token(client, token_headers):
+    """Test that the collection route reads the user from the token."""
+    _add_books(client, 2, user_id=5)
+    _add_books(client, 1, user_id=6)
+
+    response = client.get('/api/books/collection', headers=token_headers)
+    assert response.status_code == 200
+    assert len(response.json['collection']) == 2
+    assert client.get('/api/books/collection?user_id=6', headers=token_headers).status_code == 403
+
+
+def test_book_routes_hide_other_users_books(client, token_headers):
+    """Test that a token holder cannot read, change or delete another user's book."""
+    book_id = _add_books(client, 1, user_id=6)[0]
+
+    assert client.get(f'/api/books/{book_id}', headers=token_headers).status_code == 404
+    assert client.put(f'/api/books/{book_id}', json={'status': 'read'}, headers=token_headers).status_code == 404
+    assert client.delete(f'/api/books/{book_id}', headers=token_headers).status_code == 404
+    assert client.get(f'/api/books?ids={book_id}', headers=token_headers).json['results'][0]['status'] == 404
+    response = client.patch('/api/books/status', json={'ids': [book_id], 'status': 'read'}, headers=token_headers)
+    assert response.json['results'][0]['status'] == 404
+    assert client.get(f'/api/books/{book_id}').json['status'] == 'unread'
+
+
+def test_invalid_token_rejected(client):
+    """Test that a forged token is rejected."""
+    response = client.get('/api/books/collection?user_id=1', headers={'Authorization': 'Bearer forged'})
+    assert response.status_code == 401
+    assert response.json['error'] == 'Invalid token'
+
+
+def test_auth_required(client, app, token_headers):
+    """Test that requests without a token are rejected when AUTH_REQUIRED is set."""
+    app.config['AUTH_REQUIRED'] = True
+    assert client.get('/api/books/collection?user_id=5').status_code == 401
+    assert client.get('/api/books/collection', headers=token_headers).status_code == 200
+    assert client.get('/api/health').status_code == 200
+
+
+##################################################
+# Query Budget Test Cases
+##################################################
+
+# Seconds of database time one request may spend; generous, since the
+# statements run against an in-memory database
+QUERY_TIME_BUDGET = 0.1
+
+_IMPORT_UPLOAD = '\n'.join(json.dumps({'title': f'Imported {i}', 'author': 'Author', 'user_id': 1}) for i in range(50))
+
+
+@pytest.mark.parametrize('method, path, body, max_queries', [
+    ('GET', '/api/books/1', None, 1),
+    ('GET', '/api/books?ids=1,2,3,4,5', None, 1),
+    ('GET', '/api/books/collection?user_id=1', None, 2),
+    ('GET', '/api/books/collection?user_id=1&limit=5&sort=-year&status=unread', None, 2),
+    ('GET', '/api/books/collection?user_id=1&stream=true', None, 2),
+    ('GET', '/api/books/stats?user_id=1', None, 3),
+    ('GET', '/api/books/search?user_id=1&q=book', None, 2),
+    ('GET', '/api/books/export?user_id=1', None, 1),
+    ('POST', '/api/books', {'title': 'New Book', 'author': 'Author', 'year': '2021', 'user_id': 1}, 4),
+    ('PUT', '/api/books/1', {'status': 'read'}, 4),
+    ('PATCH', '/api/books/status', {'ids': list(range(1, 11)), 'status': 'read'}, 4),
+    ('DELETE', '/api/books/2', None, 4),
+    ('POST', '/api/books/import?format=ndjson', _IMPORT_UPLOAD, 4),
+])
+def test_route_query_budget(client, query_budget, method, path, body, max_queries):
+    """Test that each route runs a fixed number of statements, however many books there are."""
+    _add_books(client, 20)
+    _add_books(client, 5, user_id=2)
+
+    with query_budget(max_queries=max_queries, max_time=QUERY_TIME_BUDGET):
+        if isinstance(body, str):
+            response = client.open(path, method=method, data=body)
+        else:
+            response = client.open(path, method=method, json=body)
+        # Streamed bodies run their queries while being read
+        response.get_data()
+    assert response.status_code < 300
+
+
+def test_token_adds_no_queries(client, token_headers, query_budget):
+    """Test that checking an access token does not cost a query per request."""
+    _add_books(client, 3, user_id=5)
+    client.get('/api/books/collection', headers=token_headers)
+
+    with query_budget(max_queries=1, max_time=QUERY_TIME_BUDGET):
+        assert client.get('/api/books/collection', headers=token_headers).status_code == 200
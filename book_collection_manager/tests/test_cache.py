@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+from utils.cache import SingleFlight, TTLCache
+
+
+class FakeClock:
+    """A controllable replacement for time.monotonic."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Fixture to provide a controllable clock."""
+    return FakeClock()
+
+
+def test_get_and_set(clock):
+    """Test storing and retrieving a value."""
+    cache = TTLCache(max_size=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('missing') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_entries_expire(clock):
+    """Test that entries expire after their TTL."""
+    cache = TTLCache(max_size=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=30)
+    clock.now = 11
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_lru_eviction(clock):
+    """Test that the least recently used entry is evicted first."""
+    cache = TTLCache(max_size=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_get_or_load_does_not_store_uncacheable_values(clock):
+    """Test that a loader returning a None TTL is not cached."""
+    cache = TTLCache(clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return 'value', None
+
+    assert cache.get_or_load('k', loader) == 'value'
+    assert cache.get_or_load('k', loader) == 'value'
+    assert len(calls) == 2
+
+
+def test_get_or_load_single_flight(clock):
+    """Test that concurrent misses for one key run the loader once."""
+    cache = TTLCache(clock=clock)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value', 10
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+
+
+def test_get_or_load_propagates_errors(clock):
+    """Test that loader errors are raised and not cached."""
+    cache = TTLCache(clock=clock)
+
+    def failing_loader():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        cache.get_or_load('k', failing_loader)
+    assert cache.get_or_load('k', lambda: ('ok', 10)) == 'ok'
+
+
+def test_single_flight_shares_one_call_and_keeps_nothing():
+    """Test that concurrent calls for one key share a result, and later calls run again."""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return len(calls)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('k', fn))) for _ in range(3)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while flights.coalesced < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [1] * 3
+    assert flights.do('k', fn) == 2
@@ -0,0 +1,103 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, jsonify, stream_with_context
+
+from utils import compression
+from utils.compression import Compressor, available_encodings
+from utils.streaming import brotli_chunks
+
+BOOKS = {'collection': [{'id': i, 'title': f'Book {i}', 'author': 'Author'} for i in range(200)]}
+
+
+@pytest.fixture
+def app():
+    """Fixture to create a Flask app instance that compresses its responses."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.after_request(Compressor(encodings=['gzip'], min_size=1024))
+
+    @app.route('/large')
+    def large():
+        response = jsonify(BOOKS)
+        response.set_etag('collection-1-v1')
+        return response
+
+    @app.route('/small')
+    def small():
+        return jsonify({'status': 'ok'})
+
+    @app.route('/stream')
+    def stream():
+        return Response(stream_with_context(f'{i}\n' for i in range(1000)), mimetype='application/x-ndjson')
+
+    @app.route('/image')
+    def image():
+        return Response(b'\x89PNG' * 1000, mimetype='image/png')
+
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Fixture to provide a test client."""
+    return app.test_client()
+
+
+GZIP = {'Accept-Encoding': 'gzip, deflate'}
+
+
+def test_large_responses_are_compressed(client):
+    """Test that a large JSON body is gzipped, with a weak ETag and Vary set."""
+    response = client.get('/large', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"collection-1-v1"'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert json.loads(gzip.decompress(response.data)) == BOOKS
+
+
+def test_compression_is_negotiated(client):
+    """Test that clients that do not accept gzip, or refuse it, get the plain body."""
+    for headers in ({}, {'Accept-Encoding': 'identity'}, {'Accept-Encoding': 'gzip;q=0'}):
+        response = client.get('/large', headers=headers)
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.json == BOOKS
+
+
+def test_small_and_binary_responses_are_not_compressed(client):
+    """Test that bodies under the threshold and images are sent as they are."""
+    assert 'Content-Encoding' not in client.get('/small', headers=GZIP).headers
+    response = client.get('/image', headers=GZIP)
+    assert 'Content-Encoding' not in response.headers
+    assert 'Vary' not in response.headers
+
+
+def test_streamed_responses_are_compressed(client):
+    """Test that a streamed body is compressed chunk by chunk, whatever its size."""
+    response = client.get('/stream', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == ''.join(f'{i}\n' for i in range(1000)).encode()
+
+
+def test_brotli_is_preferred_when_installed(app, client, monkeypatch):
+    """Test that brotli is only offered when the package is installed, and wins over gzip."""
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert available_encodings(['br', 'gzip']) == ['gzip']
+
+    brotli = pytest.importorskip('brotli')
+    monkeypatch.setattr(compression, 'brotli', brotli)
+    app.after_request_funcs[None] = [Compressor(encodings=['br', 'gzip'])]
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data)) == BOOKS
+
+
+def test_brotli_chunks_round_trip():
+    """Test that the brotli stream decompresses to the original data."""
+    brotli = pytest.importorskip('brotli')
+    chunks = [f'line {i}\n'.encode() for i in range(1000)]
+    assert brotli.decompress(b''.join(brotli_chunks(iter(chunks), quality=1))) == b''.join(chunks)
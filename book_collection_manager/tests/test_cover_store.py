@@ -0,0 +1,184 @@
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+from benchmarks.google_books_stub import GoogleBooksStub, cover_png
+from book_routes import books_bp
+from models.book_model import Book, db
+from utils import cover_store
+from utils.cover_store import CoverStore
+
+
+@pytest.fixture
+def stub():
+    """Fixture to run the Google Books stub, which also serves cover images."""
+    with GoogleBooksStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def app(stub, tmp_path):
+    """Fixture to create a Flask app instance with a cover cache in a temporary directory."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['COVER_CACHE_DIR'] = str(tmp_path / 'covers')
+    app.config['HTTP_RETRIES'] = 0
+
+    db.init_app(app)
+    app.register_blueprint(books_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Fixture to provide a test client."""
+    return app.test_client()
+
+
+def _cover_url(stub, title='dune'):
+    return stub.url.replace('/books/v1/volumes', f'/covers/{title}.png')
+
+
+def _add_book(app, cover_image, title='Dune'):
+    with app.app_context():
+        book = Book(title=title, author='Frank Herbert', cover_image=cover_image)
+        db.session.add(book)
+        db.session.commit()
+        return book.id
+
+
+##################################################
+# Cover Store Test Cases
+##################################################
+
+def test_store_is_content_addressed(tmp_path):
+    """Test that URLs with identical images share one file."""
+    store = CoverStore(str(tmp_path))
+    image = cover_png(10, 10)
+    assert store.store('http://a/1.png', image, 'image/png') == store.store('http://b/2.png', image, 'image/png')
+
+    first, second = store.lookup('http://a/1.png'), store.lookup('http://b/2.png')
+    assert first == second
+    assert first.endswith('.png')
+    with open(first, 'rb') as f:
+        assert f.read() == image
+    assert store.lookup('http://c/3.png') is None
+
+
+def test_sizes_fall_back_to_original_without_pillow(tmp_path, monkeypatch):
+    """Test that every size is served as the original when Pillow is missing."""
+    monkeypatch.setattr(cover_store, 'Image', None)
+    store = CoverStore(str(tmp_path))
+    store.store('http://a/1.png', cover_png(10, 10), 'image/png')
+    assert store.lookup('http://a/1.png', 'small') == store.lookup('http://a/1.png')
+
+
+def test_resized_variants(tmp_path):
+    """Test that variants are JPEGs fitted to their size."""
+    image_module = pytest.importorskip('PIL.Image')
+    store = CoverStore(str(tmp_path))
+    store.store('http://a/1.png', cover_png(400, 600), 'image/png')
+
+    path = store.lookup('http://a/1.png', 'small')
+    assert path.endswith('-small.jpg')
+    with image_module.open(path) as image:
+        assert image.size == (85, 128)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Test that the oldest-served images are deleted once the quota is exceeded."""
+    image_size = len(cover_png(10, 10, (1, 1, 1)))
+    store = CoverStore(str(tmp_path), max_bytes=int(image_size * 2.5), sizes={})
+    store.store('http://a/1.png', cover_png(10, 10, (1, 1, 1)), 'image/png')
+    store.store('http://a/2.png', cover_png(10, 10, (2, 2, 2)), 'image/png')
+    # Serve the first image more recently than the second
+    os.utime(store.lookup('http://a/2.png'), (1, 1))
+
+    store.store('http://a/3.png', cover_png(10, 10, (3, 3, 3)), 'image/png')
+    assert store.lookup('http://a/2.png') is None
+    assert store.lookup('http://a/1.png') is not None
+    assert store.lookup('http://a/3.png') is not None
+    assert store.stats()['evictions'] == 1
+
+
+##################################################
+# Cover Route Test Cases
+##################################################
+
+def test_get_book_cover_downloads_once(client, app, stub):
+    """Test that a cover is downloaded on first use and then served from disk with cache headers."""
+    book_id = _add_book(app, _cover_url(stub))
+
+    response = client.get(f'/api/books/{book_id}/cover')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.get_data() == cover_png()
+    assert response.cache_control.max_age == 604800
+    assert response.headers['ETag']
+
+    again = client.get(f'/api/books/{book_id}/cover?size=medium')
+    assert again.status_code == 200
+    assert stub.cover_requests == 1
+
+    not_modified = client.get(f'/api/books/{book_id}/cover', headers={'If-None-Match': response.headers['ETag']})
+    assert not_modified.status_code == 304
+
+
+def test_get_book_cover_concurrent_downloads_are_collapsed(client, app, stub):
+    """Test that simultaneous first requests for a cover download it once."""
+    book_id = _add_book(app, _cover_url(stub))
+    statuses = []
+
+    def fetch():
+        statuses.append(app.test_client().get(f'/api/books/{book_id}/cover').status_code)
+
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 4
+    assert stub.cover_requests == 1
+
+
+def test_get_book_cover_errors(client, app, stub):
+    """Test missing books, books without covers, bad sizes and upstream failures."""
+    assert client.get('/api/books/999/cover').status_code == 404
+    assert client.get(f'/api/books/{_add_book(app, None, "No Cover")}/cover').json['error'] == 'Book has no cover image'
+
+    book_id = _add_book(app, _cover_url(stub))
+    assert client.get(f'/api/books/{book_id}/cover?size=huge').status_code == 400
+
+    # The volumes endpoint answers JSON, not an image
+    not_an_image = _add_book(app, stub.url, 'Not An Image')
+    response = client.get(f'/api/books/{not_an_image}/cover')
+    assert response.status_code == 502
+    assert response.json['error'] == 'Failed to fetch cover image'
+
+
+def test_get_book_cover_too_large(client, app, stub):
+    """Test that oversized images are not downloaded."""
+    app.config['COVER_MAX_DOWNLOAD_BYTES'] = 100
+    book_id = _add_book(app, _cover_url(stub))
+    response = client.get(f'/api/books/{book_id}/cover')
+    assert response.status_code == 502
+    assert response.json['error'] == 'Cover image is too large'
+
+
+def test_get_book_cover_evicted_after_download(client, app, stub, monkeypatch):
+    """Test that a cover evicted between its download and being served answers 503."""
+    # Storing and then losing the image looks, to the route, like storing nothing
+    monkeypatch.setattr(CoverStore, 'store', lambda self, url, data, content_type: None)
+    book_id = _add_book(app, _cover_url(stub))
+    response = client.get(f'/api/books/{book_id}/cover')
+    assert response.status_code == 503
+    assert response.json['error'] == 'Cover image is being refreshed, try again'
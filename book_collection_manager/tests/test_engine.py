@@ -0,0 +1,84 @@
+import sqlalchemy as sa
+from flask import Flask
+
+from book_routes import books_bp
+from models.book_model import Book, db
+from models.engine import configure_engines, engine_options, replica_binds, upsert_insert
+
+
+def test_engine_options_sqlite():
+    """Test that SQLite keeps SQLAlchemy's default pool settings."""
+    assert engine_options('sqlite:///books.db', env={}) == {}
+
+
+def test_engine_options_server_database():
+    """Test that server databases get pool sizing, overridable from the environment."""
+    options = engine_options('postgresql://db.example/books', env={'DB_POOL_SIZE': '3'})
+    assert options['pool_size'] == 3
+    assert options['max_overflow'] == 20
+    assert options['pool_pre_ping'] is True
+
+
+def test_replica_binds():
+    """Test that every listed replica gets its own bind."""
+    binds = replica_binds(env={'DATABASE_REPLICA_URIS': 'sqlite:///a.db, sqlite:///b.db'})
+    assert binds == {'replica_0': {'url': 'sqlite:///a.db'}, 'replica_1': {'url': 'sqlite:///b.db'}}
+    assert replica_binds(env={}) == {}
+
+
+def _make_app(uri, binds=None):
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds or {}
+    db.init_app(app)
+    configure_engines(app, env={})
+    app.register_blueprint(books_bp, url_prefix='/api')
+    return app
+
+
+def test_upsert_insert():
+    """Test that upserts use the bind's dialect, and that other dialects get None."""
+    from sqlalchemy.dialects import sqlite
+
+    assert upsert_insert(sa.create_engine('sqlite://')) is sqlite.insert
+    assert upsert_insert(sa.create_mock_engine('mysql://', executor=None)) is None
+
+
+def test_sqlite_pragmas_applied(tmp_path):
+    """Test that file-backed SQLite connections use WAL mode."""
+    app = _make_app(f"sqlite:///{tmp_path / 'books.db'}")
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+        db.engine.dispose()
+
+
+def test_reads_use_replica_and_writes_use_primary(tmp_path, monkeypatch):
+    """Test that collection reads are served by the replica while writes go to the primary."""
+    # init_app registers a metadata per bind on the shared db; keep it out of other tests
+    monkeypatch.setattr(db, 'metadatas', dict(db.metadatas))
+    replica_uri = f"sqlite:///{tmp_path / 'replica.db'}"
+    app = _make_app(f"sqlite:///{tmp_path / 'primary.db'}", binds={'replica_0': replica_uri})
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        replica = db.engines['replica_0']
+        db.metadata.create_all(replica)
+        with replica.begin() as conn:
+            conn.execute(sa.insert(Book.__table__), {'title': 'Replica Book', 'author': 'A', 'year': '2024',
+                                                      'status': 'unread', 'user_id': 1})
+
+    response = client.post('/api/books', json={'title': 'Primary Book', 'author': 'B', 'year': '2024',
+                                                'status': 'unread', 'user_id': 1})
+    assert response.status_code == 201
+
+    collection = client.get('/api/books/collection?user_id=1').json['collection']
+    assert [book['title'] for book in collection] == ['Replica Book']
+
+    with app.app_context():
+        assert [book.title for book in Book.query.all()] == ['Primary Book']
+        for engine in db.engines.values():
+            engine.dispose()
@@ -0,0 +1,206 @@
+import time
+
+import pytest
+from flask import Flask
+
+from benchmarks.google_books_stub import GoogleBooksStub
+from book_routes import books_bp
+from enrichment import EnrichmentWorkers
+from metrics_routes import get_metrics
+from models.book_model import Book, db
+from models.enrichment_model import FAILED, PENDING, RUNNING, EnrichmentJob, enrichment_query
+
+
+@pytest.fixture
+def stub():
+    """Fixture to run the Google Books stub."""
+    with GoogleBooksStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def app(stub, tmp_path):
+    """Fixture to create a Flask app instance that looks up details on the stub."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    # A file database, since worker threads need their own connections
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'enrichment.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['GOOGLE_BOOKS_API_URL'] = stub.url
+    app.config['HTTP_RETRIES'] = 0
+
+    db.init_app(app)
+    app.register_blueprint(books_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """Fixture to provide a test client."""
+    return app.test_client()
+
+
+@pytest.fixture
+def workers(app):
+    """Fixture to provide enrichment workers that tests run by hand."""
+    return EnrichmentWorkers(app, workers=1, rate=1000, burst=1000, backoff=60)
+
+
+def _add_book(client, title, author='Frank Herbert', user_id=1):
+    return client.post('/api/books', json={'title': title, 'author': author, 'user_id': user_id}).json['book_id']
+
+
+def _run_once(app, workers):
+    with app.app_context():
+        return workers.run_once()
+
+
+def _jobs(app):
+    with app.app_context():
+        return {job.book_id: job for job in db.session.scalars(db.select(EnrichmentJob))}
+
+
+def test_add_book_queues_job(client, app):
+    """Test that adding a book queues its enrichment without calling the API."""
+    book_id = _add_book(client, 'Dune')
+
+    job = _jobs(app)[book_id]
+    assert job.status == PENDING
+    assert job.query == enrichment_query('Dune', 'Frank Herbert') == 'intitle:dune inauthor:frank herbert'
+
+
+def test_run_once_fills_in_details(client, app, workers, stub):
+    """Test that a worker writes the cover and summary back and bumps the collection version."""
+    book_id = _add_book(client, 'Dune')
+    etag = client.get('/api/books/collection?user_id=1').headers['ETag']
+
+    assert _run_once(app, workers) == 1
+    book = client.get(f'/api/books/{book_id}').json
+    assert book['summary'] == 'A stub description of dune.'
+    assert book['cover_image'] == stub.url.replace('/books/v1/volumes', '/covers/dune.png')
+    assert _jobs(app) == {}
+    assert client.get('/api/books/collection?user_id=1', headers={'If-None-Match': etag}).status_code == 200
+
+    # Nothing is left to do
+    assert _run_once(app, workers) == 0
+    assert stub.requests == 1
+
+
+def test_identical_books_share_one_lookup(client, app, workers, stub):
+    """Test that books with the same title and author are looked up once."""
+    ids = [_add_book(client, 'Dune'), _add_book(client, '  dune ', user_id=2), _add_book(client, 'Emma', 'Jane Austen')]
+
+    assert _run_once(app, workers) == 3
+    assert stub.requests == 2
+    assert _jobs(app) == {}
+    with app.app_context():
+        assert all(db.session.get(Book, book_id).summary for book_id in ids)
+
+
+def test_import_queues_jobs(client, app):
+    """Test that bulk imports queue a job per imported book."""
+    body = '\n'.join('{"title": "Book %d", "author": "Author"}' % i for i in range(3))
+    response = client.post('/api/books/import?format=ndjson&batch_size=2', data=body)
+    assert response.json['imported'] == 3
+    assert len(_jobs(app)) == 3
+
+
+def test_not_found_is_done(client, app, workers):
+    """Test that a title the API does not know finishes the job without retries."""
+    book_id = _add_book(client, 'missing book')
+
+    _run_once(app, workers)
+    assert _jobs(app) == {}
+    assert client.get(f'/api/books/{book_id}').json['summary'] is None
+    with app.app_context():
+        assert 'enrichment_jobs_total{outcome="not_found"} 1' in get_metrics().registry.render()
+
+
+def test_only_unfinished_jobs_are_kept(client, app, workers):
+    """Test that finished jobs are deleted with the write-back, while retried and failed ones stay."""
+    done_id = _add_book(client, 'Dune')
+    _run_once(app, workers)
+    app.config['GOOGLE_BOOKS_API_URL'] = app.config['GOOGLE_BOOKS_API_URL'] + '/broken'
+    workers.max_attempts = 1
+    failed_id = _add_book(client, 'Emma', 'Jane Austen')
+    _run_once(app, workers)
+
+    jobs = _jobs(app)
+    assert done_id not in jobs
+    assert jobs[failed_id].status == FAILED
+
+
+def test_failures_are_retried_with_backoff(client, app, workers):
+    """Test that failed lookups are retried later and eventually marked failed."""
+    app.config['GOOGLE_BOOKS_API_URL'] = app.config['GOOGLE_BOOKS_API_URL'] + '/broken'
+    workers.max_attempts = 2
+    book_id = _add_book(client, 'Dune')
+
+    _run_once(app, workers)
+    job = _jobs(app)[book_id]
+    assert (job.status, job.attempts) == (PENDING, 1)
+    assert job.run_at >= time.time() + 29
+
+    # Not due yet
+    assert _run_once(app, workers) == 0
+
+    with app.app_context():
+        db.session.execute(db.update(EnrichmentJob).values(run_at=0))
+        db.session.commit()
+    _run_once(app, workers)
+    job = _jobs(app)[book_id]
+    assert (job.status, job.attempts) == (FAILED, 2)
+    with app.app_context():
+        text = get_metrics().registry.render()
+    assert 'enrichment_jobs_total{outcome="retried"} 1' in text
+    assert 'enrichment_jobs_total{outcome="failed"} 1' in text
+
+
+def test_user_details_are_not_overwritten(client, app, workers, stub):
+    """Test that enrichment only fills in empty fields."""
+    book_id = _add_book(client, 'Dune')
+    with app.app_context():
+        db.session.get(Book, book_id).summary = 'My own summary'
+        db.session.commit()
+
+    _run_once(app, workers)
+    book = client.get(f'/api/books/{book_id}').json
+    assert book['summary'] == 'My own summary'
+    assert book['cover_image'] == stub.url.replace('/books/v1/volumes', '/covers/dune.png')
+
+
+def test_expired_lease_is_reclaimed(client, app, workers):
+    """Test that a job left running by a dead worker is picked up again."""
+    book_id = _add_book(client, 'Dune')
+    with app.app_context():
+        db.session.execute(db.update(EnrichmentJob).values(status=RUNNING, claimed_by='dead', locked_until=time.time() + 60))
+        db.session.commit()
+    assert _run_once(app, workers) == 0
+
+    with app.app_context():
+        db.session.execute(db.update(EnrichmentJob).values(locked_until=time.time() - 1))
+        db.session.commit()
+    assert _run_once(app, workers) == 1
+    assert book_id not in _jobs(app)
+
+
+def test_worker_threads(client, app):
+    """Test that started workers pick up new books in the background."""
+    workers = EnrichmentWorkers(app, workers=2, rate=1000, burst=1000, poll_interval=0.01)
+    workers.start()
+    try:
+        book_id = _add_book(client, 'Dune')
+        deadline = time.time() + 5
+        while book_id in _jobs(app) and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        workers.stop()
+    assert book_id not in _jobs(app)
+    assert client.get(f'/api/books/{book_id}').json['summary'] == 'A stub description of dune.'
@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+from utils.executor import BoundedExecutor, ExecutorBusyError
+
+
+def test_run_returns_result():
+    """Test running a task and waiting for its result."""
+    executor = BoundedExecutor(max_workers=2, max_queue=2)
+    assert executor.run(pow, 2, 10) == 1024
+    executor.shutdown()
+
+
+def test_submit_rejects_when_full():
+    """Test that work beyond the workers and queue is rejected immediately."""
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    running = executor.submit(release.wait, 5)
+    queued = executor.submit(lambda: 'queued')
+
+    with pytest.raises(ExecutorBusyError):
+        executor.submit(lambda: 'rejected')
+
+    release.set()
+    assert running.result(5) is True
+    assert queued.result(5) == 'queued'
+    # Capacity is returned once tasks finish.
+    assert executor.run(lambda: 'accepted', timeout=5) == 'accepted'
+    executor.shutdown()
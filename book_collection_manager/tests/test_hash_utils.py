@@ -1,5 +1,10 @@
+import hashlib
 import unittest
-from utils.hash_utils import generate_salt, hash_password, verify_password
+from unittest import mock
+
+from utils import hash_utils
+from models.user_model import User
+from utils.hash_utils import SUPPORTED_ALGORITHMS, generate_salt, hash_password, needs_rehash, verify_password
 
 class TestHashUtils(unittest.TestCase):
     """Unit tests for hash_utils.py."""
@@ -26,5 +31,52 @@ class TestHashUtils(unittest.TestCase):
         self.assertTrue(verify_password(password, salt, hashed_password), "verify_password should return True for correct password")
         self.assertFalse(verify_password("wrongpassword", salt, hashed_password), "verify_password should return False for incorrect password")
 
+    def test_hash_password_encodes_parameters(self):
+        """Test that the stored hash records the KDF and its parameters."""
+        with mock.patch.object(hash_utils, 'KDF_ALGORITHM', 'pbkdf2_sha256'), \
+                mock.patch.object(hash_utils, 'PBKDF2_ITERATIONS', 1000):
+            hashed = hash_password("mypassword", "salt")
+        algorithm, iterations, digest = hashed.split('$')
+        self.assertEqual(algorithm, 'pbkdf2_sha256')
+        self.assertEqual(iterations, '1000')
+        self.assertEqual(digest, hashlib.pbkdf2_hmac('sha256', b'mypassword', b'salt', 1000).hex())
+
+    def test_scrypt(self):
+        """Test hashing and verifying with scrypt."""
+        with mock.patch.object(hash_utils, 'KDF_ALGORITHM', 'scrypt'), \
+                mock.patch.object(hash_utils, 'SCRYPT_N', 1024):
+            hashed = hash_password("mypassword", "salt")
+        self.assertTrue(hashed.startswith('scrypt$1024$8$1$'))
+        self.assertTrue(verify_password("mypassword", "salt", hashed))
+        self.assertFalse(verify_password("wrongpassword", "salt", hashed))
+
+    def test_hashes_fit_the_users_column(self):
+        """Test that every supported KDF, with its default settings, makes a hash the users table can store."""
+        for algorithm in SUPPORTED_ALGORITHMS:
+            with self.subTest(algorithm=algorithm), mock.patch.object(hash_utils, 'KDF_ALGORITHM', algorithm):
+                hashed = hash_password("mypassword", generate_salt())
+                self.assertLessEqual(len(hashed), User.hashed_password.type.length)
+
+    def test_verify_password_after_parameter_change(self):
+        """Test that hashes made with older parameters still verify and need a rehash."""
+        with mock.patch.object(hash_utils, 'PBKDF2_ITERATIONS', 1000):
+            hashed = hash_password("mypassword", "salt")
+            self.assertFalse(needs_rehash(hashed))
+        with mock.patch.object(hash_utils, 'PBKDF2_ITERATIONS', 2000):
+            self.assertTrue(verify_password("mypassword", "salt", hashed))
+            self.assertTrue(needs_rehash(hashed))
+
+    def test_verify_legacy_sha256_hash(self):
+        """Test that unprefixed SHA-256 hashes from before KDFs still verify."""
+        legacy = hashlib.sha256(("mypassword" + "salt").encode()).hexdigest()
+        self.assertTrue(verify_password("mypassword", "salt", legacy))
+        self.assertFalse(verify_password("wrongpassword", "salt", legacy))
+        self.assertTrue(needs_rehash(legacy))
+
+    def test_verify_malformed_hash(self):
+        """Test that a malformed stored hash never verifies."""
+        self.assertFalse(verify_password("mypassword", "salt", "bogus$x$y"))
+        self.assertTrue(needs_rehash("bogus$x$y"))
+
 if __name__ == "__main__":
     unittest.main()
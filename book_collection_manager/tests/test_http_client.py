@@ -0,0 +1,36 @@
+from utils.http_client import HttpClient, create_http_client
+
+
+def test_create_http_client_from_config():
+    """Test that the client picks up pooling, timeout and retry settings from config."""
+    client = create_http_client({
+        'HTTP_POOL_SIZE': 5,
+        'HTTP_CONNECT_TIMEOUT': 1,
+        'HTTP_READ_TIMEOUT': 2,
+        'HTTP_RETRIES': 4,
+        'HTTP_BACKOFF_FACTOR': 0.5,
+    })
+    adapter = client.session.get_adapter('https://www.googleapis.com')
+    assert client.timeout == (1, 2)
+    assert adapter._pool_maxsize == 5
+    assert adapter.max_retries.total == 4
+    assert adapter.max_retries.backoff_factor == 0.5
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+def test_get_uses_default_timeout(mocker):
+    """Test that requests made through the client carry the default timeout."""
+    client = HttpClient(connect_timeout=1, read_timeout=2)
+    mock_get = mocker.patch.object(client.session, 'get')
+
+    client.get('https://example.com', params={'q': 'x'})
+    mock_get.assert_called_once_with('https://example.com', params={'q': 'x'}, timeout=(1, 2))
+
+
+def test_get_allows_timeout_override(mocker):
+    """Test that an explicit timeout overrides the default."""
+    client = HttpClient()
+    mock_get = mocker.patch.object(client.session, 'get')
+
+    client.get('https://example.com', timeout=7)
+    mock_get.assert_called_once_with('https://example.com', timeout=7)
@@ -0,0 +1,140 @@
+import time
+
+import pytest
+from flask import Flask
+
+import book_routes
+from auth_routes import auth_bp
+from book_routes import books_bp
+from idempotency import REPLAYED_HEADER
+from models.book_model import Book, db
+from models.idempotency_model import IdempotencyKey
+from models.user_model import User
+from utils import hash_utils
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """Fixture to create a Flask app instance with the account and book routes."""
+    monkeypatch.setattr(hash_utils, 'PBKDF2_ITERATIONS', 1000)
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'test-secret-key'
+
+    db.init_app(app)
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(books_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Fixture to provide a test client."""
+    return app.test_client()
+
+
+BOOK = {'title': 'Dune', 'author': 'Frank Herbert', 'user_id': 1}
+
+
+def _add_book(client, key, book=BOOK):
+    return client.post('/api/books', json=book, headers={'Idempotency-Key': key})
+
+
+def _count(app, model):
+    with app.app_context():
+        return db.session.query(model).count()
+
+
+def test_repeated_key_replays_response(client, app):
+    """Test that a retried add gets the first response back without running again."""
+    first = _add_book(client, 'key-1')
+    assert first.status_code == 201
+    assert REPLAYED_HEADER not in first.headers
+
+    again = _add_book(client, 'key-1')
+    assert again.status_code == 201
+    assert again.json == first.json
+    assert again.headers[REPLAYED_HEADER] == 'true'
+    assert _count(app, Book) == 1
+
+
+def test_create_account_replays_response(client, app):
+    """Test that a retried sign-up gets its 201 back instead of 'Username already exists'."""
+    body = {'username': 'reader', 'password': 'secret'}
+    first = client.post('/api/create-account', json=body, headers={'Idempotency-Key': 'signup'})
+    again = client.post('/api/create-account', json=body, headers={'Idempotency-Key': 'signup'})
+    assert (first.status_code, again.status_code) == (201, 201)
+    assert again.json['user_id'] == first.json['user_id']
+    assert _count(app, User) == 1
+
+
+def test_key_reused_for_different_request(client):
+    """Test that a key cannot be replayed for a different body."""
+    _add_book(client, 'key-1')
+    response = _add_book(client, 'key-1', {**BOOK, 'title': 'Emma'})
+    assert response.status_code == 422
+
+
+def test_keys_are_scoped_to_route(client):
+    """Test that the same key on another route is a different key."""
+    _add_book(client, 'shared')
+    response = client.post('/api/create-account', json={'username': 'reader', 'password': 'secret'},
+                           headers={'Idempotency-Key': 'shared'})
+    assert response.status_code == 201
+
+
+def test_key_in_progress(client, app):
+    """Test that a retry while the first request runs is refused, and taken over once its lock expires."""
+    _add_book(client, 'key-1')
+    with app.app_context():
+        db.session.execute(db.update(IdempotencyKey).values(status_code=None, locked_until=time.time() + 60))
+        db.session.commit()
+
+    response = _add_book(client, 'key-1')
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+
+    with app.app_context():
+        db.session.execute(db.update(IdempotencyKey).values(locked_until=time.time() - 1))
+        db.session.commit()
+    response = _add_book(client, 'key-1')
+    assert response.status_code == 200
+    assert response.json['message'] == 'Book already in collection'
+
+
+def test_server_errors_are_not_stored(client, app, monkeypatch):
+    """Test that a retry after a 500 runs the request again."""
+    def fail(rows):
+        raise RuntimeError('database is down')
+
+    with monkeypatch.context() as m:
+        m.setattr(book_routes, '_insert_new_books', fail)
+        assert _add_book(client, 'key-1').status_code == 500
+    assert _count(app, IdempotencyKey) == 0
+
+    assert _add_book(client, 'key-1').status_code == 201
+    assert _count(app, Book) == 1
+
+
+def test_expired_keys_are_evicted(client, app):
+    """Test that keys past their TTL are deleted and no longer replayed."""
+    app.config['IDEMPOTENCY_KEY_TTL'] = -1
+    _add_book(client, 'key-1')
+    _add_book(client, 'key-2')
+    assert _count(app, IdempotencyKey) == 1
+
+    response = _add_book(client, 'key-1')
+    assert REPLAYED_HEADER not in response.headers
+    assert response.status_code == 200
+
+
+def test_invalid_key(client):
+    """Test that empty and oversized keys are rejected."""
+    assert _add_book(client, '').status_code == 400
+    assert _add_book(client, 'k' * 256).status_code == 400
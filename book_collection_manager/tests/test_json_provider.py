@@ -0,0 +1,57 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+from utils import json_provider
+from utils.json_provider import OrjsonProvider, create_json_provider
+
+pytest.importorskip('orjson')
+
+PAYLOAD = {'b': [1, 2.5, None, True], 'a': 'Tïtle', 'big': 2 ** 70,
+           'when': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}
+
+
+@pytest.fixture
+def app():
+    """Fixture to create a Flask app instance that serializes with orjson."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.json = OrjsonProvider(app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify(request.get_json())
+
+    yield app
+
+
+def test_output_matches_flask(app):
+    """Test that orjson produces the same JSON as Flask's provider, including dates and wide integers."""
+    default = DefaultJSONProvider(app)
+    with app.app_context():
+        assert json.loads(app.json.dumps(PAYLOAD)) == json.loads(default.dumps(PAYLOAD))
+        small = {'b': 1, 'a': [2, 3]}
+        assert app.json.dumps(small) == default.dumps(small, separators=(',', ':'))
+        assert app.json.response(small).get_data() == default.response(small).get_data()
+
+
+def test_request_and_response_round_trip(app):
+    """Test that request bodies are parsed and responses serialized by the provider."""
+    client = app.test_client()
+    response = client.post('/echo', json={'title': 'Dune', 'ids': [1, 2]})
+    assert response.json == {'title': 'Dune', 'ids': [1, 2]}
+    assert client.post('/echo', data='{"broken"', content_type='application/json').status_code == 400
+
+
+def test_create_json_provider(app, monkeypatch):
+    """Test choosing the provider, and falling back when orjson is missing."""
+    assert isinstance(create_json_provider(app), OrjsonProvider)
+    assert type(create_json_provider(app, 'stdlib')) is DefaultJSONProvider
+    with pytest.raises(ValueError):
+        create_json_provider(app, 'simplejson')
+
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    assert type(create_json_provider(app, 'orjson')) is DefaultJSONProvider
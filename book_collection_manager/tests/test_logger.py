@@ -0,0 +1,99 @@
+import io
+import json
+import logging
+import sys
+import time
+
+import pytest
+from flask import Flask
+
+from utils import logger as logger_module
+from utils.logger import JsonFormatter, RequestFilter, configure_logger
+
+
+@pytest.fixture
+def output(monkeypatch):
+    """Fixture to capture what the background listener writes."""
+    stream = io.StringIO()
+    monkeypatch.setattr(logger_module._output, 'stream', stream)
+    return stream
+
+
+def _wait_for_lines(stream, count, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        lines = stream.getvalue().splitlines()
+        if len(lines) >= count:
+            return [json.loads(line) for line in lines]
+        time.sleep(0.01)
+    raise AssertionError(f"Expected {count} log lines, got: {stream.getvalue()!r}")
+
+
+def _make_app():
+    app = Flask(__name__)
+
+    @app.route('/sampled')
+    def sampled():
+        app.logger.info("Sampled %s", 'line')
+        app.logger.warning("Kept %s", 'line')
+        return 'ok'
+
+    return app
+
+
+def test_configure_logger_is_idempotent():
+    """Test that repeated configuration does not stack handlers."""
+    app = _make_app()
+    configure_logger(app.logger, env={})
+    configure_logger(app.logger, env={'LOG_LEVEL': 'warning'})
+    assert app.logger.handlers == [logger_module._queue_handler]
+    assert app.logger.level == logging.WARNING
+
+
+def test_records_are_written_as_json(output):
+    """Test that records are formatted lazily on the listener thread as JSON lines."""
+    log = logging.getLogger('test_logger.json')
+    configure_logger(log, env={'LOG_LEVEL': 'INFO'})
+    log.debug("Dropped %s", 'below level')
+    log.info("Book %s added", 42, extra={'user_id': 7})
+
+    (entry,) = _wait_for_lines(output, 1)
+    assert entry['message'] == 'Book 42 added'
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'test_logger.json'
+    assert entry['user_id'] == 7
+
+
+def test_request_records_are_tagged_and_sampled(output):
+    """Test that INFO lines are sampled per endpoint while warnings are always kept."""
+    app = _make_app()
+    configure_logger(app.logger, env={'LOG_SAMPLE_RATES': 'sampled=0'})
+    app.test_client().get('/sampled')
+
+    (entry,) = _wait_for_lines(output, 1)
+    assert entry['message'] == 'Kept line'
+    assert entry['endpoint'] == 'sampled'
+    assert entry['method'] == 'GET'
+    assert entry['path'] == '/sampled'
+
+
+def test_request_filter_sampling_rate():
+    """Test that the sampling rate decides which INFO records are kept."""
+    app = _make_app()
+    draws = iter([0.1, 0.9])
+    log_filter = RequestFilter(default_rate=0.5, rng=lambda: next(draws))
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, 'msg', None, None)
+
+    with app.test_request_context('/sampled'):
+        assert log_filter.filter(record) is True
+        assert log_filter.filter(record) is False
+
+
+def test_json_formatter_includes_exception():
+    """Test that exception tracebacks are included in the JSON line."""
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = logging.LogRecord('app', logging.ERROR, __file__, 1, 'failed', None, sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert 'ValueError: boom' in entry['exception']
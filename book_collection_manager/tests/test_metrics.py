@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+
+from book_routes import books_bp
+from metrics_routes import install_metrics, metrics_bp
+from models.book_model import db
+from utils.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def app():
+    """Fixture to create an instrumented Flask app instance for testing."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    db.init_app(app)
+    install_metrics(app)
+    app.register_blueprint(books_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Fixture to provide a test client."""
+    return app.test_client()
+
+
+def test_counter_merges_thread_shards():
+    """Test that counts recorded on different threads are summed when rendered."""
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs_total', 'Jobs run.', ('kind',))
+
+    def work():
+        for _ in range(1000):
+            counter.inc('import')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc('export', amount=2)
+
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="import"} 4000' in text
+    assert 'jobs_total{kind="export"} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test the bucket, sum and count samples of a histogram."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum 5.55' in lines
+    assert 'latency_seconds_count 3' in lines
+
+
+def test_label_values_are_escaped():
+    """Test that quotes in label values do not break the exposition format."""
+    registry = MetricsRegistry()
+    registry.counter('odd_total', 'Odd labels.', ('name',)).inc('say "hi"')
+    assert 'odd_total{name="say \\"hi\\""} 1' in registry.render()
+
+
+def test_metrics_route_reports_requests_and_queries(client):
+    """Test that requests, their status codes and their SQL queries are recorded."""
+    client.post('/api/books', json={'title': 'T', 'author': 'A', 'year': '2024', 'status': 'unread', 'user_id': 1})
+    client.get('/api/books/collection?user_id=1')
+    client.get('/api/books/999')
+
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert ('http_requests_total{blueprint="books",endpoint="books.get_collection",'
+            'method="GET",status="200"} 1') in text
+    assert 'http_requests_total{blueprint="books",endpoint="books.get_book",method="GET",status="404"} 1' in text
+    assert 'http_request_duration_seconds_count{blueprint="books",endpoint="books.add_book"} 1' in text
+    # The collection version, then the rows
+    assert 'db_query_duration_seconds_count{endpoint="books.get_collection"} 2' in text
+    assert 'db_queries_per_request_bucket{endpoint="books.get_collection",le="2"} 1' in text
+
+
+def test_upstream_calls_are_timed(client, monkeypatch):
+    """Test that Google Books lookups are timed by outcome."""
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {'items': [{'volumeInfo': {'title': 'T'}}]}
+
+    monkeypatch.setattr('requests.Session.get', lambda *args, **kwargs: FakeResponse())
+    client.get('/api/books/details?title=T')
+
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert 'upstream_request_duration_seconds_count{service="google_books",outcome="200"} 1' in text
+
+
+def test_response_cache_is_reported(client):
+    """Test that collection cache lookups and the hit ratio are exported."""
+    client.post('/api/books', json={'title': 'T', 'author': 'A', 'year': '2024', 'status': 'unread', 'user_id': 1})
+    client.get('/api/books/collection?user_id=1')
+    client.get('/api/books/collection?user_id=1')
+
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert 'response_cache_lookups_total{cache="collection",result="miss"} 1' in text
+    assert 'response_cache_lookups_total{cache="collection",result="hit"} 1' in text
+    assert 'response_cache_hit_ratio 0.5' in text
+
+
+def test_failed_statements_are_not_left_timing(app):
+    """Test that a statement that raises does not leave its start time on the pooled connection."""
+    with app.app_context(), db.engine.connect() as conn:
+        with pytest.raises(sa.exc.OperationalError):
+            conn.exec_driver_sql('SELECT missing FROM books')
+        assert conn.info['query_started_at'] == []
@@ -0,0 +1,161 @@
+import pytest
+import sqlalchemy as sa
+
+from models.migrations import HEAD, MIGRATIONS, current_version, upgrade
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Fixture to provide an engine for an empty SQLite database."""
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'books.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _index_names(engine, table):
+    return {index['name'] for index in sa.inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_empty_database(engine):
+    """Test that every migration is applied to an empty database."""
+    applied = upgrade(engine)
+    assert applied == [m.version for m in MIGRATIONS]
+
+    with engine.connect() as conn:
+        assert current_version(conn) == HEAD
+
+    inspector = sa.inspect(engine)
+    assert {'users', 'books', 'schema_version', 'enrichment_jobs'} <= set(inspector.get_table_names())
+    assert 'user_id' in {c['name'] for c in inspector.get_columns('books')}
+    assert {'ix_books_user_id', 'ix_books_user_id_status', 'ix_books_user_id_author'} <= _index_names(engine, 'books')
+
+
+def test_upgrade_is_noop_when_current(engine):
+    """Test that a second upgrade does nothing."""
+    upgrade(engine)
+    assert upgrade(engine) == []
+
+
+def test_upgrade_to_target(engine):
+    """Test migrating to an intermediate version and then to the latest one."""
+    assert upgrade(engine, target=1) == [1]
+    assert 'ix_books_user_id' not in _index_names(engine, 'books')
+
+    assert upgrade(engine) == [m.version for m in MIGRATIONS[1:]]
+    assert 'ix_books_user_id' in _index_names(engine, 'books')
+
+
+def test_upgrade_database_created_without_migrations(engine):
+    """Test upgrading a database whose tables were created before migrations existed."""
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title VARCHAR(255) NOT NULL, "
+            "author VARCHAR(255) NOT NULL, year VARCHAR(4), status VARCHAR(10) NOT NULL, "
+            "cover_image VARCHAR(2083), summary TEXT, user_id INTEGER NOT NULL)"
+        ))
+        conn.execute(sa.text("INSERT INTO books (title, author, status, user_id) VALUES ('T', 'A', 'unread', 1)"))
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT count(*) FROM books")).scalar() == 1
+        assert conn.execute(sa.text("SELECT rowid FROM books_fts WHERE books_fts MATCH 'T'")).all() == [(1,)]
+    assert 'ix_books_user_id' in _index_names(engine, 'books')
+
+
+def test_upgrade_backfills_versions(engine):
+    """Test that existing books and collections start at version 1."""
+    upgrade(engine, target=4)
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "INSERT INTO books (title, author, status, user_id) VALUES ('T', 'A', 'unread', 1), "
+            "('U', 'B', 'unread', 2), ('V', 'C', 'unread', 2)"
+        ))
+
+    upgrade(engine, target=5)
+
+    with engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT DISTINCT version FROM books")).scalars().all() == [1]
+        assert conn.execute(sa.text("SELECT min(updated_at) FROM books")).scalar() > 0
+        assert conn.execute(sa.text(
+            "SELECT user_id, version FROM collection_versions ORDER BY user_id"
+        )).all() == [(1, 1), (2, 1)]
+
+
+def test_upgrade_backfills_collection_stats(engine):
+    """Test that existing books are counted when the stats table is created."""
+    upgrade(engine, target=6)
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "INSERT INTO books (title, author, year, status, user_id) VALUES ('T', 'A', '2020', 'read', 1), "
+            "('U', 'A', '', 'unread', 1), ('V', 'C', '2020', 'unread', 2)"
+        ))
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(sa.text(
+            "SELECT user_id, dimension, value, book_count FROM collection_stats ORDER BY user_id, dimension, value"
+        )).all() == [
+            (1, 'author', 'A', 2), (1, 'status', 'read', 1), (1, 'status', 'unread', 1), (1, 'year', '2020', 1),
+            (2, 'author', 'C', 1), (2, 'status', 'unread', 1), (2, 'year', '2020', 1),
+        ]
+
+def test_upgrade_compacts_book_columns(engine, caplog):
+    """Test that years and statuses become integers, keeping years that are not numbers aside."""
+    upgrade(engine, target=7)
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "INSERT INTO books (title, author, year, status, user_id, version, updated_at) VALUES "
+            "('Dune', 'Herbert', '1965', 'read', 1, 3, 1.5), ('Emma', 'Austen', '', 'unread', 1, 1, 1.5), "
+            "('Beowulf', 'Unknown', 'c700', 'unread', 1, 1, 1.5)"
+        ))
+        conn.execute(sa.text("INSERT INTO collection_stats VALUES (1, 'year', 'c700', 1)"))
+
+    with caplog.at_level('WARNING', logger='models.migrations'):
+        upgrade(engine)
+    assert '1 book years are not numbers' in caplog.text
+    assert 'Book IDs: 3' in caplog.text
+
+    with engine.begin() as conn:
+        assert conn.execute(sa.text("SELECT id, year, status, version FROM books ORDER BY id")).all() == [
+            (1, 1965, 1, 3), (2, None, 0, 1), (3, None, 0, 1),
+        ]
+        assert conn.execute(sa.text("SELECT book_id, year FROM unparsed_book_years")).all() == [(3, 'c700')]
+        assert conn.execute(sa.text(
+            "SELECT value, book_count FROM collection_stats WHERE dimension = 'year'"
+        )).all() == [('1965', 1)]
+        assert conn.execute(sa.text("SELECT rowid FROM books_fts WHERE books_fts MATCH 'emma'")).all() == [(2,)]
+        conn.execute(sa.text("INSERT INTO books (title, author, user_id) VALUES ('Emmanuelle', 'A', 1)"))
+        assert conn.execute(sa.text("SELECT rowid FROM books_fts WHERE books_fts MATCH 'emma*'")).all() == [(2,), (4,)]
+    assert {'ix_books_user_id_status', 'ix_books_user_id_year', 'ix_books_user_id_status_year'} <= \
+        _index_names(engine, 'books')
+
+
+def test_upgrade_adds_dedup_keys(engine):
+    """Test that existing books get duplicate-detection keys, except later copies of the same book."""
+    upgrade(engine, target=8)
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "INSERT INTO books (title, author, status, user_id, version, updated_at) VALUES "
+            "('Dune', 'Herbert', 0, 1, 1, 0), ('dune ', 'HERBERT', 0, 1, 1, 0), ('Dune', 'Herbert', 0, 2, 1, 0)"
+        ))
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        keys = conn.execute(sa.text("SELECT dedup_key FROM books ORDER BY id")).scalars().all()
+    assert keys[0] is not None and keys[1] is None and keys[2] == keys[0]
+    assert 'idempotency_keys' in sa.inspect(engine).get_table_names()
+    assert 'ix_books_user_id_dedup_key' in _index_names(engine, 'books')
+
+
+def test_collection_query_uses_user_index(engine):
+    """Test that filtering a collection by user is an index lookup rather than a table scan."""
+    upgrade(engine)
+    with engine.connect() as conn:
+        plan = ' '.join(row[-1] for row in conn.execute(sa.text(
+            "EXPLAIN QUERY PLAN SELECT id, title FROM books WHERE user_id = 1 ORDER BY id"
+        )))
+    assert 'USING INDEX' in plan or 'USING COVERING INDEX' in plan
+    assert 'SCAN books' not in plan.replace('SCAN books USING', '')
@@ -0,0 +1,90 @@
+import logging
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+
+from utils.query_capture import QueryBudgetExceeded, QueryCapture, SlowQueryLog, redact_parameters
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Fixture to provide a SQLite engine with a small table."""
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'books.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, user_id INTEGER)')
+        conn.exec_driver_sql('CREATE INDEX ix_books_user_id ON books (user_id)')
+    yield engine
+    engine.dispose()
+
+
+def test_redact_parameters():
+    """Test that strings are hidden and numbers kept, for every parameter shape."""
+    assert redact_parameters(('secret', 5, None, 1.5)) == ['<str>', 5, None, 1.5]
+    assert redact_parameters({'title': 'Dune', 'user_id': 1, 'cover': b'png'}) == \
+        {'title': '<str>', 'user_id': 1, 'cover': '<bytes>'}
+    many = redact_parameters([('a', i) for i in range(8)], executemany=True)
+    assert many[:2] == [['<str>', 0], ['<str>', 1]]
+    assert many[-1] == '<3 more>'
+    assert len(many) == 6
+
+
+def test_capture_and_budget(engine):
+    """Test that statements are recorded while active, and that a budget lists them when exceeded."""
+    with QueryCapture([engine]) as capture:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+            conn.exec_driver_sql('SELECT 2')
+    with engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 3')
+
+    assert capture.statements == ['SELECT 1', 'SELECT 2']
+    assert capture.total_time > 0
+    capture.check(max_queries=2, max_time=1)
+    with pytest.raises(QueryBudgetExceeded, match=r'2 queries, budget is 1(.|\n)*SELECT 2'):
+        capture.check(max_queries=1)
+    with pytest.raises(QueryBudgetExceeded, match='ms of database time'):
+        capture.check(max_time=0)
+
+
+def test_capture_records_failed_statements(engine):
+    """Test that a statement that raises is still counted."""
+    with QueryCapture([engine]) as capture, pytest.raises(sa.exc.OperationalError):
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT missing FROM books')
+    assert capture.statements == ['SELECT missing FROM books']
+
+
+def test_slow_query_log(engine, caplog):
+    """Test that slow statements are logged with redacted parameters, endpoint and query plan."""
+    logger = logging.getLogger('test_slow_queries')
+    SlowQueryLog(logger, threshold=0, explain=True).instrument(engine)
+    app = Flask(__name__)
+
+    with caplog.at_level(logging.WARNING, logger='test_slow_queries'):
+        with app.test_request_context('/api/books'), engine.connect() as conn:
+            conn.execute(sa.text('SELECT id FROM books WHERE user_id = :user_id AND title = :title'),
+                         {'user_id': 7, 'title': 'Dune'})
+
+    record = caplog.records[-1]
+    assert record.getMessage().startswith('Slow query (')
+    assert record.parameters == [7, '<str>']
+    assert record.duration_ms >= 0
+    assert 'ix_books_user_id' in ' '.join(record.query_plan)
+
+
+def test_slow_query_log_threshold(engine, caplog):
+    """Test that fast statements are not logged, and that writes are not explained."""
+    logger = logging.getLogger('test_slow_queries')
+    SlowQueryLog(logger, threshold=60).instrument(engine)
+    with caplog.at_level(logging.WARNING, logger='test_slow_queries'):
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+    assert not caplog.records
+
+    SlowQueryLog(logger, threshold=0, explain=True).instrument(engine)
+    with caplog.at_level(logging.WARNING, logger='test_slow_queries'):
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO books (title, user_id) VALUES ('Dune', 1)")
+    assert caplog.records[-1].query_plan is None
+    assert caplog.records[-1].endpoint is None
@@ -0,0 +1,45 @@
+import pytest
+
+from utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """A clock that only moves when the limiter sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_burst_then_rate():
+    """Test that a full bucket allows a burst and then one call per 1/rate seconds."""
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire() == pytest.approx(0.5)
+    assert limiter.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_tokens_refill_while_idle():
+    """Test that idle time refills the bucket up to the burst size only."""
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1, burst=2, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+    limiter.acquire()
+
+    clock.now += 10
+    assert [limiter.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert limiter.acquire() == pytest.approx(1.0)
+
+
+def test_rate_must_be_positive():
+    """Test that a zero rate is rejected."""
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
@@ -0,0 +1,116 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from utils.response_cache import (
+    MemcachedBackend, MemoryBackend, ResponseCache, create_response_cache
+)
+
+
+class _MemcachedHandler(socketserver.StreamRequestHandler):
+    """Answers the get and set commands of the memcached text protocol."""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, *args = line.split()
+            if command == b'get':
+                entry = self.server.store.get(args[0])
+                if entry is not None and entry[0] > time.time():
+                    value = entry[1]
+                    self.wfile.write(b'VALUE %s 0 %d\r\n%s\r\n' % (args[0], len(value), value))
+                self.wfile.write(b'END\r\n')
+            elif command == b'set':
+                key, _, exptime, size = args
+                value = self.rfile.read(int(size) + 2)[:-2]
+                self.server.store[key] = (time.time() + int(exptime), value)
+                self.wfile.write(b'STORED\r\n')
+            else:
+                self.wfile.write(b'ERROR\r\n')
+
+
+@pytest.fixture
+def memcached():
+    """Fixture to run a minimal stand-in memcached server."""
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _MemcachedHandler)
+    server.daemon_threads = True
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_memory_backend_lru_and_ttl():
+    """Test that the memory backend evicts least-recently-used entries."""
+    cache = ResponseCache(MemoryBackend(max_size=2), ttl=60)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    assert cache.get('a') == b'1'
+    cache.set('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('c') == b'3'
+    assert cache.stats()['backend']['evictions'] == 1
+
+
+def test_oversized_bodies_are_not_cached():
+    """Test that bodies above max_item_bytes are skipped."""
+    cache = ResponseCache(MemoryBackend(), max_item_bytes=4)
+    cache.set('big', b'12345')
+    assert cache.get('big') is None
+    assert cache.stats()['skipped'] == 1
+
+
+def test_hit_ratio():
+    """Test the hit ratio counters."""
+    cache = ResponseCache(MemoryBackend())
+    assert cache.hit_ratio() == 0.0
+    cache.set('a', b'1')
+    cache.get('a')
+    cache.get('a')
+    cache.get('missing')
+    assert cache.stats()['hits'] == 2
+    assert cache.hit_ratio() == pytest.approx(2 / 3)
+
+
+def test_memcached_backend(memcached):
+    """Test storing and reading responses through a memcached server."""
+    address = '%s:%d' % memcached.server_address
+    cache = ResponseCache(MemcachedBackend(address), ttl=60, prefix='test')
+    cache.set('user:1', b'{"collection": []}\r\nEND\r\n')
+    assert cache.get('user:1') == b'{"collection": []}\r\nEND\r\n'
+    assert cache.get('user:2') is None
+    assert b'test:user:1' in memcached.store
+
+    # Connections are reused between calls
+    assert cache.stats()['backend']['idle_connections'] == 1
+
+
+def test_memcached_shared_between_caches(memcached):
+    """Test that two processes' caches (here two instances) share entries."""
+    address = '%s:%d' % memcached.server_address
+    ResponseCache(MemcachedBackend(address)).set('k', b'v')
+    assert ResponseCache(MemcachedBackend(address)).get('k') == b'v'
+
+
+def test_memcached_unreachable_is_a_miss():
+    """Test that an unreachable server degrades to cache misses."""
+    cache = ResponseCache(MemcachedBackend('127.0.0.1:1', timeout=0.1))
+    cache.set('a', b'1')
+    assert cache.get('a') is None
+    assert cache.stats()['errors'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_create_response_cache():
+    """Test building the cache from configuration."""
+    assert create_response_cache({'RESPONSE_CACHE_BACKEND': 'none'}) is None
+    assert isinstance(create_response_cache({}).backend, MemoryBackend)
+    assert isinstance(create_response_cache({'RESPONSE_CACHE_BACKEND': 'memcached'}).backend, MemcachedBackend)
+    with pytest.raises(ValueError):
+        create_response_cache({'RESPONSE_CACHE_BACKEND': 'redis'})
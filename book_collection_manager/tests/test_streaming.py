@@ -0,0 +1,15 @@
+import gzip
+
+from utils.streaming import gzip_chunks
+
+
+def test_gzip_chunks_round_trip():
+    """Test that the compressed stream decompresses to the original data."""
+    chunks = [f'line {i}\n'.encode() for i in range(1000)]
+    compressed = b''.join(gzip_chunks(iter(chunks), level=1))
+    assert gzip.decompress(compressed) == b''.join(chunks)
+
+
+def test_gzip_chunks_empty():
+    """Test compressing an empty stream."""
+    assert gzip.decompress(b''.join(gzip_chunks([]))) == b''
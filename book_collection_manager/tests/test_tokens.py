@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from utils.tokens import RevocationList, TokenError, TokenManager
+
+
+def test_issue_and_verify():
+    """Test that an issued token verifies to its user."""
+    manager = TokenManager(['secret'])
+    claims = manager.verify(manager.issue(42))
+    assert claims['sub'] == 42
+    assert claims['exp'] > 0
+
+
+def test_expired_token():
+    """Test that tokens older than max_age are rejected."""
+    manager = TokenManager(['secret'], max_age=-1)
+    with pytest.raises(TokenError, match='expired'):
+        manager.verify(manager.issue(42))
+
+
+def test_tampered_token():
+    """Test that a token signed with another key is rejected."""
+    token = TokenManager(['other-secret']).issue(42)
+    with pytest.raises(TokenError, match='Invalid token'):
+        TokenManager(['secret']).verify(token)
+
+
+def test_missing_key():
+    """Test that a manager cannot be created without a signing key."""
+    with pytest.raises(ValueError):
+        TokenManager([None])
+
+
+def _wait_for_refresh(revocations):
+    thread = revocations._refresh_thread
+    if thread is not None:
+        thread.join(5)
+
+
+def test_revocation_list_reloads_periodically():
+    """Test that revocations from storage are picked up after the refresh interval."""
+    now = [1000.0]
+    stored = []
+    revocations = RevocationList(loader=lambda: list(stored), refresh_interval=30, clock=lambda: now[0])
+
+    assert not revocations.is_revoked('a')
+    stored.append(('a', 2000.0))
+    assert not revocations.is_revoked('a')
+
+    now[0] += 30
+    revocations.is_revoked('a')
+    _wait_for_refresh(revocations)
+    assert revocations.is_revoked('a')
+
+    now[0] = 2000.0
+    assert not revocations.is_revoked('a')
+
+
+def test_revocation_list_reloads_off_the_lookup_path():
+    """Test that a stale list is answered from at once while one background reload runs."""
+    now = [1000.0]
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return [('a', 2000.0)] if len(calls) > 1 else []
+
+    revocations = RevocationList(loader=loader, refresh_interval=30, clock=lambda: now[0])
+    assert not revocations.is_revoked('a')
+
+    now[0] += 30
+    assert not revocations.is_revoked('a')
+    assert not revocations.is_revoked('a')
+    release.set()
+    _wait_for_refresh(revocations)
+    assert len(calls) == 2
+    assert revocations.is_revoked('a')
+
+
+def test_revocation_list_survives_failed_reload(caplog):
+    """Test that a failed background reload keeps the current list and is retried."""
+    now = [1000.0]
+    results = [[('a', 2000.0)], RuntimeError('database down'), []]
+
+    def loader():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    revocations = RevocationList(loader=loader, refresh_interval=30, clock=lambda: now[0])
+    assert revocations.is_revoked('a')
+
+    now[0] += 30
+    revocations.is_revoked('a')
+    _wait_for_refresh(revocations)
+    assert 'database down' in caplog.text
+    assert revocations.is_revoked('a')
+    _wait_for_refresh(revocations)
+    assert results == []
@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """A pending load that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running block until it finishes and share its result or error.
+    Nothing is kept once the call returns, so a later caller runs it again.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Returns ``fn()``, running it only if no call for ``key`` is in progress.
+
+        Args:
+            key: Identifies the work; calls with equal keys are collapsed.
+            fn (callable): Called with no arguments.
+
+        Returns:
+            The value ``fn`` returned, in this call or the one it waited on.
+
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised in every caller that
+                was waiting on the same call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+
+class TTLCache:
+    """A thread-safe LRU cache with per-entry expiry and single-flight loading.
+
+    Entries are evicted least-recently-used first once ``max_size`` is
+    reached, and expire after the TTL they were stored with. Concurrent misses
+    for the same key are collapsed so that only one caller runs the loader;
+    the others block until it finishes and share its result.
+
+    Args:
+        max_size (int): The maximum number of entries kept in the cache.
+        ttl (float): The default lifetime of an entry, in seconds.
+        negative_ttl (float): The lifetime callers should use for cached
+            "not found" results, in seconds.
+        clock (callable): Returns the current time in seconds. Tests may
+            replace it to control expiry.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, negative_ttl=300, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def coalesced(self):
+        """Misses that waited on another caller's load instead of running the loader."""
+        return self._flights.coalesced
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        """Returns the live value stored for ``key``, or ``default``."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Stores ``value`` under ``key`` for ``ttl`` seconds (default: ``self.ttl``)."""
+        with self._lock:
+            self._store(key, value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        """Removes ``key`` from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for ``key``, calling ``loader`` on a miss.
+
+        Args:
+            key: The cache key.
+            loader (callable): Called with no arguments on a miss. Must return
+                a ``(value, ttl)`` tuple; a ``ttl`` of ``None`` means the value
+                is returned to every waiting caller but not stored.
+
+        Returns:
+            The cached or freshly loaded value.
+
+        Raises:
+            Exception: Whatever ``loader`` raised, re-raised in every caller
+                that was waiting on the same load.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        def load():
+            # A load for this key may have finished since the miss above
+            with self._lock:
+                found, value = self._lookup(key)
+            if found:
+                return value
+            value, ttl = loader()
+            if ttl is not None:
+                with self._lock:
+                    self._store(key, value, ttl)
+            return value
+
+        return self._flights.do(key, load)
+
+    def stats(self):
+        """Returns the cache counters as a dictionary."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+            }
+
+    def _lookup(self, key):
+        # Callers must hold self._lock.
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, ttl):
+        # Callers must hold self._lock.
+        if ttl <= 0:
+            return
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
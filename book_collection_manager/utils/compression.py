@@ -0,0 +1,112 @@
+"""Negotiated compression of response bodies.
+
+Responses with a text or JSON body are compressed with the best encoding the
+client accepts, brotli first when the optional brotli package is installed,
+then gzip. Buffered bodies are only compressed above a minimum size, since
+small ones gain nothing; streamed bodies are compressed chunk by chunk as
+they are sent. Images and responses that already carry a Content-Encoding
+are left alone.
+
+Compressed responses get a weak ETag, since their bytes differ from the
+uncompressed body's; routes compare If-None-Match weakly, so conditional
+requests keep working.
+"""
+import gzip
+
+from flask import request
+
+from utils.streaming import brotli, brotli_chunks, gzip_chunks
+
+# Response types worth compressing, besides text/*
+COMPRESSIBLE_MIMETYPES = frozenset(['application/json', 'application/x-ndjson', 'application/javascript'])
+
+
+def available_encodings(preferred):
+    """Filters a preference list of encodings down to the ones that can be produced here.
+
+    Args:
+        preferred (Iterable[str]): Encodings in order of preference, e.g. ``['br', 'gzip']``.
+
+    Returns:
+        list: The supported ones, in the same order.
+    """
+    return [encoding for encoding in preferred if encoding == 'gzip' or (encoding == 'br' and brotli is not None)]
+
+
+def _compressible(response):
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+class Compressor:
+    """An after-request hook that compresses response bodies.
+
+    Args:
+        encodings (list): Encodings to offer, in order of preference.
+        min_size (int): Bytes a buffered body needs before it is compressed.
+        gzip_level (int): The gzip level, 1 (fastest) to 9 (smallest).
+        brotli_quality (int): The brotli quality, 0 (fastest) to 11 (smallest).
+    """
+
+    def __init__(self, encodings=('br', 'gzip'), min_size=1024, gzip_level=6, brotli_quality=4):
+        self.encodings = available_encodings(encodings)
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, data, encoding):
+        """Compresses a whole body."""
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, self.gzip_level, mtime=0)
+
+    def compress_chunks(self, chunks, encoding):
+        """Compresses a streamed body as it is sent."""
+        if encoding == 'br':
+            return brotli_chunks(chunks, self.brotli_quality)
+        return gzip_chunks(chunks, self.gzip_level)
+
+    def __call__(self, response):
+        if not self.encodings or request.method == 'HEAD' or not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_chunks(response.iter_encoded(), encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def install_compression(app):
+    """Compresses an app's responses as its config describes.
+
+    Reads COMPRESSION_ENCODINGS (comma-separated, empty to disable),
+    COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL and COMPRESSION_BROTLI_QUALITY.
+    """
+    config = app.config
+    encodings = [encoding.strip() for encoding in config.get('COMPRESSION_ENCODINGS', 'br,gzip').split(',')]
+    compressor = Compressor(
+        encodings=[encoding for encoding in encodings if encoding],
+        min_size=config.get('COMPRESSION_MIN_SIZE', 1024),
+        gzip_level=config.get('COMPRESSION_GZIP_LEVEL', 6),
+        brotli_quality=config.get('COMPRESSION_BROTLI_QUALITY', 4),
+    )
+    app.after_request(compressor)
+    return compressor
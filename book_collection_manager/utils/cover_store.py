@@ -0,0 +1,190 @@
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it every size is the original image
+    Image = None
+
+# Resized variants, by name, as the longest side in pixels
+COVER_SIZES = {'small': 128, 'medium': 320, 'large': 640}
+
+# Eviction stops once the store is back under this fraction of its quota
+_EVICTION_LOW_WATERMARK = 0.9
+
+
+class CoverStore:
+    """Keeps downloaded cover images on disk, addressed by their content.
+
+    Each image is stored once under the SHA-256 of its bytes, however many
+    URLs point to it, next to JPEG variants resized to each of ``sizes``.
+    A small reference file maps each source URL to its image. Files are
+    written to a temporary name and renamed, so readers in any process never
+    see a partial file.
+
+    Serving a file touches its modification time. When the files exceed
+    ``max_bytes``, the least recently served ones are deleted until the store
+    is back under 90% of the quota; a lookup that finds its file gone simply
+    misses, and the image is downloaded again.
+
+    Args:
+        root (str): The directory to keep the images in. Created if missing.
+        max_bytes (int): The disk quota for images and variants.
+        sizes (dict): Variant names mapped to their longest side in pixels.
+    """
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024, sizes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.sizes = COVER_SIZES if sizes is None else sizes
+        self._objects = os.path.join(root, 'objects')
+        self._refs = os.path.join(root, 'urls')
+        self._lock = threading.Lock()
+        self._bytes = None  # Estimated until the next scan
+        self.evictions = 0
+
+    def lookup(self, url, size='original'):
+        """Returns the path of a cached image, or None if it must be downloaded.
+
+        Args:
+            url (str): The image's source URL.
+            size (str): ``original`` or one of the variant names.
+
+        Returns:
+            str: The path of the image file, or None.
+        """
+        try:
+            with open(self._ref_path(url)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        original = self._object_path(name)
+        if not os.path.exists(original):
+            return None
+        path = original
+        if size != 'original' and Image is not None:
+            variant = self._object_path(f'{name.split(".")[0]}-{size}.jpg')
+            if not os.path.exists(variant):
+                # Evicted on its own, or the sizes changed since the image was stored
+                self._account(self._write_variant(original, variant, self.sizes[size]))
+            if os.path.exists(variant):
+                path = variant
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # Evicted by another process just now
+            return None
+        return path
+
+    def store(self, url, data, content_type):
+        """Saves a downloaded image and its variants, and maps ``url`` to it.
+
+        Args:
+            url (str): The image's source URL.
+            data (bytes): The image.
+            content_type (str): The image's media type, e.g. ``image/jpeg``.
+
+        Returns:
+            str: The image's content digest.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        extension = mimetypes.guess_extension(content_type.split(';')[0].strip()) or '.img'
+        name = digest + extension
+        original = self._object_path(name)
+        written = 0
+        if not os.path.exists(original):
+            written += self._write(original, data)
+        if Image is not None:
+            for size, pixels in self.sizes.items():
+                variant = self._object_path(f'{digest}-{size}.jpg')
+                if not os.path.exists(variant):
+                    written += self._write_variant(original, variant, pixels)
+        self._write(self._ref_path(url), name.encode())
+        self._account(written)
+        return digest
+
+    def stats(self):
+        """Returns the store's size and eviction counters as a dictionary."""
+        with self._lock:
+            return {'bytes': self._bytes, 'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+    def evict(self):
+        """Deletes the least recently served files until the store is under its low watermark.
+
+        Returns:
+            int: The number of files deleted.
+        """
+        files = []
+        for directory, _, names in os.walk(self._objects):
+            for name in names:
+                if name.startswith('.tmp-'):  # Still being written
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * _EVICTION_LOW_WATERMARK
+        deleted = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            deleted += 1
+        with self._lock:
+            self._bytes = total
+            self.evictions += deleted
+        return deleted
+
+    def _account(self, written):
+        """Adds newly written bytes to the estimate and evicts once it exceeds the quota."""
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += written
+            over_quota = self._bytes is None or self._bytes > self.max_bytes
+        if over_quota:
+            self.evict()
+
+    def _object_path(self, name):
+        return os.path.join(self._objects, name[:2], name)
+
+    def _ref_path(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self._refs, key[:2], key)
+
+    def _write(self, path, data):
+        """Writes ``data`` to ``path`` atomically and returns the number of bytes written."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return len(data)
+
+    def _write_variant(self, original, path, pixels):
+        """Writes a JPEG of ``original`` fitted within ``pixels`` square, returning the bytes written.
+
+        Returns 0, and writes nothing, if the image cannot be decoded.
+        """
+        try:
+            with Image.open(original) as image:
+                image.thumbnail((pixels, pixels))
+                buffer = io.BytesIO()
+                image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return 0
+        return self._write(path, buffer.getvalue())
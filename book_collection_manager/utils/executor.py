@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when a BoundedExecutor has no room for another task."""
+
+
+class BoundedExecutor:
+    """A thread pool that rejects work instead of queueing it without limit.
+
+    At most ``max_workers`` tasks run at once and at most ``max_queue`` more
+    wait for a worker. Submitting beyond that raises ExecutorBusyError
+    immediately, so callers can shed load with a fast error instead of
+    piling up behind a saturated pool.
+
+    Args:
+        max_workers (int): The number of worker threads.
+        max_queue (int): The number of tasks allowed to wait for a worker.
+        thread_name_prefix (str): The prefix of the worker thread names.
+    """
+
+    def __init__(self, max_workers, max_queue, thread_name_prefix=''):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules ``fn(*args, **kwargs)`` and returns its Future.
+
+        Raises:
+            ExecutorBusyError: If every worker is busy and the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError("Executor queue is full")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Runs ``fn(*args, **kwargs)`` on the pool and waits for its result.
+
+        Raises:
+            ExecutorBusyError: If every worker is busy and the queue is full.
+            concurrent.futures.TimeoutError: If the result is not ready in
+                ``timeout`` seconds.
+        """
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads."""
+        self._executor.shutdown(wait=wait)
@@ -1,6 +1,19 @@
 import hashlib
+import hmac
 import os
 
+# Key derivation settings for new password hashes. Stored hashes record the
+# settings they were made with, so these can be raised at any time; existing
+# users are re-hashed with the new settings the next time they log in.
+KDF_ALGORITHM = os.getenv('PASSWORD_KDF', 'pbkdf2_sha256')
+PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '600000'))
+SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', '16384'))
+SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', '8'))
+SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', '1'))
+
+SUPPORTED_ALGORITHMS = ('pbkdf2_sha256', 'scrypt')
+
+
 def generate_salt():
     """Generates a random salt value.
 
@@ -9,9 +22,53 @@ def generate_salt():
     """
     return os.urandom(16).hex()
 
+
+def current_parameters():
+    """Returns the KDF algorithm and parameters used for new hashes.
+
+    Returns:
+        tuple: The algorithm name followed by its integer parameters.
+
+    Raises:
+        ValueError: If PASSWORD_KDF names an unsupported algorithm.
+    """
+    if KDF_ALGORITHM == 'pbkdf2_sha256':
+        return ('pbkdf2_sha256', PBKDF2_ITERATIONS)
+    if KDF_ALGORITHM == 'scrypt':
+        return ('scrypt', SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    raise ValueError(f"Unsupported password KDF: {KDF_ALGORITHM}")
+
+
+def _derive(password, salt, parameters):
+    algorithm, *params = parameters
+    if algorithm == 'pbkdf2_sha256':
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    if algorithm == 'scrypt':
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+                              maxmem=128 * n * r * p + 1024 * 1024).hex()
+    raise ValueError(f"Unsupported password KDF: {algorithm}")
+
+
+def _parse(hashed_password):
+    """Splits a stored hash into its KDF parameters and digest.
+
+    Hashes made before KDFs were introduced are a bare SHA-256 hex digest and
+    are reported with the parameters ``('sha256',)``.
+    """
+    if '$' not in hashed_password:
+        return ('sha256',), hashed_password
+    algorithm, *params, digest = hashed_password.split('$')
+    return (algorithm, *map(int, params)), digest
+
+
 def hash_password(password, salt):
     """Generates a hash for the given password and salt.
 
+    The hash is derived with the configured KDF and is prefixed with the
+    algorithm and parameters, e.g. ``pbkdf2_sha256$600000$<hex digest>``.
+
     Args:
         password (str): The plain-text password.
         salt (str): The salt value.
@@ -19,11 +76,16 @@ def hash_password(password, salt):
     Returns:
         str: The hashed password.
     """
-    return hashlib.sha256((password + salt).encode()).hexdigest()
+    parameters = current_parameters()
+    return '$'.join([*map(str, parameters), _derive(password, salt, parameters)])
+
 
 def verify_password(password, salt, hashed_password):
     """Verifies if the given password matches the stored hashed password.
 
+    Accepts hashes made with any supported KDF and parameters, as well as
+    legacy unprefixed SHA-256 hashes.
+
     Args:
         password (str): The plain-text password.
         salt (str): The salt value.
@@ -32,4 +94,28 @@ def verify_password(password, salt, hashed_password):
     Returns:
         bool: True if the password matches, False otherwise.
     """
-    return hash_password(password, salt) == hashed_password
+    try:
+        parameters, digest = _parse(hashed_password)
+        if parameters == ('sha256',):
+            expected = hashlib.sha256((password + salt).encode()).hexdigest()
+        else:
+            expected = _derive(password, salt, parameters)
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected, digest)
+
+
+def needs_rehash(hashed_password):
+    """Checks whether a stored hash was made with outdated KDF settings.
+
+    Args:
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        bool: True if the password should be re-hashed with the current settings.
+    """
+    try:
+        parameters, _ = _parse(hashed_password)
+    except ValueError:
+        return True
+    return parameters != current_parameters()
@@ -0,0 +1,77 @@
+"""JSON serialization for the app, with orjson when it is installed.
+
+``OrjsonProvider`` is a drop-in replacement for Flask's default provider:
+``jsonify``, ``request.get_json`` and ``current_app.json`` keep working and
+produce the same JSON, only faster. Keys are still sorted, and types orjson
+does not handle the way Flask does (dates, very large integers) fall back to
+Flask's serializer. Non-ASCII text is sent as UTF-8 rather than escaped.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it Flask's json module is used
+    orjson = None
+
+# The providers JSON_PROVIDER can name; 'auto' picks orjson when it is installed
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serializes with orjson, deferring to Flask's provider for anything it cannot match."""
+
+    def _options(self, indent=False):
+        # Flask sends dates as HTTP dates, which orjson would write as ISO 8601
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _dumps_bytes(self, obj, indent=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except TypeError:
+            # e.g. an integer wider than 64 bits
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            data = self._dumps_bytes(obj)
+            if data is not None:
+                return data.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._dumps_bytes(obj, indent)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def create_json_provider(app, name='auto'):
+    """Creates the JSON provider an app should use.
+
+    Args:
+        app (Flask): The application.
+        name (str): One of JSON_PROVIDERS. Asking for orjson when it is not
+            installed logs a warning and falls back to Flask's provider.
+
+    Returns:
+        flask.json.provider.JSONProvider: The provider, to assign to ``app.json``.
+    """
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(JSON_PROVIDERS)}, not {name!r}")
+    if name == 'orjson' and orjson is None:
+        app.logger.warning("JSON_PROVIDER is orjson, but orjson is not installed; using Flask's json module.")
+    if name != 'stdlib' and orjson is not None:
+        return OrjsonProvider(app)
+    return DefaultJSONProvider(app)
@@ -1,26 +1,159 @@
+"""Non-blocking, structured logging.
+
+Loggers passed to ``configure_logger`` hand their records to a queue. A
+single background thread drains the queue, formats each record as one line
+of JSON and writes it to stderr, so request threads never wait on string
+formatting or on the stream. Messages should use lazy ``%s`` arguments; the
+arguments are merged into the message on the background thread, and not at
+all when the record is below the configured level.
+
+Settings come from the environment:
+
+    LOG_LEVEL          The minimum level to log (default INFO)
+    LOG_SAMPLE_RATE    Fraction of INFO records kept inside requests (default 1.0)
+    LOG_SAMPLE_RATES   Per-endpoint overrides, e.g. ``books.get_collection=0.1,books.search_books=0.05``
+"""
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import has_request_context, request
+from flask.logging import default_handler
+
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single line of JSON."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestFilter(logging.Filter):
+    """Tags records with the current request and samples INFO records per endpoint.
+
+    Runs on the request thread, where the request context is available.
+    Warnings and errors are always kept.
+
+    Args:
+        default_rate (float): Fraction of INFO records kept, between 0 and 1.
+        rates (dict): Per-endpoint rates overriding ``default_rate``.
+        rng (callable): Returns a random float in [0, 1).
+    """
+
+    def __init__(self, default_rate=1.0, rates=None, rng=random.random):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self._rng = rng
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        endpoint = request.endpoint
+        if record.levelno == logging.INFO:
+            rate = self.rates.get(endpoint, self.default_rate)
+            if rate < 1 and self._rng() >= rate:
+                return False
+        record.endpoint = endpoint
+        record.method = request.method
+        record.path = request.path
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """A QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler merges the arguments into the message before queueing
+    so the record can be pickled. This queue never leaves the process.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _parse_rates(value):
+    rates = {}
+    for item in value.split(','):
+        if item.strip():
+            endpoint, _, rate = item.partition('=')
+            rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+_output = logging.StreamHandler(sys.stderr)
+_output.setFormatter(JsonFormatter())
+_queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    _listener = QueueListener(_queue_handler.queue, _output, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    # Flushes the queue on interpreter exit
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork():
+    # A forked child (e.g. a gunicorn worker) inherits the queue but not the
+    # listener thread; give it its own queue and thread.
+    global _listener
+    if _listener is not None:
+        _queue_handler.queue = queue.SimpleQueue()
+        _start_listener()
 
-from flask import current_app, has_request_context
 
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
 
-def configure_logger(logger):
-    logger.setLevel(logging.DEBUG)  # Set the desired logging level here
 
-    # Create a console handler that logs to stderr
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.DEBUG)
+def configure_logger(logger, env=os.environ):
+    """Sends a logger's records through the background logging queue.
 
-    # Create a formatter with a timestamp
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    Safe to call repeatedly: the logger's level and sampling are updated and
+    its handlers are never duplicated.
 
-    # Add the formatter to the handler
-    handler.setFormatter(formatter)
+    Args:
+        logger (logging.Logger): The logger to configure, usually ``app.logger``.
+        env (Mapping): Where to read LOG_LEVEL and the sampling rates from.
+    """
+    logger.setLevel(env.get('LOG_LEVEL', 'INFO').upper())
+    # Flask attaches its own synchronous stderr handler to app.logger
+    logger.removeHandler(default_handler)
 
-    # Add the handler to the logger
-    logger.addHandler(handler)
+    _queue_handler.filters = [RequestFilter(
+        default_rate=float(env.get('LOG_SAMPLE_RATE', '1.0')),
+        rates=_parse_rates(env.get('LOG_SAMPLE_RATES', '')),
+    )]
+    logger.addHandler(_queue_handler)  # A no-op if the logger already has it
 
-    if has_request_context():
-        app_logger = current_app.logger
-        for handler in app_logger.handlers:
-            logger.addHandler(handler)
\ No newline at end of file
+    if _listener is None:
+        _start_listener()
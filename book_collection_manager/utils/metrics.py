@@ -0,0 +1,175 @@
+import bisect
+import threading
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """Counters, histograms and gauges rendered in the Prometheus text format.
+
+    Every thread records into its own shard, so recording takes no lock and
+    allocates nothing but the label tuple. Shards are only merged when the
+    metrics are rendered. Values are never reset, as Prometheus expects.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+
+    def counter(self, name, description, labelnames=()):
+        """Declares a counter and returns it."""
+        return self._declare(Counter(self, name, description, labelnames))
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Declares a histogram and returns it."""
+        return self._declare(Histogram(self, name, description, labelnames, buckets))
+
+    def gauge(self, name, description, callback, labelnames=()):
+        """Declares a gauge whose value is read from ``callback`` when rendering.
+
+        ``callback`` returns a number, or a dict mapping label value tuples to
+        numbers when the gauge has labels. Declaring an existing name returns
+        the existing metric.
+        """
+        return self._declare(Gauge(name, description, callback, labelnames))
+
+    def _declare(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def _shard(self):
+        """Returns the calling thread's shard, registering it on first use."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _merged(self):
+        """Sums every thread's shard into a single mapping."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            for key, value in dict(shard).items():  # dict() copies atomically
+                if isinstance(value, list):
+                    total = merged.get(key)
+                    merged[key] = list(value) if total is None else [a + b for a, b in zip(total, value)]
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        merged = self._merged()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labelvalues, value in metric.collect(merged):
+                lines.extend(metric.samples(labelvalues, value))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, description, labelnames):
+        self._registry = registry
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labelvalues, amount=1):
+        """Adds ``amount`` to the series identified by ``labelvalues``."""
+        shard = self._registry._shard()
+        key = (self.name, labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self, merged):
+        return sorted((key[1], value) for key, value in merged.items() if key[0] == self.name)
+
+    def samples(self, labelvalues, value):
+        return [f'{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}']
+
+
+class Gauge:
+    """A value that can go up and down, read from a callback at render time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description, callback, labelnames):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._callback = callback
+
+    def collect(self, merged):
+        value = self._callback()
+        if not self.labelnames:
+            return [((), value)]
+        return sorted(value.items())
+
+    def samples(self, labelvalues, value):
+        return [f'{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}']
+
+
+class Histogram:
+    """A distribution of observed values, counted into cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, description, labelnames, buckets):
+        self._registry = registry
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        """Records one observation in the series identified by ``labelvalues``."""
+        shard = self._registry._shard()
+        key = (self.name, labelvalues)
+        # One slot per bucket plus +Inf, then the sum of all observations
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def collect(self, merged):
+        return sorted((key[1], value) for key, value in merged.items() if key[0] == self.name)
+
+    def samples(self, labelvalues, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += count
+            labels = _labels((*self.labelnames, 'le'), (*labelvalues, _number(bound)))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _labels(self.labelnames, labelvalues)
+        lines.append(f'{self.name}_sum{labels} {_number(counts[-1])}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -0,0 +1,206 @@
+"""Capturing the SQL statements an engine executes.
+
+``QueryCapture`` records every statement run while it is active, so tests
+can hold a route to a budget of queries and database time:
+
+    with QueryCapture(engines) as capture:
+        client.get('/api/books/1')
+    capture.check(max_queries=1, max_time=0.1)
+
+``SlowQueryLog`` runs in production and logs each statement that takes
+longer than a threshold, with its parameters redacted, the endpoint of the
+request that ran it and, optionally, the database's query plan for it.
+"""
+import time
+from collections import namedtuple
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+# Parameter sets of an executemany() shown in a log record
+MAX_LOGGED_PARAMETER_SETS = 5
+
+# How each dialect is asked for a query plan
+_EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}
+
+CapturedQuery = namedtuple('CapturedQuery', 'statement parameters duration endpoint')
+
+
+def _endpoint():
+    return request.endpoint if has_request_context() else None
+
+
+def _redact_value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return f'<{type(value).__name__}>'
+
+
+def redact_parameters(parameters, executemany=False):
+    """Replaces the bound values of a statement that could carry user data.
+
+    Numbers, booleans and NULLs, mostly ids and limits, are kept; strings
+    and anything else become a placeholder naming their type.
+
+    Args:
+        parameters: The DBAPI parameters: a sequence or a mapping, or a list of
+            them for an executemany().
+        executemany (bool): Whether ``parameters`` holds several parameter sets.
+
+    Returns:
+        The parameters in the same shape, redacted. Only the first
+        MAX_LOGGED_PARAMETER_SETS sets of an executemany() are kept.
+    """
+    if executemany:
+        redacted = [redact_parameters(p) for p in parameters[:MAX_LOGGED_PARAMETER_SETS]]
+        if len(parameters) > MAX_LOGGED_PARAMETER_SETS:
+            redacted.append(f'<{len(parameters) - MAX_LOGGED_PARAMETER_SETS} more>')
+        return redacted
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by QueryCapture.check when a block ran too many or too slow queries."""
+
+
+class QueryCapture:
+    """Records the statements a set of engines execute while the capture is active.
+
+    Use it as a context manager; listeners are attached on entry and removed
+    on exit. Statements from every thread are recorded, including those that
+    fail.
+
+    Args:
+        engines (iterable): The sqlalchemy.engine.Engines to watch.
+    """
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.queries = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('capture_started_at', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info['capture_started_at'].pop()
+        self.queries.append(CapturedQuery(statement, parameters, time.perf_counter() - started_at, _endpoint()))
+
+    def _error(self, context):
+        started_at = context.connection.info.get('capture_started_at') if context.connection else None
+        if started_at and context.statement is not None:
+            self._after(context.connection, None, context.statement, context.parameters,
+                        context.execution_context, False)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._before)
+            event.listen(engine, 'after_cursor_execute', self._after)
+            event.listen(engine, 'handle_error', self._error)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._before)
+            event.remove(engine, 'after_cursor_execute', self._after)
+            event.remove(engine, 'handle_error', self._error)
+
+    @property
+    def statements(self):
+        """The SQL of each captured statement, in order."""
+        return [query.statement for query in self.queries]
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        """Seconds spent executing the captured statements."""
+        return sum(query.duration for query in self.queries)
+
+    def check(self, max_queries=None, max_time=None):
+        """Asserts that the captured statements stayed within a budget.
+
+        Args:
+            max_queries (int): The most statements allowed, or None for no limit.
+            max_time (float): The most seconds of database time allowed, or None.
+
+        Raises:
+            QueryBudgetExceeded: Listing the statements that were run.
+        """
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f"{self.count} queries, budget is {max_queries}")
+        if max_time is not None and self.total_time > max_time:
+            problems.append(f"{self.total_time * 1000:.1f} ms of database time, budget is {max_time * 1000:.1f} ms")
+        if problems:
+            listing = '\n'.join(f"  {query.duration * 1000:8.2f} ms  {' '.join(query.statement.split())}"
+                                for query in self.queries)
+            raise QueryBudgetExceeded(f"Query budget exceeded: {'; '.join(problems)}\n{listing}")
+
+
+class SlowQueryLog:
+    """Logs every statement that runs for longer than a threshold.
+
+    Each record is a warning carrying the statement, its redacted parameters,
+    its duration, the endpoint of the request that ran it and, with
+    ``explain``, the query plan of SELECT statements on SQLite and
+    PostgreSQL. The plan is fetched on the same connection right after the
+    statement, so only enable it while investigating.
+
+    Args:
+        logger (logging.Logger): Where to write the records.
+        threshold (float): Seconds a statement may take before it is logged.
+        explain (bool): Whether to record the query plan of slow SELECTs.
+    """
+
+    def __init__(self, logger, threshold, explain=False):
+        self.logger = logger
+        self.threshold = threshold
+        self.explain = explain
+
+    def instrument(self, engine):
+        """Starts timing every statement an engine executes."""
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'handle_error', self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_started_at', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['slow_query_started_at'].pop()
+        if duration < self.threshold:
+            return
+        plan = self._query_plan(conn, statement, parameters) if self.explain and not executemany else None
+        self.logger.warning("Slow query (%.1f ms): %s", duration * 1000, ' '.join(statement.split()), extra={
+            'duration_ms': round(duration * 1000, 3),
+            'parameters': redact_parameters(parameters, executemany),
+            'endpoint': _endpoint(),
+            'query_plan': plan,
+        })
+
+    def _error(self, context):
+        # A failed statement never reaches after_cursor_execute
+        started_at = context.connection.info.get('slow_query_started_at') if context.connection else None
+        if started_at and context.statement is not None:
+            started_at.pop()
+
+    def _query_plan(self, conn, statement, parameters):
+        prefix = _EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        # A separate DBAPI cursor, so the EXPLAIN is neither captured nor timed itself
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [str(row[-1]) for row in cursor.fetchall()]
+        except Exception as e:
+            self.logger.debug("Could not explain a slow query: %s", e)
+            return None
+        finally:
+            cursor.close()
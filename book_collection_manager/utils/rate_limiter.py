@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """A token bucket shared by several threads.
+
+    Tokens are added at ``rate`` per second, up to ``burst``. Each call to
+    ``acquire`` takes one token, sleeping until one is available, so callers
+    together never exceed the rate over any window longer than the burst.
+
+    Args:
+        rate (float): Tokens added per second. Must be positive.
+        burst (int): The most tokens that can accumulate while idle.
+        clock (callable): Returns the current time in seconds. Tests may
+            replace it together with ``sleep``.
+        sleep (callable): Waits for the given number of seconds.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, waiting until one is available.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # Taking the token up front reserves it, so waiters queue up in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
@@ -0,0 +1,204 @@
+import queue
+import socket
+import threading
+
+from utils.cache import TTLCache
+
+
+class CacheBackendError(Exception):
+    """Raised when a shared cache backend cannot be reached or answers unexpectedly."""
+
+
+class MemoryBackend:
+    """Keeps responses in this process, in an LRU with per-entry expiry.
+
+    Args:
+        max_size (int): The maximum number of responses kept.
+    """
+
+    def __init__(self, max_size=1024):
+        self._cache = TTLCache(max_size=max_size)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def stats(self):
+        stats = self._cache.stats()
+        return {'size': stats['size'], 'max_size': stats['max_size'], 'evictions': stats['evictions']}
+
+
+class MemcachedBackend:
+    """Shares responses between processes through a memcached server.
+
+    Speaks the memcached text protocol over a small pool of persistent
+    connections. A connection that fails is discarded and the error is
+    raised as CacheBackendError.
+
+    Args:
+        address (str): The server's ``host:port``.
+        pool_size (int): The maximum number of idle connections kept open.
+        timeout (float): Socket timeout in seconds.
+    """
+
+    def __init__(self, address='127.0.0.1:11211', pool_size=8, timeout=0.25):
+        host, _, port = address.rpartition(':')
+        self._address = (host or '127.0.0.1', int(port))
+        self._timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def get(self, key):
+        def command(conn, reader):
+            conn.sendall(b'get ' + key.encode() + b'\r\n')
+            header = reader.readline()
+            if header == b'END\r\n':
+                return None
+            parts = header.split()
+            if len(parts) != 4 or parts[0] != b'VALUE':
+                raise CacheBackendError(f"Unexpected reply to get: {header!r}")
+            value = reader.read(int(parts[3]) + 2)[:-2]
+            if reader.readline() != b'END\r\n':
+                raise CacheBackendError("Unterminated reply to get")
+            return value
+        return self._call(command)
+
+    def set(self, key, value, ttl):
+        def command(conn, reader):
+            conn.sendall(b'set %s 0 %d %d\r\n%s\r\n' % (key.encode(), max(int(ttl), 1), len(value), value))
+            reply = reader.readline()
+            if reply != b'STORED\r\n':
+                raise CacheBackendError(f"Unexpected reply to set: {reply!r}")
+        self._call(command)
+
+    def stats(self):
+        return {'address': f'{self._address[0]}:{self._address[1]}', 'idle_connections': self._idle.qsize()}
+
+    def _call(self, command):
+        try:
+            conn, reader = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = socket.create_connection(self._address, timeout=self._timeout)
+            except OSError as e:
+                raise CacheBackendError(f"Cannot connect to memcached: {e}") from e
+            reader = conn.makefile('rb')
+        try:
+            result = command(conn, reader)
+        except (OSError, ValueError, CacheBackendError) as e:
+            reader.close()
+            conn.close()
+            if isinstance(e, CacheBackendError):
+                raise
+            raise CacheBackendError(f"memcached request failed: {e}") from e
+        try:
+            self._idle.put_nowait((conn, reader))
+        except queue.Full:
+            reader.close()
+            conn.close()
+        return result
+
+
+class ResponseCache:
+    """A read-through cache of encoded response bodies.
+
+    Callers embed everything that decides a response, including a version
+    that writes bump, in the key, so a write makes older entries unreachable
+    instead of having to delete them; they age out by TTL or LRU. Backend
+    failures are counted and treated as misses, so the cache can never fail
+    a request.
+
+    Args:
+        backend: A MemoryBackend, MemcachedBackend or compatible object.
+        ttl (float): How long a response is kept, in seconds.
+        max_item_bytes (int): Bodies larger than this are not cached.
+        prefix (str): Prepended to every key, so apps can share a backend.
+    """
+
+    def __init__(self, backend, ttl=300, max_item_bytes=1024 * 1024, prefix='books'):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_item_bytes = max_item_bytes
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        """Returns the cached body for ``key``, or None."""
+        try:
+            value = self.backend.get(f'{self.prefix}:{key}')
+        except CacheBackendError:
+            self._count('errors')
+            value = None
+        self._count('misses' if value is None else 'hits')
+        return value
+
+    def set(self, key, body):
+        """Caches ``body`` (bytes) under ``key`` unless it is too large."""
+        if len(body) > self.max_item_bytes:
+            self._count('skipped')
+            return
+        try:
+            self.backend.set(f'{self.prefix}:{key}', body, self.ttl)
+            self._count('stores')
+        except CacheBackendError:
+            self._count('errors')
+
+    def hit_ratio(self):
+        """Returns the fraction of lookups that were hits, or 0 before the first lookup."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Returns the cache counters as a dictionary."""
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'skipped': self.skipped,
+                'errors': self.errors,
+            }
+        return {**stats, 'hit_ratio': self.hit_ratio(), 'backend': self.backend.stats()}
+
+
+def create_response_cache(config):
+    """Creates a ResponseCache from Flask configuration values.
+
+    Args:
+        config (Mapping): The application config.
+
+    Returns:
+        ResponseCache: A new cache, or None if RESPONSE_CACHE_BACKEND is ``none``.
+
+    Raises:
+        ValueError: If RESPONSE_CACHE_BACKEND names an unknown backend.
+    """
+    name = config.get('RESPONSE_CACHE_BACKEND', 'memory')
+    if name == 'none':
+        return None
+    if name == 'memory':
+        backend = MemoryBackend(max_size=config.get('RESPONSE_CACHE_MAX_SIZE', 1024))
+    elif name == 'memcached':
+        backend = MemcachedBackend(
+            address=config.get('RESPONSE_CACHE_URL', '127.0.0.1:11211'),
+            timeout=config.get('RESPONSE_CACHE_TIMEOUT', 0.25),
+        )
+    else:
+        raise ValueError(f"Unknown response cache backend: {name}")
+    return ResponseCache(
+        backend,
+        ttl=config.get('RESPONSE_CACHE_TTL', 300),
+        max_item_bytes=config.get('RESPONSE_CACHE_MAX_ITEM_BYTES', 1024 * 1024),
+        prefix=config.get('RESPONSE_CACHE_PREFIX', 'books'),
+    )
@@ -0,0 +1,47 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+
+def gzip_chunks(chunks, level=6):
+    """Compresses an iterable of byte strings into a gzip stream, chunk by chunk.
+
+    Only the compressor's window is held in memory, so arbitrarily long
+    streams can be compressed without buffering them.
+
+    Args:
+        chunks (Iterable[bytes]): The uncompressed data.
+        level (int): The zlib compression level, 1 (fastest) to 9 (smallest).
+
+    Yields:
+        bytes: Pieces of the gzip-encoded stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def brotli_chunks(chunks, quality=4):
+    """Compresses an iterable of byte strings into a brotli stream, chunk by chunk.
+
+    Requires the optional brotli package.
+
+    Args:
+        chunks (Iterable[bytes]): The uncompressed data.
+        quality (int): The brotli quality, 0 (fastest) to 11 (smallest).
+
+    Yields:
+        bytes: Pieces of the brotli-encoded stream.
+    """
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
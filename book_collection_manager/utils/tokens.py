@@ -0,0 +1,145 @@
+import logging
+import secrets
+import threading
+import time
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class TokenError(Exception):
+    """Raised when an access token is malformed, forged, expired or revoked."""
+
+
+class RevocationList:
+    """A small in-memory set of revoked token IDs, refreshed from durable storage.
+
+    The first lookup loads the list through ``loader``. After that, lookups
+    never wait on storage: once the list is ``refresh_interval`` seconds old,
+    the next lookup starts a reload on a background thread and answers from
+    the current list, so tokens revoked by other processes are picked up
+    without any request paying for the query. Entries are dropped once the
+    token they revoke would have expired anyway.
+
+    Args:
+        loader (callable): Returns an iterable of ``(token_id, expires_at)``
+            pairs, ``expires_at`` in epoch seconds, or None to skip reloading.
+            It is called from a background thread for reloads.
+        refresh_interval (float): Seconds between reloads.
+        clock (callable): Returns the current epoch time in seconds.
+    """
+
+    def __init__(self, loader=None, refresh_interval=30, clock=time.time):
+        self._loader = loader
+        self._refresh_interval = refresh_interval
+        self._clock = clock
+        self._revoked = {}
+        self._loaded_at = None
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+
+    def revoke(self, token_id, expires_at):
+        """Marks a token ID as revoked until ``expires_at``."""
+        with self._lock:
+            self._revoked[token_id] = expires_at
+
+    def is_revoked(self, token_id):
+        """Returns True if the token ID has been revoked."""
+        now = self._clock()
+        if self._loader is not None:
+            if self._loaded_at is None:
+                self._reload(now)
+            elif now - self._loaded_at >= self._refresh_interval:
+                self._refresh_in_background(now)
+        expires_at = self._revoked.get(token_id)
+        return expires_at is not None and expires_at > now
+
+    def _refresh_in_background(self, now):
+        with self._lock:
+            if self._refresh_thread is not None:
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._background_reload, args=(now,), name='token-revocations', daemon=True)
+        self._refresh_thread.start()
+
+    def _background_reload(self, now):
+        try:
+            self._reload(now)
+        except Exception as e:
+            # The list stays stale, and the next lookup tries again
+            logger.error("Failed to reload revoked tokens: %s", e)
+        finally:
+            with self._lock:
+                self._refresh_thread = None
+
+    def _reload(self, now):
+        entries = self._loader()
+        with self._lock:
+            self._loaded_at = now
+            revoked = {token_id: expires_at for token_id, expires_at in self._revoked.items() if expires_at > now}
+            for token_id, expires_at in entries:
+                revoked[token_id] = expires_at
+            self._revoked = revoked
+
+
+class TokenManager:
+    """Issues and verifies stateless, HMAC-signed, expiring access tokens.
+
+    Tokens carry the user ID and a random token ID, and are signed with the
+    last of ``secret_keys``. Verification accepts a signature made with any
+    of the keys, so a new key can be appended and old ones retired later
+    without logging everybody out. Verifying a token is a pure CPU check.
+
+    Args:
+        secret_keys (list): The signing keys, oldest first.
+        max_age (int): How long a token stays valid, in seconds.
+        revocations (RevocationList): The revoked token IDs.
+    """
+
+    def __init__(self, secret_keys, max_age=3600, revocations=None):
+        if not secret_keys or not all(secret_keys):
+            raise ValueError("At least one non-empty secret key is required to sign tokens")
+        self.max_age = max_age
+        self.revocations = revocations or RevocationList()
+        self._serializer = URLSafeTimedSerializer(list(secret_keys), salt='access-token')
+
+    def issue(self, user_id):
+        """Issues a token for a user.
+
+        Args:
+            user_id (int): The authenticated user's ID.
+
+        Returns:
+            str: The signed token.
+        """
+        return self._serializer.dumps({'sub': user_id, 'jti': secrets.token_hex(8)})
+
+    def verify(self, token):
+        """Checks a token's signature, age and revocation status.
+
+        Args:
+            token (str): The token presented by the client.
+
+        Returns:
+            dict: The token's claims: ``sub`` (the user ID), ``jti`` (the
+                token ID) and ``exp`` (its expiry in epoch seconds).
+
+        Raises:
+            TokenError: If the token is invalid, expired or revoked.
+        """
+        try:
+            claims, issued_at = self._serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+        except SignatureExpired:
+            raise TokenError("Token has expired")
+        except BadSignature:
+            raise TokenError("Invalid token")
+        if not isinstance(claims, dict) or 'sub' not in claims or 'jti' not in claims:
+            raise TokenError("Invalid token")
+        if self.revocations.is_revoked(claims['jti']):
+            raise TokenError("Token has been revoked")
+        return {**claims, 'exp': issued_at.timestamp() + self.max_age}
+
+    def revoke(self, claims):
+        """Revokes a verified token until it would have expired."""
+        self.revocations.revoke(claims['jti'], claims['exp'])